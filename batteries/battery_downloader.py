@@ -1,118 +1,70 @@
-import requests
 import pandas as pd
 import sqlite3
-from io import BytesIO
 from datetime import datetime
+import os
+import sys
+
+# Add parent directory to path so we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress import download_with_progress, report_progress
+from utils.source_schema import detect_header, record_header_layout, read_rows_below_header, map_columns_by_name
+from utils.ingest import skip_if_source_unchanged, mark_source_loaded, add_manufacturer_ids, deduplicate_rows, write_rejects
+from db.catalog_stats import write_dataset_summary, write_column_stats
+from db.manufacturers import write_manufacturer_lookup
+from db.row_keys import assign_row_ids, index_row_keys
 
 # Step 1: Download the Excel file
 url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=BatteryList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
+content = download_with_progress(url)
+source_sha256 = skip_if_source_unchanged('batteries', content)
 
 # Step 2: Load the Excel file into a pandas DataFrame
-# Skip to row 12 (0-indexed, so this is the 13th row) for headers
-# Data starts from row 13 (0-indexed, so this is the 14th row)
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=12, nrows=1)
-excel_data.seek(0)  # Reset the file pointer
+# Find the header row by its column names rather than a fixed row number,
+# and stop here if the header layout changed since the last accepted load
+header_row, headers = detect_header(content, 'batteries')
+df = read_rows_below_header(content, header_row, headers)
 
-# Get the actual data starting from row 13 (0-indexed, so this is the 14th row)
-excel_data.seek(0)  # Reset the file pointer
-df = pd.read_excel(excel_data, engine='openpyxl', header=12, skiprows=1)
+# Define the current time for the timestamp
+current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-# Use the header names as is
-df.columns = df_headers.columns
+# Step 3: Map the source columns to our standardized names by header name
+BATTERIES_COLUMNS = {
+    'Manufacturer': ['Manufacturer Name', 'Manufacturer'],
+    'Model Number': ['Model Number'],
+    'Chemistry': ['Technology', 'Chemistry'],
+    'Description': ['Description'],
+    'Certifying Entity': ['Certifying Entity'],
+    'Certificate Date': ['Certificate Date'],
+    'Capacity (kWh)': ['Nameplate Energy Capacity', 'Energy Capacity'],
+    'Discharge Rate (kW)': ['Maximum Continuous Discharge Rate', 'Continuous Discharge Rate'],
+    'Round Trip Efficiency (%)': ["Manufacturer's Declared Roundtrip Efficiency", 'Roundtrip Efficiency', 'Round Trip Efficiency'],
+    'Battery Listing Date': ['CEC Listing Date', 'Listing Date'],
+    'Last Update': ['Last Update', 'Last Update Date'],
+}
+df = map_columns_by_name(df, headers, BATTERIES_COLUMNS)
 
-# Print column names to debug
-print("Available columns:")
-for i, col in enumerate(df.columns):
-    print(f"{i}: {col}")
+# Add the Date Added to Tool column
+df['Date Added to Tool'] = current_time
 
-# Print the first row's values to debug
-print("\nFirst row values:")
-for i, val in enumerate(df.iloc[0]):
-    print(f"{i}: {val}")
+# Create a unique identifier for each battery
+df['battery_id'] = df['Manufacturer'].astype(str) + '_' + df['Model Number'].astype(str)
 
-# Define the current time for the timestamp
-current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# Map manufacturer spellings to canonical integer IDs
+add_manufacturer_ids(df, 'Manufacturer')
 
-# Create a new DataFrame with only the columns we need
-new_df = pd.DataFrame()
+# Resolve duplicate keys up front so the bulk insert never hits them
+df, rejects = deduplicate_rows(df, 'battery_id')
 
-# Map the columns from the original DataFrame to our standardized names
-# We'll adjust these based on the actual column names in the data
-try:
-    # Map columns according to the Excel structure provided by the user
-    # Excel column A: Manufacturer Name
-    new_df['Manufacturer'] = df.iloc[:, 0]
-    
-    # Excel Column C: Model Number
-    new_df['Model Number'] = df.iloc[:, 2]
-    
-    # Excel Column D: Technology
-    new_df['Chemistry'] = df.iloc[:, 3]
-    
-    # Excel Column E: Description
-    new_df['Description'] = df.iloc[:, 4]
-    
-    # Excel Column F: Certifying Entity
-    new_df['Certifying Entity'] = df.iloc[:, 5]
-    
-    # Excel Column G: Certificate Date
-    new_df['Certificate Date'] = df.iloc[:, 6]
-    
-    # Excel Column I: Nameplate Energy Capacity
-    new_df['Capacity (kWh)'] = df.iloc[:, 8]
-    
-    # Excel Column J: Maximum Continuous Discharge Rate
-    new_df['Discharge Rate (kW)'] = df.iloc[:, 9]
-    
-    # Excel Column K: Manufacturers Declared Roundtrip Efficiency
-    new_df['Round Trip Efficiency (%)'] = df.iloc[:, 10]
-    
-    # Excel Column O: CEC Listing Date
-    new_df['Battery Listing Date'] = df.iloc[:, 14]
-    
-    # Excel Column P: Last Update Date
-    new_df['Last Update'] = df.iloc[:, 15]
-    
-    # Add the Date Added to Tool column
-    new_df['Date Added to Tool'] = current_time
-    
-    # Create a unique identifier for each battery
-    new_df['battery_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    
-    # Print the columns in our new DataFrame
-    print("\nNew DataFrame columns:")
-    for col in new_df.columns:
-        print(f"- {col}")
-    
-    # Replace the original DataFrame with our new one
-    df = new_df
-    
-except Exception as e:
-    print(f"Error mapping columns: {e}")
-    # If we encounter an error, we'll create a minimal DataFrame with just the essential columns
-    new_df = pd.DataFrame()
-    new_df['Manufacturer'] = df.iloc[:, 0]  # First column as manufacturer
-    new_df['Model Number'] = df.iloc[:, 2]  # Third column as model number (column C)
-    new_df['Chemistry'] = df.iloc[:, 3]  # Fourth column as chemistry (column D)
-    new_df['Description'] = df.iloc[:, 4]  # Fifth column as description (column E)
-    new_df['Capacity (kWh)'] = df.iloc[:, 8]  # Ninth column as capacity (column I)
-    new_df['Discharge Rate (kW)'] = df.iloc[:, 9]  # Tenth column as discharge rate (column J)
-    new_df['Round Trip Efficiency (%)'] = df.iloc[:, 10]  # Eleventh column as efficiency (column K)
-    new_df['Battery Listing Date'] = df.iloc[:, 14]  # Fifteenth column as listing date (column O)
-    new_df['Last Update'] = df.iloc[:, 15]  # Sixteenth column as last update (column P)
-    new_df['Date Added to Tool'] = current_time
-    new_df['battery_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    df = new_df
-    print("Created minimal DataFrame due to error")
+report_progress('parse', rows_parsed=len(df))
 
 # Step 5: Connect to SQLite database (or create it) using context manager
 with sqlite3.connect('db/batteries.db') as conn:
     cursor = conn.cursor()
 
+    # Give every row its stable integer key before the table is written
+    df['row_id'] = assign_row_ids(conn, df['battery_id'])
+
     # Step 6: Check if the table exists, if not create it with a primary key
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='batteries'")
     table_exists = cursor.fetchone() is not None
@@ -134,6 +86,8 @@ with sqlite3.connect('db/batteries.db') as conn:
     for col in columns:
         if col == 'battery_id':
             column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+        elif col in ('manufacturer_id', 'row_id'):
+            column_defs.append(f'"{col}" INTEGER')
         else:
             column_defs.append(f'"{col}" TEXT')
     
@@ -146,6 +100,7 @@ with sqlite3.connect('db/batteries.db') as conn:
     try:
         # First try with if_exists='replace' to ensure we have a clean table
         df.to_sql('batteries', conn, if_exists='replace', index=False)
+        rows_written = len(df)
         print(f"Created new table and inserted {len(df)} rows.")
     except Exception as e:
         print(f"Error inserting data: {e}")
@@ -160,10 +115,22 @@ with sqlite3.connect('db/batteries.db') as conn:
                 print(f"Error inserting row: {e}")
                 # Skip problematic rows
                 pass
+        rows_written = inserted
         print(f"Inserted {inserted} rows out of {len(df)}.")
     
+    # Materialize the stats shown at the top of the tab and the column profiles alongside the rows
+    index_row_keys(conn, 'batteries', 'battery_id')
+    write_rejects(conn, 'batteries', rejects, 'battery_id')
+    write_manufacturer_lookup(conn, 'batteries', df['manufacturer_id'])
+    write_dataset_summary(conn, 'batteries', source_sha256)
+    write_column_stats(conn, 'batteries')
+
     # Connection will be automatically committed and closed by the context manager
 
+report_progress('write', rows_written=rows_written)
+record_header_layout('batteries', header_row, headers)
+mark_source_loaded('batteries', source_sha256, content)
+
 print("Battery data has been successfully downloaded and stored in the database.")
 print(f"Total rows: {len(df)}")
 print(f"Total columns: {len(df.columns)}")
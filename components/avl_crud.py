@@ -1,11 +1,17 @@
 import streamlit as st
 import pandas as pd
 from db.approved_vendor_list import (
+    EQUIPMENT_CATEGORIES,
     save_approved_vendor_list_data, 
     load_approved_vendor_list_data, 
+    load_approved_vendor_list_frame,
     delete_approved_vendor_list_item,
-    create_approved_vendor_list_table
+    search_approved_vendor_list,
+    audited_changes
 )
+from db.avl_audit import get_record_history
+from db.connection_pool import read_connection
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sqlite3
 import os
 from datetime import datetime
@@ -15,9 +21,30 @@ def get_db_path():
     db_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
     return os.path.join(db_dir, 'approved_vendor_list.db')
 
-def update_avl_record(item_id, updated_data):
-    """Update an existing AVL record"""
-    with sqlite3.connect(get_db_path()) as conn:
+def get_current_actor():
+    """
+    Name the person making AVL changes in this session for the audit log
+
+    The app has no sign-in, so this is the name entered in the DCA tab, or
+    the browser session when none was entered.
+    """
+    actor = (st.session_state.get('avl_actor') or '').strip()
+    if actor:
+        return actor
+    ctx = get_script_run_ctx()
+    return f"session {ctx.session_id[:8]}" if ctx else None
+
+# Why an edit is refused when it collides with the unique natural-key index
+DUPLICATE_KEY_MESSAGE = "another record already has the same equipment category, manufacturer and model SKU"
+
+def update_avl_record(item_id, updated_data, actor=None):
+    """
+    Update an existing AVL record
+
+    Raises:
+        ValueError: If the change would duplicate another record's natural key
+    """
+    with sqlite3.connect(get_db_path()) as conn, audited_changes(conn, actor):
         cursor = conn.cursor()
         
         # Build the UPDATE query dynamically
@@ -47,15 +74,18 @@ def update_avl_record(item_id, updated_data):
         if update_fields:
             query = f"UPDATE approved_vendor_list SET {', '.join(update_fields)} WHERE item_id = ?"
             values.append(item_id)
-            cursor.execute(query, values)
-            conn.commit()
+            try:
+                cursor.execute(query, values)
+            except sqlite3.IntegrityError:
+                print(f"Update of AVL record {item_id} would duplicate another record's category, manufacturer and model SKU")
+                raise ValueError(f"Record {item_id} wasn't updated: {DUPLICATE_KEY_MESSAGE}")
             return cursor.rowcount > 0
         
         return False
 
 def get_avl_record_by_id(item_id):
     """Get a single AVL record by ID"""
-    with sqlite3.connect(get_db_path()) as conn:
+    with read_connection(get_db_path()) as conn:
         query = "SELECT * FROM approved_vendor_list WHERE item_id = ?"
         df = pd.read_sql_query(query, conn, params=(item_id,))
         
@@ -81,18 +111,22 @@ def get_avl_record_by_id(item_id):
         
         return None
 
-def bulk_delete_avl_records(item_ids):
+def bulk_delete_avl_records(item_ids, actor=None):
     """Delete multiple AVL records"""
-    with sqlite3.connect(get_db_path()) as conn:
+    with sqlite3.connect(get_db_path()) as conn, audited_changes(conn, actor):
         cursor = conn.cursor()
         placeholders = ','.join(['?' for _ in item_ids])
         query = f"DELETE FROM approved_vendor_list WHERE item_id IN ({placeholders})"
         cursor.execute(query, item_ids)
-        conn.commit()
         return cursor.rowcount
 
-def bulk_update_avl_records(item_ids, field_name, new_value):
-    """Update a specific field for multiple records"""
+def bulk_update_avl_records(item_ids, field_name, new_value, actor=None):
+    """
+    Update a specific field for multiple records
+
+    Raises:
+        ValueError: If the change would give two records the same natural key
+    """
     field_mapping = {
         'Equipment Category': 'equipment_category',
         'Manufacturer': 'manufacturer',
@@ -110,18 +144,30 @@ def bulk_update_avl_records(item_ids, field_name, new_value):
     
     if field_name in field_mapping:
         db_field = field_mapping[field_name]
-        with sqlite3.connect(get_db_path()) as conn:
+        with sqlite3.connect(get_db_path()) as conn, audited_changes(conn, actor):
             cursor = conn.cursor()
             placeholders = ','.join(['?' for _ in item_ids])
             query = f"UPDATE approved_vendor_list SET {db_field} = ? WHERE item_id IN ({placeholders})"
-            cursor.execute(query, [new_value] + item_ids)
-            conn.commit()
+            try:
+                cursor.execute(query, [new_value] + item_ids)
+            except sqlite3.IntegrityError:
+                print(f"Bulk update of {field_name} would duplicate existing category, manufacturer and model SKU combinations")
+                raise ValueError(
+                    f"No records were updated: setting {field_name} to {new_value!r} would give two records "
+                    "the same equipment category, manufacturer and model SKU"
+                )
             return cursor.rowcount
     
     return 0
 
-def render_avl_crud_interface(category_filter=None):
-    """Render the CRUD interface for AVL management"""
+def render_avl_crud_interface(category_filter=None, df=None):
+    """
+    Render the CRUD interface for AVL management
+
+    Args:
+        category_filter: Exact equipment category to manage, or None for all
+        df: Rows of that category with display column names and 'ID'
+    """
     
     # Create a safe key suffix from category filter
     key_suffix = (category_filter or "all").replace(" ", "_").lower()
@@ -134,37 +180,17 @@ def render_avl_crud_interface(category_filter=None):
     if f'bulk_operation_{key_suffix}' not in st.session_state:
         st.session_state[f'bulk_operation_{key_suffix}'] = None
     
-    # Load data with ID column
-    with sqlite3.connect(get_db_path()) as conn:
-        query = "SELECT * FROM approved_vendor_list"
+    # Use the category's partition of the cached list when the caller has it
+    if df is None:
+        df = load_approved_vendor_list_frame()
         if category_filter:
-            query += f" WHERE equipment_category LIKE '%{category_filter}%'"
-        df = pd.read_sql_query(query, conn)
+            df = df[df['Equipment Category'] == category_filter]
+    df = df.copy()
     
     if df.empty:
         st.info("No records found. Upload data to get started.")
         return
     
-    # Rename columns for display
-    column_display_names = {
-        'item_id': 'ID',
-        'equipment_category': 'Equipment Category',
-        'manufacturer': 'Manufacturer',
-        'technology_type': 'Technology Type',
-        'model_sku': 'Model SKU',
-        'product_model_description': 'Product Model Description',
-        'racking_system_name': 'Racking System Name',
-        'power_rating_specification': 'Power Rating Specification',
-        'module_level_power_electronics': 'Module Level Power Electronics',
-        'system_configuration': 'System Configuration',
-        'racking_style': 'Racking Style',
-        'internal_notes': 'Internal Notes / Memo',
-        'additional_notes': 'Additional Notes',
-        'date_added': 'Date Added'
-    }
-    
-    df = df.rename(columns=column_display_names)
-    
     # CRUD Operations Section
     
     # Operation tabs
@@ -173,11 +199,24 @@ def render_avl_crud_interface(category_filter=None):
     # View & Edit Tab
     with crud_tabs[0]:
         # Search and filter
-        search_term = st.text_input("Search records", placeholder="Search by manufacturer, model, etc.", key=f"search_{key_suffix}")
+        search_term = st.text_input(
+            "Search records",
+            placeholder="Search by manufacturer, model, etc. (e.g. qcells, manufacturer:tesla, sku:q.peak)",
+            key=f"search_{key_suffix}"
+        )
         
+        ranked = False
         if search_term:
-            mask = df.apply(lambda row: row.astype(str).str.contains(search_term, case=False).any(), axis=1)
-            filtered_df = df[mask]
+            matching_ids = search_approved_vendor_list(search_term, category=category_filter)
+            if matching_ids is None:
+                # No full-text index in this SQLite build, so scan the text columns instead
+                text = df.astype(str).apply(lambda column: column.str.contains(search_term, case=False, regex=False))
+                filtered_df = df[text.any(axis=1)].copy()
+            else:
+                # Keep the search's relevance order
+                ids = set(df['ID'])
+                filtered_df = df.set_index('ID', drop=False).loc[[i for i in matching_ids if i in ids]].reset_index(drop=True)
+                ranked = True
         else:
             filtered_df = df
         
@@ -206,7 +245,7 @@ def render_avl_crud_interface(category_filter=None):
         description_column = 'Product Model Description' if 'Product Model Description' in all_columns else None
         
         # Set consistent default columns
-        default_columns = ['ID', 'Manufacturer', 'Model SKU']
+        default_columns = ['ID', 'Manufacturer', 'Model SKU', 'CEC Status']
         
         # Add date column if it exists
         if date_column:
@@ -234,7 +273,10 @@ def render_avl_crud_interface(category_filter=None):
         # Sort by is_qcells (True first) and then by date if available
         date_col = 'Date Added' if 'Date Added' in filtered_df.columns else None
         
-        if date_col:
+        if ranked:
+            # Search results stay in relevance order
+            sorted_df = filtered_df
+        elif date_col:
             try:
                 # Convert date column to datetime for proper sorting
                 filtered_df[date_col] = pd.to_datetime(filtered_df[date_col], errors='coerce')
@@ -292,12 +334,17 @@ def render_avl_crud_interface(category_filter=None):
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     if st.form_submit_button("Save Changes", type="primary"):
-                        if update_avl_record(record.get('ID', edit_id), updated_data):
-                            st.success("Record updated successfully!")
-                            st.session_state[f'edit_mode_{key_suffix}'] = False
-                            st.rerun()
+                        try:
+                            updated = update_avl_record(record.get('ID', edit_id), updated_data, actor=get_current_actor())
+                        except ValueError as e:
+                            st.error(str(e))
                         else:
-                            st.error("Failed to update record")
+                            if updated:
+                                st.success("Record updated successfully!")
+                                st.session_state[f'edit_mode_{key_suffix}'] = False
+                                st.rerun()
+                            else:
+                                st.error("Failed to update record")
                 
                 with col2:
                     if st.form_submit_button("Cancel"):
@@ -306,12 +353,19 @@ def render_avl_crud_interface(category_filter=None):
                 
                 with col3:
                     if st.form_submit_button("Delete Record", type="secondary"):
-                        if delete_approved_vendor_list_item(record.get('ID', edit_id)):
+                        if delete_approved_vendor_list_item(record.get('ID', edit_id), actor=get_current_actor()):
                             st.success("Record deleted successfully!")
                             st.session_state[f'edit_mode_{key_suffix}'] = False
                             st.rerun()
                         else:
                             st.error("Failed to delete record")
+            
+            with st.expander("Change History"):
+                history = get_record_history(record.get('ID', edit_id))
+                if history.empty:
+                    st.caption("No recorded changes for this record")
+                else:
+                    st.dataframe(history.drop(columns=['Entry', 'ID']), use_container_width=True, hide_index=True)
     
     # Add New Tab
     with crud_tabs[1]:
@@ -321,11 +375,7 @@ def render_avl_crud_interface(category_filter=None):
             new_data = {}
             
             # Equipment category selection
-            equipment_categories = [
-                "PV Module", "PV Module + Inverter", "Inverter", 
-                "Optimizer", "Battery", "Battery Expansion", 
-                "Non-Steel Roof Racking"
-            ]
+            equipment_categories = EQUIPMENT_CATEGORIES
             
             # Pre-select the current category if filtering
             default_category = category_filter if category_filter in equipment_categories else equipment_categories[0]
@@ -348,7 +398,7 @@ def render_avl_crud_interface(category_filter=None):
                 new_df = pd.DataFrame([new_data])
                 
                 try:
-                    records_added = save_approved_vendor_list_data(new_df)
+                    records_added = save_approved_vendor_list_data(new_df, actor=get_current_actor())
                     st.success(f"Successfully added {records_added} new equipment!")
                     st.rerun()
                 except Exception as e:
@@ -378,14 +428,19 @@ def render_avl_crud_interface(category_filter=None):
                 
                 if st.button("Apply Bulk Update", type="primary", key=f"apply_bulk_update_{key_suffix}"):
                     if new_value:
-                        updated_count = bulk_update_avl_records(
-                            st.session_state[f'selected_records_{key_suffix}'],
-                            field_to_update,
-                            new_value
-                        )
-                        st.success(f"Updated {updated_count} records!")
-                        st.session_state[f'selected_records_{key_suffix}'] = []
-                        st.rerun()
+                        try:
+                            updated_count = bulk_update_avl_records(
+                                st.session_state[f'selected_records_{key_suffix}'],
+                                field_to_update,
+                                new_value,
+                                actor=get_current_actor()
+                            )
+                        except ValueError as e:
+                            st.error(str(e))
+                        else:
+                            st.success(f"Updated {updated_count} records!")
+                            st.session_state[f'selected_records_{key_suffix}'] = []
+                            st.rerun()
                     else:
                         st.error("Please enter a new value")
             
@@ -393,7 +448,7 @@ def render_avl_crud_interface(category_filter=None):
                 st.warning(f"⚠️ This will permanently delete {len(st.session_state[f'selected_records_{key_suffix}'])} records!")
                 
                 if st.button("Confirm Bulk Delete", type="secondary", key=f"confirm_bulk_delete_{key_suffix}"):
-                    deleted_count = bulk_delete_avl_records(st.session_state[f'selected_records_{key_suffix}'])
+                    deleted_count = bulk_delete_avl_records(st.session_state[f'selected_records_{key_suffix}'], actor=get_current_actor())
                     st.success(f"Deleted {deleted_count} records!")
                     st.session_state[f'selected_records_{key_suffix}'] = []
                     st.rerun()
@@ -0,0 +1,109 @@
+"""
+BOM lookup screen
+
+Upload a bill of materials and resolve every model number against the CEC
+catalogs at once, with suggestions for the lines that don't resolve.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from components.paginated_grid import render_paginated_grid
+from db.bom_resolver import resolve_bom
+from utils.column_auto_mapper import name_similarity
+from utils.session_artifacts import get_frame, put_frame
+
+# Display names of the resolution columns
+RESOLUTION_COLUMNS = {
+    'line': 'Line',
+    'model': 'Model',
+    'manufacturer': 'Manufacturer',
+    'status': 'Status',
+    'match_type': 'Match',
+    'confidence': 'Confidence',
+    'matches': 'Matching Products',
+    'catalog': 'Catalog',
+    'cec_manufacturer': 'CEC Manufacturer',
+    'cec_model': 'CEC Model Number',
+    'suggestions': 'Suggestions',
+}
+
+NO_COLUMN = "(none)"
+
+def guess_column(columns, target):
+    """Pick the column whose name looks most like a standard column"""
+    scores = [name_similarity(column, target) for column in columns]
+    return max(range(len(columns)), key=scores.__getitem__) if columns else 0
+
+def render_bom_lookup():
+    """Render the BOM upload, resolution summary and results"""
+    st.subheader("BOM Lookup")
+    st.markdown("Upload a bill of materials CSV to look up all of its model numbers in the CEC catalogs at once.")
+
+    uploaded_file = st.file_uploader("Upload BOM CSV", type=["csv"], key="bom_upload")
+    if uploaded_file is None:
+        return
+
+    try:
+        bom = pd.read_csv(uploaded_file, dtype=str, encoding_errors='replace')
+    except Exception as e:
+        st.error(f"Error reading the BOM file: {str(e)}")
+        return
+    if bom.empty:
+        st.warning("The BOM file has no rows")
+        return
+
+    columns = bom.columns.tolist()
+    col1, col2 = st.columns(2)
+    with col1:
+        model_column = st.selectbox(
+            "Model number column", columns, index=guess_column(columns, "Model SKU"), key="bom_model_column"
+        )
+    with col2:
+        manufacturer_options = [NO_COLUMN] + columns
+        manufacturer_guess = guess_column(columns, "Manufacturer")
+        manufacturer_column = st.selectbox(
+            "Manufacturer column",
+            manufacturer_options,
+            index=manufacturer_guess + 1 if name_similarity(columns[manufacturer_guess], "Manufacturer") >= 0.5 else 0,
+            key="bom_manufacturer_column"
+        )
+
+    signature = (uploaded_file.file_id, model_column, manufacturer_column)
+    if st.button("Resolve BOM", type="primary"):
+        with st.spinner(f"Resolving {len(bom):,} lines..."):
+            try:
+                lines, _ = resolve_bom(
+                    bom[model_column],
+                    bom[manufacturer_column] if manufacturer_column != NO_COLUMN else None
+                )
+            except Exception as e:
+                st.error(f"Error resolving the BOM: {str(e)}")
+                return
+        put_frame('bom_resolution', lines.rename(columns=RESOLUTION_COLUMNS))
+        st.session_state.bom_signature = signature
+
+    if st.session_state.get('bom_signature') != signature:
+        return
+    resolution = get_frame('bom_resolution')
+    if resolution is None:
+        return
+
+    status_counts = resolution['Status'].value_counts()
+    metric_columns = st.columns(3)
+    for metric_column, status in zip(metric_columns, ['matched', 'ambiguous', 'not found']):
+        metric_column.metric(status.capitalize(), f"{status_counts.get(status, 0):,}")
+
+    render_paginated_grid(resolution, [], key="bom_results", signature=signature)
+
+    # The original BOM with the resolution appended to every line
+    resolved_bom = pd.concat(
+        [bom.reset_index(drop=True), resolution.drop(columns=['Line', 'Model', 'Manufacturer'])], axis=1
+    )
+    st.download_button(
+        label="Download Resolved BOM",
+        data=resolved_bom.to_csv(index=False),
+        file_name="resolved_bom.csv",
+        mime="text/csv",
+        key="download_resolved_bom"
+    )
@@ -0,0 +1,122 @@
+"""
+Server-side paginated grid
+
+Renders one page of a large DataFrame at a time. The row ordering for the
+current filters and sort state is computed once and cached in session state,
+so paging only slices the cached ordering and serializes the visible window.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Page sizes offered to the user
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+
+# Label of the default sort option
+DEFAULT_SORT_LABEL = "Default"
+
+def _column_sort_values(series):
+    """Get sortable values for a column, numeric when the column looks numeric"""
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.notna().sum() >= series.notna().sum() * 0.9:
+        return numeric
+    return series.astype(str).str.lower().where(series.notna())
+
+def compute_ordering(df, sort_column, ascending, default_order=None):
+    """
+    Compute the positional row ordering for a sort state
+
+    Args:
+        df: DataFrame to order
+        sort_column: Column to sort by, or DEFAULT_SORT_LABEL
+        ascending: Sort direction for a column sort
+        default_order: Optional callable returning positions for the default sort
+
+    Returns:
+        numpy array of row positions
+    """
+    if sort_column == DEFAULT_SORT_LABEL or sort_column not in df.columns:
+        if default_order is not None:
+            return np.asarray(default_order(df))
+        return np.arange(len(df))
+
+    values = _column_sort_values(df[sort_column]).reset_index(drop=True)
+    return values.sort_values(ascending=ascending, na_position='last', kind='stable').index.to_numpy()
+
+def get_cached_ordering(key, df, sort_column, ascending, signature, default_order=None):
+    """Get the ordering from session state, recomputing only when the sort state or data changed"""
+    cache_key = f"grid_order_{key}"
+    state = (signature, len(df), sort_column, ascending)
+    cached = st.session_state.get(cache_key)
+    if cached is None or cached['state'] != state:
+        cached = {
+            'state': state,
+            'order': compute_ordering(df, sort_column, ascending, default_order)
+        }
+        st.session_state[cache_key] = cached
+    return cached['order']
+
+def render_paginated_grid(df, columns, key, signature=None, default_order=None, default_sort_label=None):
+    """
+    Render a DataFrame one page at a time
+
+    Args:
+        df: DataFrame with all filtered rows
+        columns: Columns to display (all columns when empty)
+        key: Unique widget key prefix for this grid
+        signature: Hashable description of the filters that produced df
+        default_order: Optional callable giving the default row ordering
+        default_sort_label: Text describing the default ordering
+
+    Returns:
+        DataFrame with the rows shown on the current page
+    """
+    columns = columns or df.columns.tolist()
+    total_rows = len(df)
+
+    sort_col, dir_col, size_col, page_col = st.columns([3, 1, 1, 1])
+    default_sort_label = default_sort_label or DEFAULT_SORT_LABEL
+    with sort_col:
+        sort_choice = st.selectbox(
+            "Sort by",
+            [default_sort_label] + columns,
+            key=f"grid_sort_{key}"
+        )
+    sort_column = DEFAULT_SORT_LABEL if sort_choice == default_sort_label else sort_choice
+    with dir_col:
+        direction = st.selectbox(
+            "Order",
+            ["Descending", "Ascending"],
+            key=f"grid_direction_{key}",
+            disabled=sort_column == DEFAULT_SORT_LABEL
+        )
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZE_OPTIONS, index=2, key=f"grid_page_size_{key}")
+
+    total_pages = max(1, -(-total_rows // page_size))
+    with page_col:
+        page = st.number_input(
+            f"Page (of {total_pages})",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            step=1,
+            key=f"grid_page_{key}"
+        )
+
+    ascending = direction == "Ascending"
+    order = get_cached_ordering(key, df, sort_column, ascending, signature, default_order)
+
+    # Only the visible window is materialized and sent to the browser
+    start = (page - 1) * page_size
+    page_df = df.iloc[order[start:start + page_size]][columns]
+    st.dataframe(page_df, use_container_width=True, hide_index=True)
+
+    sort_description = default_sort_label if sort_column == DEFAULT_SORT_LABEL else f"{sort_column} ({direction.lower()})"
+    if total_rows:
+        st.caption(f"Rows {start + 1:,}–{min(start + page_size, total_rows):,} of {total_rows:,} · Sorted by {sort_description}")
+    else:
+        st.caption("No rows to display")
+
+    return page_df
@@ -1,12 +1,61 @@
 import os
 import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
 import pandas as pd
+from db.catalog_cache import get_source_signature
+from db.connection_pool import read_connection
+
+# Display name of each database column
+AVL_DISPLAY_NAMES = {
+    'item_id': 'ID',
+    'equipment_category': 'Equipment Category',
+    'manufacturer': 'Manufacturer',
+    'technology_type': 'Technology Type',
+    'model_sku': 'Model SKU',
+    'product_model_description': 'Product Model Description',
+    'racking_system_name': 'Racking System Name',
+    'power_rating_specification': 'Power Rating Specification',
+    'module_level_power_electronics': 'Module Level Power Electronics',
+    'system_configuration': 'System Configuration',
+    'racking_style': 'Racking Style',
+    'internal_notes': 'Internal Notes / Memo',
+    'additional_notes': 'Additional Notes',
+    'date_added': 'Date Added'
+}
+
+# Equipment categories the AVL is organized by, in tab order
+EQUIPMENT_CATEGORIES = [
+    "PV Module",
+    "PV Module + Inverter",
+    "Inverter",
+    "Optimizer",
+    "Battery",
+    "Battery Expansion",
+    "Non-Steel Roof Racking"
+]
 
 def get_db_path():
     """Get the path to the database file"""
     db_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(db_dir, 'approved_vendor_list.db')
 
+def get_avl_version():
+    """
+    Get the current version of the AVL database
+
+    Every write goes through a rollback journal, so the file signature
+    changes whenever the list does.
+
+    Returns:
+        tuple or None if the database doesn't exist yet
+    """
+    try:
+        return get_source_signature(get_db_path())
+    except OSError:
+        return None
+
 def create_approved_vendor_list_table():
     """Create the approved_vendor_list table if it doesn't exist"""
     with sqlite3.connect(get_db_path()) as conn:
@@ -31,147 +80,560 @@ def create_approved_vendor_list_table():
             date_added TEXT
         )
         ''')
+        create_natural_key_index(conn)
+        # Category tabs read the table in category order through this index
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_avl_equipment_category ON approved_vendor_list (equipment_category)")
+        create_search_index(conn)
+        create_audit_log(conn)
         conn.commit()
 
-def save_approved_vendor_list_data(df):
-    """Save approved vendor list data from DataFrame to database"""
+# Text columns covered by the full-text search index
+SEARCH_COLUMNS = [
+    'equipment_category', 'manufacturer', 'technology_type', 'model_sku',
+    'product_model_description', 'racking_system_name', 'power_rating_specification',
+    'module_level_power_electronics', 'system_configuration', 'racking_style',
+    'internal_notes', 'additional_notes'
+]
+
+# Short field names accepted in "field:term" searches
+SEARCH_FIELD_ALIASES = {
+    'category': 'equipment_category',
+    'mfr': 'manufacturer',
+    'model': 'model_sku',
+    'sku': 'model_sku',
+    'description': 'product_model_description',
+    'technology': 'technology_type',
+    'racking': 'racking_system_name',
+    'power': 'power_rating_specification',
+    'notes': 'internal_notes',
+}
+
+def create_search_index(conn):
+    """
+    Create the FTS5 index over the AVL text columns and the triggers that keep it current
+
+    The index is an external-content table, so it stores only the token
+    index and reads the text back from approved_vendor_list. It is built from
+    the existing rows the first time. SQLite builds without FTS5 skip it, and
+    search_approved_vendor_list returns None there.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'approved_vendor_list_fts'").fetchone():
+        return
+
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f"new.{column}" for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f"old.{column}" for column in SEARCH_COLUMNS)
+    try:
+        conn.execute(f'''
+        CREATE VIRTUAL TABLE approved_vendor_list_fts USING fts5(
+            {columns}, content='approved_vendor_list', content_rowid='item_id'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable for the approved vendor list: {e}")
+        return
+
+    conn.execute(f'''
+    CREATE TRIGGER avl_fts_insert AFTER INSERT ON approved_vendor_list BEGIN
+        INSERT INTO approved_vendor_list_fts (rowid, {columns}) VALUES (new.item_id, {new_values});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER avl_fts_delete AFTER DELETE ON approved_vendor_list BEGIN
+        INSERT INTO approved_vendor_list_fts (approved_vendor_list_fts, rowid, {columns})
+        VALUES ('delete', old.item_id, {old_values});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER avl_fts_update AFTER UPDATE ON approved_vendor_list BEGIN
+        INSERT INTO approved_vendor_list_fts (approved_vendor_list_fts, rowid, {columns})
+        VALUES ('delete', old.item_id, {old_values});
+        INSERT INTO approved_vendor_list_fts (rowid, {columns}) VALUES (new.item_id, {new_values});
+    END
+    ''')
+    conn.execute("INSERT INTO approved_vendor_list_fts (approved_vendor_list_fts) VALUES ('rebuild')")
+
+# Columns whose changes are recorded in the audit log
+AUDITED_COLUMNS = [column for column in AVL_DISPLAY_NAMES if column != 'item_id']
+
+def create_audit_log(conn):
+    """
+    Create the append-only audit log of AVL changes and the triggers that write it
+
+    Every insert and delete is logged as one entry holding the whole row as
+    JSON, and every update as one entry per changed column with its old and
+    new value. The actor comes from avl_audit_context, which writers set for
+    the duration of their transaction with audited_changes. Entries can't be
+    updated, and only compact_audit_log may delete them. changed_at is local
+    time, like every other timestamp the app writes and compares against.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_audit_log (
+        audit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL,
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+        actor TEXT,
+        action TEXT NOT NULL,
+        field TEXT,
+        old_value TEXT,
+        new_value TEXT
+    )
+    ''')
+    # Per-record history and "changes since" both read the log through an index range
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_avl_audit_item_time ON avl_audit_log (item_id, changed_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_avl_audit_time ON avl_audit_log (changed_at)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_audit_context (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        actor TEXT,
+        compacting INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO avl_audit_context (id) VALUES (1)")
+
+    actor = "(SELECT actor FROM avl_audit_context WHERE id = 1)"
+    new_row = 'json_object(' + ', '.join(f"'{column}', new.{column}" for column in AUDITED_COLUMNS) + ')'
+    old_row = 'json_object(' + ', '.join(f"'{column}', old.{column}" for column in AUDITED_COLUMNS) + ')'
+    changes = ' UNION ALL '.join(
+        f"SELECT '{column}' AS field, old.{column} AS old_value, new.{column} AS new_value" for column in AUDITED_COLUMNS
+    )
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS avl_audit_insert AFTER INSERT ON approved_vendor_list BEGIN
+        INSERT INTO avl_audit_log (item_id, actor, action, new_value)
+        VALUES (new.item_id, {actor}, 'insert', {new_row});
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS avl_audit_update AFTER UPDATE ON approved_vendor_list BEGIN
+        INSERT INTO avl_audit_log (item_id, actor, action, field, old_value, new_value)
+        SELECT new.item_id, {actor}, 'update', field, old_value, new_value
+        FROM ({changes})
+        WHERE old_value IS NOT new_value;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS avl_audit_delete AFTER DELETE ON approved_vendor_list BEGIN
+        INSERT INTO avl_audit_log (item_id, actor, action, old_value)
+        VALUES (old.item_id, {actor}, 'delete', {old_row});
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS avl_audit_log_no_update BEFORE UPDATE ON avl_audit_log BEGIN
+        SELECT RAISE(ABORT, 'avl_audit_log is append-only');
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS avl_audit_log_no_delete BEFORE DELETE ON avl_audit_log
+    WHEN NOT (SELECT compacting FROM avl_audit_context WHERE id = 1) BEGIN
+        SELECT RAISE(ABORT, 'avl_audit_log is append-only');
+    END
+    ''')
+
+@contextmanager
+def audited_changes(conn, actor):
+    """
+    Attribute the changes made on a connection to an actor in the audit log
+
+    The actor is set and cleared inside the connection's transaction, so it
+    can't leak to another writer.
+    """
+    conn.execute("UPDATE avl_audit_context SET actor = ? WHERE id = 1", (actor,))
+    try:
+        yield conn
+    finally:
+        conn.execute("UPDATE avl_audit_context SET actor = NULL WHERE id = 1")
+
+def build_search_query(term):
+    """
+    Turn a search box entry into an FTS5 query
+
+    Every word matches as a prefix, and all words must match. A word written
+    as field:value only matches in that column (e.g. manufacturer:qcells or
+    sku:q.peak); unknown fields are searched as plain text.
+
+    Returns:
+        str FTS5 query, or None if the entry has no searchable words
+    """
+    clauses = []
+    for word in str(term).split():
+        field = None
+        if ':' in word:
+            name, value = word.split(':', 1)
+            name = name.lower()
+            name = SEARCH_FIELD_ALIASES.get(name, name)
+            if name in SEARCH_COLUMNS and value:
+                field, word = name, value
+        # Quote each word so punctuation in model numbers isn't read as query syntax
+        word = word.replace('"', '')
+        if not any(character.isalnum() for character in word):
+            continue
+        phrase = f'"{word}"*'
+        clauses.append(f"{field} : {phrase}" if field else phrase)
+    return ' AND '.join(clauses) or None
+
+def search_approved_vendor_list(term, category=None, limit=None):
+    """
+    Search the AVL through its full-text index
+
+    Args:
+        term: Search box entry (see build_search_query)
+        category: Exact equipment category to search within, or None for all
+        limit: Maximum number of IDs to return, or None for all matches
+
+    Returns:
+        list of matching item IDs, best match first, or None if the index is unavailable
+    """
+    query = build_search_query(term)
+    if query is None:
+        return []
+
+    sql = '''
+    SELECT f.rowid
+    FROM approved_vendor_list_fts f
+    JOIN approved_vendor_list a ON a.item_id = f.rowid
+    WHERE approved_vendor_list_fts MATCH ?
+    '''
+    params = [query]
+    if category:
+        sql += " AND a.equipment_category = ?"
+        params.append(category)
+    sql += " ORDER BY f.rank"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    try:
+        with read_connection(get_db_path()) as conn:
+            return [row[0] for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search failed for {term!r}: {e}")
+        return None
+
+# Columns that identify an AVL item; imports upsert on their normalized values
+NATURAL_KEY_COLUMNS = ['equipment_category', 'manufacturer', 'model_sku']
+
+def natural_key_expressions(alias=None):
+    """
+    SQL expressions of the normalized natural key
+
+    Values are compared case-insensitively without surrounding spaces. Blank
+    parts become NULL, so rows missing part of the key never conflict.
+    """
+    prefix = f"{alias}." if alias else ''
+    return [f"nullif(lower(trim({prefix}{column})), '')" for column in NATURAL_KEY_COLUMNS]
+
+def create_natural_key_index(conn):
+    """
+    Create the unique natural-key index
+
+    Duplicates left by earlier append-only imports are collapsed to their most
+    recent row first. The rows removed, internal notes included, are copied to
+    avl_rejects with the ID of the row that was kept.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_avl_natural_key'"
+    ).fetchone()
+    if exists:
+        return
+
+    keys = natural_key_expressions()
+    duplicate_keys = ' AND '.join(f"{key} IS NOT NULL" for key in keys)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_rejects (
+        item_id INTEGER NOT NULL,
+        kept_item_id INTEGER,
+        reason TEXT NOT NULL,
+        record TEXT NOT NULL,
+        rejected_at TEXT NOT NULL
+    )
+    ''')
+    record = 'json_object(' + ', '.join(f"'{column}', duplicate.{column}" for column in AUDITED_COLUMNS) + ')'
+    conn.execute(f'''
+    INSERT INTO avl_rejects (item_id, kept_item_id, reason, record, rejected_at)
+    SELECT duplicate.item_id, kept.item_id, 'duplicate natural key', {record}, ?
+    FROM approved_vendor_list AS duplicate
+    JOIN (
+        SELECT max(item_id) AS item_id, {', '.join(f"{key} AS key_{i}" for i, key in enumerate(keys))}
+        FROM approved_vendor_list
+        WHERE {duplicate_keys}
+        GROUP BY {', '.join(keys)}
+    ) AS kept ON {' AND '.join(f"{key} = kept.key_{i}" for i, key in enumerate(natural_key_expressions('duplicate')))}
+    WHERE duplicate.item_id != kept.item_id
+    ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+    removed = conn.execute(f'''
+    DELETE FROM approved_vendor_list
+    WHERE {duplicate_keys}
+      AND item_id NOT IN (SELECT max(item_id) FROM approved_vendor_list GROUP BY {', '.join(keys)})
+    ''').rowcount
+    if removed:
+        print(f"Moved {removed} duplicate approved vendor list rows to avl_rejects before indexing the natural key")
+    conn.execute(f"CREATE UNIQUE INDEX idx_avl_natural_key ON approved_vendor_list ({', '.join(keys)})")
+
+# Database column of each import column, keyed by the lowercased column name
+IMPORT_COLUMN_MAPPING = {
+    'equipment category': 'equipment_category',
+    'manufacturer': 'manufacturer',
+    'technology type': 'technology_type',
+    'model sku': 'model_sku',
+    'product model description': 'product_model_description',
+    'racking system name': 'racking_system_name',
+    'power rating specification': 'power_rating_specification',
+    'module level power electronics': 'module_level_power_electronics',
+    'system configuration': 'system_configuration',
+    'racking style': 'racking_style',
+    'internal notes / memo': 'internal_notes',
+    'internal notes': 'internal_notes',
+    'additional notes': 'additional_notes',
+}
+
+# Columns written by an import, in table order
+IMPORT_COLUMNS = [
+    'equipment_category', 'manufacturer', 'technology_type', 'model_sku',
+    'product_model_description', 'racking_system_name', 'power_rating_specification',
+    'module_level_power_electronics', 'system_configuration', 'racking_style',
+    'internal_notes', 'additional_notes', 'date_added'
+]
+
+def clean_text_column(series):
+    """
+    Strip strings and remove NUL and non-breaking space characters column-wise
+
+    Non-string values are kept as they are and missing values become None.
+    """
+    series = series.astype(object)
+    if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'mixed', 'mixed-integer'):
+        return series.where(series.notna(), None)
+    cleaned = series.str.strip().str.replace('\x00', '', regex=False).str.replace('\xa0', ' ', regex=False)
+    # .str yields NaN for non-string cells, which keep their original value
+    series = cleaned.where(cleaned.notna(), series)
+    return series.where(series.notna(), None)
+
+def map_import_columns(column_names):
+    """
+    Match uploaded column names to database columns case-insensitively
+
+    Returns:
+        dict mapping database column to uploaded column name
+    """
+    columns = {}
+    for col in column_names:
+        db_column = IMPORT_COLUMN_MAPPING.get(str(col).lower().strip())
+        if db_column and db_column not in columns:
+            columns[db_column] = col
+    return columns
+
+def prepare_import_frame(df):
+    """
+    Map an uploaded frame to the database columns and clean it
+
+    Missing columns are filled with None and date_added is stamped once for
+    the whole import.
+
+    Returns:
+        DataFrame with exactly IMPORT_COLUMNS
+    """
+    columns = {db_column: clean_text_column(df[col]) for db_column, col in map_import_columns(df.columns).items()}
+    prepared = pd.DataFrame(columns, index=df.index)
+    prepared = prepared.reindex(columns=IMPORT_COLUMNS).astype(object)
+    prepared['date_added'] = pd.Timestamp.now().strftime('%Y-%m-%d')
+    return prepared.where(prepared.notna(), None).reset_index(drop=True)
+
+def get_update_columns(column_names):
+    """Columns an import may overwrite on existing rows: the uploaded ones outside the natural key"""
+    return [column for column in map_import_columns(column_names) if column not in NATURAL_KEY_COLUMNS]
+
+def create_import_table(conn):
+    """Create an empty temporary table for rows about to be imported on a connection"""
+    conn.execute("DROP TABLE IF EXISTS temp.avl_import")
+    conn.execute(f"CREATE TEMP TABLE avl_import ({', '.join(f'{column} TEXT' for column in IMPORT_COLUMNS)})")
+
+def stage_import(conn, prepared):
+    """
+    Load prepared rows into a temporary staging table on a connection
+
+    When a key repeats within the upload, only its last row is kept.
+    """
+    create_import_table(conn)
+    conn.executemany(
+        f"INSERT INTO temp.avl_import ({', '.join(IMPORT_COLUMNS)}) VALUES ({', '.join('?' for _ in IMPORT_COLUMNS)})",
+        prepared.itertuples(index=False, name=None)
+    )
+    deduplicate_import_table(conn)
+
+def deduplicate_import_table(conn):
+    """Keep only the last staged row of every natural key"""
+    keys = natural_key_expressions()
+    conn.execute(f'''
+    DELETE FROM temp.avl_import
+    WHERE {' AND '.join(f"{key} IS NOT NULL" for key in keys)}
+      AND rowid NOT IN (SELECT max(rowid) FROM temp.avl_import GROUP BY {', '.join(keys)})
+    ''')
+
+def _changed_condition(left, right, update_columns):
+    """SQL condition that is true when any update column differs between two rows"""
+    if not update_columns:
+        return '0'
+    return '(' + ' OR '.join(f"{left}.{column} IS NOT {right}.{column}" for column in update_columns) + ')'
+
+def classify_staged_import(conn, update_columns, sample_size=100):
+    """
+    Compare the staged rows with the table
+
+    Returns:
+        dict with inserted, updated and unchanged counts, plus a sample of the
+        new and changed rows
+    """
+    join = ' AND '.join(
+        f"{existing} = {staged}"
+        for existing, staged in zip(natural_key_expressions('a'), natural_key_expressions('i'))
+    )
+    changed = _changed_condition('a', 'i', update_columns)
+    from_clause = f"FROM temp.avl_import i LEFT JOIN approved_vendor_list a ON {join}"
+
+    counts = conn.execute(f'''
+    SELECT
+        COUNT(*) - COUNT(a.item_id),
+        COALESCE(SUM(a.item_id IS NOT NULL AND {changed}), 0),
+        COALESCE(SUM(a.item_id IS NOT NULL AND NOT {changed}), 0)
+    {from_clause}
+    ''').fetchone()
+
+    sample = pd.read_sql_query(f'''
+    SELECT CASE WHEN a.item_id IS NULL THEN 'insert' ELSE 'update' END AS action, a.item_id, i.*
+    {from_clause}
+    WHERE a.item_id IS NULL OR {changed}
+    LIMIT {int(sample_size)}
+    ''', conn)
+
+    return {'inserted': counts[0], 'updated': counts[1], 'unchanged': counts[2], 'sample': sample}
+
+def preview_approved_vendor_list_import(df):
+    """
+    Preview what importing a DataFrame would change without writing anything
+
+    Returns:
+        dict with inserted, updated and unchanged counts and a sample of the
+        rows that would change
+    """
     create_approved_vendor_list_table()
-    
+    prepared = prepare_import_frame(df)
+    conn = sqlite3.connect(get_db_path())
+    try:
+        stage_import(conn, prepared)
+        return classify_staged_import(conn, get_update_columns(df.columns))
+    finally:
+        conn.rollback()
+        conn.close()
+
+def import_approved_vendor_list_data(df, actor=None):
+    """
+    Upsert approved vendor list rows from a DataFrame in one transaction
+
+    Rows are matched on the normalized natural key. New keys are inserted,
+    existing keys get the uploaded non-key columns when any of them changed,
+    and identical rows are left alone (keeping their date_added).
+
+    Args:
+        df: Uploaded rows with standard (display) column names
+        actor: Who the changes are attributed to in the audit log
+
+    Returns:
+        dict with the inserted/updated/unchanged counts and the timings of the import
+    """
+    create_approved_vendor_list_table()
+    start = time.perf_counter()
+    prepared = prepare_import_frame(df)
+    prepared_at = time.perf_counter()
+
     with sqlite3.connect(get_db_path()) as conn:
-        # Map DataFrame columns to database columns
-        item_data = []
-        
-        # Handle column name case sensitivity and normalize column names
-        column_mapping = {}
-        for col in df.columns:
-            # Create a case-insensitive mapping
-            normalized_col = col.lower().strip()
-            if normalized_col == 'equipment category':
-                column_mapping[col] = 'Equipment Category'
-            elif normalized_col == 'manufacturer':
-                column_mapping[col] = 'Manufacturer'
-            elif normalized_col == 'technology type':
-                column_mapping[col] = 'Technology Type'
-            elif normalized_col == 'model sku':
-                column_mapping[col] = 'Model SKU'
-            elif normalized_col == 'product model description':
-                column_mapping[col] = 'Product Model Description'
-            elif normalized_col == 'racking system name':
-                column_mapping[col] = 'Racking System Name'
-            elif normalized_col == 'power rating specification':
-                column_mapping[col] = 'Power Rating Specification'
-            elif normalized_col == 'module level power electronics':
-                column_mapping[col] = 'Module Level Power Electronics'
-            elif normalized_col == 'system configuration':
-                column_mapping[col] = 'System Configuration'
-            elif normalized_col == 'racking style':
-                column_mapping[col] = 'Racking Style'
-            elif normalized_col == 'internal notes / memo' or normalized_col == 'internal notes':
-                column_mapping[col] = 'Internal Notes / Memo'
-            elif normalized_col == 'additional notes':
-                column_mapping[col] = 'Additional Notes'
-            else:
-                column_mapping[col] = col
-        
-        # Create a new DataFrame with normalized column names
-        normalized_df = df.rename(columns=column_mapping)
-        
-        for _, row in normalized_df.iterrows():
-            # Clean and sanitize string values
-            def clean_value(val):
-                if pd.isna(val):
-                    return None
-                if isinstance(val, str):
-                    # Replace problematic characters
-                    return val.strip().replace('\x00', '').replace('\xa0', ' ')
-                return val
-            
-            item = {
-                'equipment_category': clean_value(row.get('Equipment Category', None)),
-                'manufacturer': clean_value(row.get('Manufacturer', None)),
-                'technology_type': clean_value(row.get('Technology Type', None)),
-                'model_sku': clean_value(row.get('Model SKU', None)),
-                'product_model_description': clean_value(row.get('Product Model Description', None)),
-                'racking_system_name': clean_value(row.get('Racking System Name', None)),
-                'power_rating_specification': clean_value(row.get('Power Rating Specification', None)),
-                'module_level_power_electronics': clean_value(row.get('Module Level Power Electronics', None)),
-                'system_configuration': clean_value(row.get('System Configuration', None)),
-                'racking_style': clean_value(row.get('Racking Style', None)),
-                'internal_notes': clean_value(row.get('Internal Notes / Memo', None)),
-                'additional_notes': clean_value(row.get('Additional Notes', None)),
-                'date_added': pd.Timestamp.now().strftime('%Y-%m-%d')
-            }
-            item_data.append(item)
-        
-        # Insert data into database
-        cursor = conn.cursor()
-        for item in item_data:
-            cursor.execute('''
-            INSERT INTO approved_vendor_list (
-                equipment_category, manufacturer, technology_type, model_sku,
-                product_model_description, racking_system_name, power_rating_specification,
-                module_level_power_electronics, system_configuration, racking_style,
-                internal_notes, additional_notes, date_added
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                item['equipment_category'], item['manufacturer'], item['technology_type'],
-                item['model_sku'], item['product_model_description'], item['racking_system_name'],
-                item['power_rating_specification'], item['module_level_power_electronics'],
-                item['system_configuration'], item['racking_style'], item['internal_notes'],
-                item['additional_notes'], item['date_added']
-            ))
-        
-        conn.commit()
-        return len(item_data)
+        stage_import(conn, prepared)
+        stats = upsert_staged_import(conn, get_update_columns(df.columns), actor)
+    written_at = time.perf_counter()
+
+    stats.update({
+        'rows': len(prepared),
+        'prepare_seconds': prepared_at - start,
+        'write_seconds': written_at - prepared_at,
+        'total_seconds': written_at - start,
+    })
+    print(f"Imported {stats['rows']} approved vendor list rows in {stats['total_seconds']:.2f} seconds: "
+          f"{stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged "
+          f"(prepare {stats['prepare_seconds']:.2f}s, write {stats['write_seconds']:.2f}s)")
+    return stats
+
+def upsert_staged_import(conn, update_columns, actor=None):
+    """
+    Write the rows staged in temp.avl_import into the table
+
+    Args:
+        conn: Connection to the AVL database holding temp.avl_import
+        update_columns: Non-key columns the import may overwrite on existing rows
+        actor: Who the changes are attributed to in the audit log
+
+    Returns:
+        dict with the inserted, updated and unchanged counts
+    """
+    stats = classify_staged_import(conn, update_columns, sample_size=0)
+    del stats['sample']
+
+    keys = ', '.join(natural_key_expressions())
+    if update_columns:
+        on_conflict = (
+            f"DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in update_columns)} "
+            f"WHERE {_changed_condition('approved_vendor_list', 'excluded', update_columns)}"
+        )
+    else:
+        on_conflict = "DO NOTHING"
+    # "WHERE 1" keeps SQLite from reading ON CONFLICT as part of the SELECT
+    with audited_changes(conn, actor):
+        conn.execute(f'''
+        INSERT INTO approved_vendor_list ({', '.join(IMPORT_COLUMNS)})
+        SELECT {', '.join(IMPORT_COLUMNS)} FROM temp.avl_import WHERE 1
+        ON CONFLICT ({keys}) {on_conflict}
+        ''')
+    conn.execute("DROP TABLE temp.avl_import")
+    return stats
+
+def save_approved_vendor_list_data(df, actor=None):
+    """Save approved vendor list data from DataFrame to database, returning the number of rows inserted or updated"""
+    stats = import_approved_vendor_list_data(df, actor)
+    return stats['inserted'] + stats['updated']
 
 def load_approved_vendor_list_data():
     """Load approved vendor list data from database into a DataFrame"""
+    return load_approved_vendor_list_frame().drop(columns='ID')
+
+def load_approved_vendor_list_frame():
+    """
+    Load the whole approved vendor list with display column names and the 'ID' column
+
+    Rows come back in equipment_category index order, so each category is one
+    contiguous block.
+    """
     create_approved_vendor_list_table()
-    
-    with sqlite3.connect(get_db_path()) as conn:
-        query = "SELECT * FROM approved_vendor_list"
-        df = pd.read_sql_query(query, conn)
-        
-        # Remove item_id column from display if it exists
-        if 'item_id' in df.columns:
-            df = df.drop('item_id', axis=1)
-            
-        # Ensure column names match the standardized format
-        standard_columns = [
-            'equipment_category', 'manufacturer', 'technology_type', 'model_sku',
-            'product_model_description', 'racking_system_name', 'power_rating_specification',
-            'module_level_power_electronics', 'system_configuration', 'racking_style',
-            'internal_notes', 'additional_notes', 'date_added'
-        ]
-        
-        # Rename columns to title case for display
-        column_display_names = {
-            'equipment_category': 'Equipment Category',
-            'manufacturer': 'Manufacturer',
-            'technology_type': 'Technology Type',
-            'model_sku': 'Model SKU',
-            'product_model_description': 'Product Model Description',
-            'racking_system_name': 'Racking System Name',
-            'power_rating_specification': 'Power Rating Specification',
-            'module_level_power_electronics': 'Module Level Power Electronics',
-            'system_configuration': 'System Configuration',
-            'racking_style': 'Racking Style',
-            'internal_notes': 'Internal Notes / Memo',
-            'additional_notes': 'Additional Notes',
-            'date_added': 'Date Added'
-        }
-        
-        # Rename columns for display
-        df = df.rename(columns=column_display_names)
-            
-        return df
+    with read_connection(get_db_path()) as conn:
+        df = pd.read_sql_query("SELECT * FROM approved_vendor_list ORDER BY equipment_category, item_id", conn)
+    return df.rename(columns=AVL_DISPLAY_NAMES)
+
+def partition_by_category(df):
+    """
+    Split an AVL frame into one frame per exact equipment category
+
+    Returns:
+        dict mapping equipment category to its rows
+    """
+    if df.empty or 'Equipment Category' not in df.columns:
+        return {}
+    return {
+        category: partition.reset_index(drop=True)
+        for category, partition in df.groupby('Equipment Category', sort=False)
+    }
 
-def delete_approved_vendor_list_item(item_id):
+def delete_approved_vendor_list_item(item_id, actor=None):
     """Delete an approved vendor list item by ID"""
-    with sqlite3.connect(get_db_path()) as conn:
+    with sqlite3.connect(get_db_path()) as conn, audited_changes(conn, actor):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM approved_vendor_list WHERE item_id = ?", (item_id,))
-        conn.commit()
         return cursor.rowcount > 0
 
 def drop_approved_vendor_list_data():
@@ -0,0 +1,152 @@
+"""
+AVL change history
+
+Queries over the append-only audit log that triggers on approved_vendor_list
+write (see create_audit_log). Both the per-record history and the "changes
+since" feed are range scans on an index, so they stay fast as the log grows.
+Entries older than AUDIT_COMPACT_AFTER_DAYS are compacted periodically: the
+updates of each record field collapse into one net change, and the history
+of records deleted before the cutoff collapses into their delete entry.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from db.approved_vendor_list import AVL_DISPLAY_NAMES, create_approved_vendor_list_table, get_db_path
+from db.connection_pool import read_connection
+
+# Entries older than this many days are compacted
+AUDIT_COMPACT_AFTER_DAYS = float(os.environ.get('AVL_AUDIT_COMPACT_AFTER_DAYS', '90'))
+
+# Most entries returned by a history query
+HISTORY_LIMIT = 500
+
+HISTORY_COLUMNS = "audit_id, item_id, changed_at, actor, action, field, old_value, new_value"
+
+def _format_history(df):
+    """Show field names the way the AVL tabs do"""
+    df['field'] = df['field'].map(lambda field: AVL_DISPLAY_NAMES.get(field, field))
+    return df.rename(columns={
+        'audit_id': 'Entry',
+        'item_id': 'ID',
+        'changed_at': 'Changed At',
+        'actor': 'Changed By',
+        'action': 'Action',
+        'field': 'Field',
+        'old_value': 'Old Value',
+        'new_value': 'New Value',
+    })
+
+def get_record_history(item_id, limit=HISTORY_LIMIT):
+    """
+    Get the change history of one AVL record, newest first
+
+    Returns:
+        DataFrame of audit entries
+    """
+    create_approved_vendor_list_table()
+    with read_connection(get_db_path()) as conn:
+        df = pd.read_sql_query(
+            f"SELECT {HISTORY_COLUMNS} FROM avl_audit_log WHERE item_id = ? "
+            "ORDER BY changed_at DESC, audit_id DESC LIMIT ?",
+            conn, params=(int(item_id), int(limit))
+        )
+    return _format_history(df)
+
+def get_changes_since(since, limit=HISTORY_LIMIT, actions=None):
+    """
+    Get AVL changes made at or after a point in time, newest first
+
+    Args:
+        since: date, datetime or 'YYYY-MM-DD[ HH:MM:SS]' string, in local time
+        limit: Most entries to return
+        actions: Optional list of actions to include ('insert', 'update', 'delete')
+
+    Returns:
+        DataFrame of audit entries
+    """
+    if not isinstance(since, str):
+        since = since.strftime('%Y-%m-%d %H:%M:%S')
+    conditions = ["changed_at >= ?"]
+    params = [since]
+    if actions:
+        conditions.append(f"action IN ({','.join('?' for _ in actions)})")
+        params.extend(actions)
+
+    create_approved_vendor_list_table()
+    with read_connection(get_db_path()) as conn:
+        df = pd.read_sql_query(
+            f"SELECT {HISTORY_COLUMNS} FROM avl_audit_log WHERE {' AND '.join(conditions)} "
+            "ORDER BY changed_at DESC, audit_id DESC LIMIT ?",
+            conn, params=params + [int(limit)]
+        )
+    return _format_history(df)
+
+def compact_audit_log(older_than_days=AUDIT_COMPACT_AFTER_DAYS):
+    """
+    Compact audit entries older than a cutoff
+
+    Records deleted before the cutoff keep only their delete entry, which
+    holds the whole row. For the other records, the updates of each field
+    before the cutoff become one entry from the first old value to the last
+    new value, attributed to the last actor, or disappear if they net out.
+
+    Returns:
+        dict with the entries removed and the compacted entries written
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    create_approved_vendor_list_table()
+    with sqlite3.connect(get_db_path()) as conn:
+        conn.execute("UPDATE avl_audit_context SET compacting = 1 WHERE id = 1")
+        try:
+            before = conn.execute("SELECT COUNT(*) FROM avl_audit_log WHERE changed_at < ?", (cutoff,)).fetchone()[0]
+
+            conn.execute('''
+            DELETE FROM avl_audit_log
+            WHERE changed_at < ? AND action != 'delete'
+              AND item_id IN (SELECT item_id FROM avl_audit_log WHERE action = 'delete' AND changed_at < ?)
+            ''', (cutoff, cutoff))
+
+            # Net change of every field that changed more than once before the cutoff
+            conn.execute("DROP TABLE IF EXISTS temp.avl_audit_compacted")
+            conn.execute('''
+            CREATE TEMP TABLE avl_audit_compacted AS
+            SELECT item_id, field,
+                   MAX(changed_at) AS changed_at,
+                   MAX(CASE WHEN last_rank = 1 THEN actor END) AS actor,
+                   MAX(CASE WHEN first_rank = 1 THEN old_value END) AS old_value,
+                   MAX(CASE WHEN last_rank = 1 THEN new_value END) AS new_value
+            FROM (
+                SELECT item_id, field, changed_at, actor, old_value, new_value,
+                       ROW_NUMBER() OVER (PARTITION BY item_id, field ORDER BY changed_at, audit_id) AS first_rank,
+                       ROW_NUMBER() OVER (PARTITION BY item_id, field ORDER BY changed_at DESC, audit_id DESC) AS last_rank
+                FROM avl_audit_log
+                WHERE action = 'update' AND changed_at < ?
+            )
+            GROUP BY item_id, field
+            HAVING COUNT(*) > 1
+            ''', (cutoff,))
+            conn.execute('''
+            DELETE FROM avl_audit_log
+            WHERE action = 'update' AND changed_at < ?
+              AND (item_id, field) IN (SELECT item_id, field FROM temp.avl_audit_compacted)
+            ''', (cutoff,))
+            written = conn.execute('''
+            INSERT INTO avl_audit_log (item_id, changed_at, actor, action, field, old_value, new_value)
+            SELECT item_id, changed_at, actor, 'update', field, old_value, new_value
+            FROM temp.avl_audit_compacted
+            WHERE old_value IS NOT new_value
+            ORDER BY changed_at
+            ''').rowcount
+            conn.execute("DROP TABLE temp.avl_audit_compacted")
+
+            after = conn.execute("SELECT COUNT(*) FROM avl_audit_log WHERE changed_at < ?", (cutoff,)).fetchone()[0]
+        finally:
+            conn.execute("UPDATE avl_audit_context SET compacting = 0 WHERE id = 1")
+
+    stats = {'removed': before - after + written, 'written': written}
+    print(f"Compacted AVL audit log before {cutoff}: {stats['removed']} entries removed, {stats['written']} written")
+    return stats
@@ -0,0 +1,216 @@
+"""
+Staging area for streamed AVL uploads
+
+Uploaded vendor lists are written here chunk by chunk as they are parsed,
+together with the validation error of every rejected row, instead of being
+held in session state. The staging database is a separate file, so staging
+an upload doesn't change the version of the approved vendor list and reload
+it in every session. Saving an upload upserts its valid rows into the AVL in
+one transaction and clears them from staging.
+"""
+
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from db.approved_vendor_list import (
+    AVL_DISPLAY_NAMES,
+    EQUIPMENT_CATEGORIES,
+    IMPORT_COLUMNS,
+    classify_staged_import,
+    create_approved_vendor_list_table,
+    create_import_table,
+    deduplicate_import_table,
+    get_db_path as get_avl_db_path,
+    prepare_import_frame,
+    upsert_staged_import,
+)
+
+# Staged uploads that were never saved are dropped after this many hours
+STAGING_TTL_HOURS = 24
+
+def get_staging_db_path():
+    """Get the path to the staging database file"""
+    db_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(db_dir, 'avl_staging.db')
+
+def create_staging_table(conn):
+    """Create the avl_upload_staging table if it doesn't exist"""
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS avl_upload_staging (
+        upload_id TEXT NOT NULL,
+        row_number INTEGER NOT NULL,
+        {', '.join(f'{column} TEXT' for column in IMPORT_COLUMNS)},
+        error TEXT,
+        staged_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (upload_id, row_number)
+    )
+    ''')
+
+def validate_import_frame(prepared):
+    """
+    Validate prepared import rows column-wise
+
+    Equipment categories are matched case-insensitively and rewritten to
+    their canonical spelling.
+
+    Returns:
+        tuple: (prepared rows, Series of error messages with None for valid rows)
+    """
+    prepared = prepared.copy()
+    canonical = {category.lower(): category for category in EQUIPMENT_CATEGORIES}
+    category = prepared['equipment_category'].astype(str).str.strip().str.lower().map(canonical)
+    prepared['equipment_category'] = category.where(category.notna(), prepared['equipment_category'])
+
+    checks = [
+        (prepared['equipment_category'].isna(), 'missing equipment category'),
+        (prepared['equipment_category'].notna() & category.isna(), 'unknown equipment category'),
+        (prepared['manufacturer'].isna() | (prepared['manufacturer'] == ''), 'missing manufacturer'),
+    ]
+    errors = pd.Series('', index=prepared.index, dtype=object)
+    for failed, message in checks:
+        errors = errors.where(~failed, errors + '; ' + message)
+    errors = errors.str.lstrip('; ')
+    return prepared, errors.where(errors != '', None)
+
+def stage_upload_chunk(conn, upload_id, first_row_number, chunk):
+    """
+    Clean, validate and stage one chunk of an upload on a staging connection
+
+    Args:
+        conn: Connection to the staging database
+        upload_id: ID of the upload the chunk belongs to
+        first_row_number: File row number of the chunk's first data row (1-based)
+        chunk: Rows with standard (display) column names
+
+    Returns:
+        tuple: (valid row count, rejected row count)
+    """
+    prepared, errors = validate_import_frame(prepare_import_frame(chunk))
+    prepared.insert(0, 'row_number', range(first_row_number, first_row_number + len(prepared)))
+    prepared.insert(0, 'upload_id', upload_id)
+    prepared['error'] = errors.to_numpy()
+
+    columns = ['upload_id', 'row_number'] + IMPORT_COLUMNS + ['error']
+    conn.executemany(
+        f"INSERT INTO avl_upload_staging ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        prepared[columns].itertuples(index=False, name=None)
+    )
+    rejected = int(errors.notna().sum())
+    return len(prepared) - rejected, rejected
+
+def clear_staged_upload(upload_id):
+    """Remove the staged rows of an upload"""
+    with sqlite3.connect(get_staging_db_path()) as conn:
+        create_staging_table(conn)
+        conn.execute("DELETE FROM avl_upload_staging WHERE upload_id = ?", (upload_id,))
+
+def clear_stale_uploads(max_age_hours=STAGING_TTL_HOURS):
+    """
+    Remove uploads staged more than max_age_hours ago that were never saved
+
+    Returns:
+        int number of rows removed
+    """
+    with sqlite3.connect(get_staging_db_path()) as conn:
+        create_staging_table(conn)
+        return conn.execute(
+            "DELETE FROM avl_upload_staging WHERE staged_at < datetime('now', ?)",
+            (f"-{int(max_age_hours)} hours",)
+        ).rowcount
+
+def read_staged_rows(upload_id, limit=100, rejected=False):
+    """
+    Read a bounded preview of an upload's staged rows
+
+    Args:
+        upload_id: ID of the upload
+        limit: Maximum number of rows to return
+        rejected: Return rejected rows (with their error) instead of valid ones
+
+    Returns:
+        DataFrame with the file row number and display column names
+    """
+    columns = ['row_number'] + IMPORT_COLUMNS + (['error'] if rejected else [])
+    with sqlite3.connect(get_staging_db_path()) as conn:
+        create_staging_table(conn)
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(columns)} FROM avl_upload_staging "
+            f"WHERE upload_id = ? AND error IS {'NOT ' if rejected else ''}NULL "
+            "ORDER BY row_number LIMIT ?",
+            conn,
+            params=(upload_id, int(limit))
+        )
+    return df.rename(columns={**AVL_DISPLAY_NAMES, 'row_number': 'Row', 'error': 'Error'})
+
+def export_staged_upload(upload_id):
+    """
+    Export the valid staged rows of an upload as CSV text
+
+    Returns:
+        str CSV with display column names
+    """
+    with sqlite3.connect(get_staging_db_path()) as conn:
+        create_staging_table(conn)
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(IMPORT_COLUMNS)} FROM avl_upload_staging "
+            "WHERE upload_id = ? AND error IS NULL ORDER BY row_number",
+            conn,
+            params=(upload_id,)
+        )
+    return df.rename(columns=AVL_DISPLAY_NAMES).to_csv(index=False)
+
+def _load_staged_upload(conn, upload_id):
+    """Copy an upload's valid staged rows into temp.avl_import on an AVL connection"""
+    conn.execute("ATTACH DATABASE ? AS staging", (get_staging_db_path(),))
+    create_import_table(conn)
+    if conn.execute("SELECT 1 FROM staging.sqlite_master WHERE name = 'avl_upload_staging'").fetchone():
+        conn.execute(f'''
+        INSERT INTO temp.avl_import ({', '.join(IMPORT_COLUMNS)})
+        SELECT {', '.join(IMPORT_COLUMNS)} FROM staging.avl_upload_staging
+        WHERE upload_id = ? AND error IS NULL
+        ORDER BY row_number
+        ''', (upload_id,))
+    deduplicate_import_table(conn)
+
+def preview_staged_upload(upload_id, update_columns):
+    """
+    Preview what saving a staged upload would change without writing anything
+
+    Returns:
+        dict with inserted, updated and unchanged counts and a sample of the
+        rows that would change
+    """
+    create_approved_vendor_list_table()
+    conn = sqlite3.connect(get_avl_db_path())
+    try:
+        _load_staged_upload(conn, upload_id)
+        return classify_staged_import(conn, update_columns)
+    finally:
+        conn.rollback()
+        conn.close()
+
+def import_staged_upload(upload_id, update_columns, actor=None):
+    """
+    Upsert the valid staged rows of an upload into the AVL and clear them from staging
+
+    Args:
+        upload_id: ID of the upload
+        update_columns: Non-key columns the upload may overwrite on existing rows
+        actor: Who the changes are attributed to in the audit log
+
+    Returns:
+        dict with the inserted/updated/unchanged counts and the timing of the import
+    """
+    create_approved_vendor_list_table()
+    start = time.perf_counter()
+    with sqlite3.connect(get_avl_db_path()) as conn:
+        _load_staged_upload(conn, upload_id)
+        stats = upsert_staged_import(conn, update_columns, actor)
+    stats['total_seconds'] = time.perf_counter() - start
+    clear_staged_upload(upload_id)
+    print(f"Imported staged upload {upload_id} in {stats['total_seconds']:.2f} seconds: "
+          f"{stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged")
+    return stats
@@ -0,0 +1,191 @@
+"""
+Bulk BOM resolution against the CEC catalogs
+
+Resolves a whole bill of materials at once instead of one search per line.
+Model numbers of every catalog are normalized into an in-memory index that is
+built once per catalog version; BOM lines are deduplicated, normalized the same
+way and hash-joined to the index through the same tiers as the AVL ↔ CEC match
+(normalized key, base key, longest prefix). Lines that still don't resolve get
+fuzzy suggestions from a trigram index over the catalogs' base keys, probed
+through each line's rarest trigrams so a miss only scores a few candidates.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from db.catalog_cache import get_dataset_versions
+from db.catalog_db import get_catalog_pool
+from db.catalogs import CATALOGS
+from db.cec_matches import (
+    LISTED_MIN_CONFIDENCE,
+    find_candidates,
+    load_cec_models,
+    manufacturer_keys,
+    normalize_model_numbers,
+)
+
+# Suggestions offered per unresolved line
+SUGGESTION_COUNT = 3
+
+# Lowest trigram similarity offered as a suggestion
+MIN_SUGGESTION_SCORE = 0.5
+
+# Rarest trigrams of a model key used to collect fuzzy candidates
+SUGGESTION_PROBE_TRIGRAMS = 8
+
+# Candidates sharing the most probe trigrams that are scored in full
+SUGGESTION_CANDIDATES = 50
+
+_model_index = None
+_model_index_versions = None
+_index_lock = threading.Lock()
+
+def _key_trigrams(key):
+    """Trigrams of a model key, padded so short keys still have some"""
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def index_model_records(records):
+    """
+    Index catalog records for lookups
+
+    Args:
+        records: DataFrame with catalog, cec_id, cec_manufacturer and cec_model columns
+
+    Returns:
+        dict with the normalized 'records', the distinct 'products' (one row
+        per catalog and base key) and the 'trigrams' posting lists over products
+    """
+    records['model_key'], records['base_key'] = normalize_model_numbers(records['cec_model'])
+    records['manufacturer_key'] = manufacturer_keys(records['cec_manufacturer'])
+
+    products = records.dropna(subset=['base_key']).drop_duplicates(['catalog', 'base_key'])
+    products = products[['catalog', 'base_key', 'cec_manufacturer', 'cec_model']].reset_index(drop=True)
+    trigrams = defaultdict(list)
+    for position, key in enumerate(products['base_key']):
+        for gram in _key_trigrams(key):
+            trigrams[gram].append(position)
+
+    return {'records': records, 'products': products, 'trigrams': dict(trigrams)}
+
+def build_model_index():
+    """Read the model numbers of every catalog and index them for lookups"""
+    with get_catalog_pool().connection() as conn:
+        records = load_cec_models(conn, list(CATALOGS))
+    return index_model_records(records)
+
+def get_model_index():
+    """Get the model index, rebuilding it when a catalog database changed"""
+    global _model_index, _model_index_versions
+    versions = get_dataset_versions()
+    with _index_lock:
+        if _model_index is None or _model_index_versions != versions:
+            start = time.perf_counter()
+            _model_index = build_model_index()
+            _model_index_versions = versions
+            print(f"Built CEC model index of {len(_model_index['records'])} records "
+                  f"in {time.perf_counter() - start:.2f} seconds")
+        return _model_index
+
+def suggest_models(base_key, index, limit=SUGGESTION_COUNT):
+    """
+    Find the catalog products whose base key is most similar to a model key
+
+    Returns:
+        list of (catalog, manufacturer, model number, similarity) tuples, best first
+    """
+    grams = _key_trigrams(base_key)
+    postings = index['trigrams']
+    probes = sorted((gram for gram in grams if gram in postings), key=lambda gram: len(postings[gram]))
+    hits = Counter()
+    for gram in probes[:SUGGESTION_PROBE_TRIGRAMS]:
+        hits.update(postings[gram])
+
+    products = index['products']
+    scored = []
+    for position, _ in hits.most_common(SUGGESTION_CANDIDATES):
+        candidate_grams = _key_trigrams(products.at[position, 'base_key'])
+        score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+        if score >= MIN_SUGGESTION_SCORE:
+            scored.append((score, position))
+    scored.sort(reverse=True)
+    return [
+        (products.at[position, 'catalog'], products.at[position, 'cec_manufacturer'],
+         products.at[position, 'cec_model'], round(score, 2))
+        for score, position in scored[:limit]
+    ]
+
+def resolve_bom(models, manufacturers=None):
+    """
+    Resolve BOM lines to CEC records in one pass
+
+    Args:
+        models: Series of model numbers, one per BOM line
+        manufacturers: Optional Series of manufacturer names aligned with models
+
+    Returns:
+        tuple: (DataFrame with one resolution per line, DataFrame of the best
+        matching records of every resolved line)
+    """
+    start = time.perf_counter()
+    index = get_model_index()
+
+    lines = pd.DataFrame({
+        'line': range(1, len(models) + 1),
+        'model': models.to_numpy(),
+        'manufacturer': manufacturers.to_numpy() if manufacturers is not None else None,
+    })
+    lines['model_key'], lines['base_key'] = normalize_model_numbers(lines['model'])
+    lines['manufacturer_key'] = manufacturer_keys(lines['manufacturer']) if manufacturers is not None else None
+
+    # BOMs repeat parts, so each distinct model/manufacturer is resolved once
+    key_columns = ['model_key', 'base_key', 'manufacturer_key']
+    distinct = lines[key_columns].drop_duplicates().reset_index(drop=True)
+    distinct['item_id'] = distinct.index
+    lines = lines.merge(distinct, on=key_columns, how='left', sort=False)
+
+    candidates = find_candidates(distinct, index['records'])
+    best = candidates[candidates['confidence'] == candidates.groupby('item_id')['confidence'].transform('max')]
+    # The same product listed in several catalogs, or in voltage variants, is one match
+    record_keys = index['records'][['catalog', 'cec_id', 'manufacturer_key']].drop_duplicates(['catalog', 'cec_id'])
+    product_manufacturer = best[['catalog', 'cec_id']].merge(record_keys, on=['catalog', 'cec_id'], how='left')
+    best = best.assign(
+        product=product_manufacturer['manufacturer_key'].astype(object).fillna('').to_numpy() + '\x1f'
+        + best['cec_base_key'].fillna(best['cec_id']).astype(str)
+    )
+    summary = best.groupby('item_id').agg(
+        match_type=('match_type', 'first'),
+        confidence=('confidence', 'max'),
+        matches=('product', 'nunique'),
+        catalog=('catalog', 'first'),
+        cec_manufacturer=('cec_manufacturer', 'first'),
+        cec_model=('cec_model', 'first'),
+    )
+    distinct = distinct.join(summary, on='item_id')
+    distinct['status'] = 'not found'
+    found = distinct['matches'].notna()
+    distinct.loc[found, 'status'] = 'ambiguous'
+    distinct.loc[found & (distinct['matches'] == 1) & (distinct['confidence'] >= LISTED_MIN_CONFIDENCE), 'status'] = 'matched'
+
+    # Suggestions only for the misses, keyed by their distinct base key
+    misses = distinct.loc[~found, 'base_key'].dropna().unique()
+    suggestions = {
+        key: '; '.join(f"{model} ({manufacturer}, {catalog}, {score:.2f})"
+                       for catalog, manufacturer, model, score in suggest_models(key, index)) or None
+        for key in misses
+    }
+    distinct['suggestions'] = distinct['base_key'].map(suggestions).where(~found)
+
+    result = lines[['line', 'model', 'manufacturer', 'item_id']].merge(
+        distinct.drop(columns=key_columns), on='item_id', how='left'
+    ).sort_values('line')
+    result['matches'] = result['matches'].fillna(0).astype(int)
+    matches = lines[['line', 'item_id']].merge(best.drop(columns='product'), on='item_id').drop(columns='item_id')
+
+    elapsed = time.perf_counter() - start
+    print(f"Resolved {len(lines)} BOM lines ({len(distinct)} distinct) in {elapsed:.2f} seconds: "
+          f"{result['status'].value_counts().to_dict()}")
+    return result.drop(columns='item_id').reset_index(drop=True), matches.sort_values('line').reset_index(drop=True)
@@ -0,0 +1,188 @@
+"""
+Prebuilt catalog snapshots
+
+Loading a catalog means reading the whole table, trimming the date columns and
+building the lookup structures the UI filters with. This module does that work
+once per database version and stores the result as a pickle in the cache
+directory, so start_app.py can warm every catalog before the server starts and
+the first visitor to each tab doesn't pay the cold-load cost.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from db.catalog_stats import get_column_stats
+from db.catalogs import CATALOGS, get_catalog_db_path
+from db.connection_pool import read_connection
+from db.manufacturers import read_manufacturer_lookup
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+
+# Separator used when joining searchable fields, so a search can't match across fields
+SEARCH_FIELD_SEPARATOR = '\n'
+
+def get_snapshot_path(table_name):
+    """Get the path to the cached snapshot for a catalog table"""
+    return os.path.join(CACHE_DIR, f"{table_name}.pkl")
+
+def get_source_signature(db_path):
+    """Identify the current version of a database file by modification time and size"""
+    stat = os.stat(db_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def get_dataset_version(equipment_type):
+    """
+    Get the current version of a catalog database
+
+    Every completed download rewrites the database file, so its signature
+    changes exactly when the catalog does. This is a single stat call, cheap
+    enough to check on every rerun.
+
+    Returns:
+        tuple or None if the database doesn't exist yet
+    """
+    db_path = get_catalog_db_path(CATALOGS[equipment_type]['db_name'])
+    try:
+        return get_source_signature(db_path)
+    except OSError:
+        return None
+
+def get_dataset_versions():
+    """Get the current version of every catalog database, keyed by equipment type"""
+    return {equipment_type: get_dataset_version(equipment_type) for equipment_type in CATALOGS}
+
+def read_catalog_frame(db_path, table_name, date_columns):
+    """
+    Read a catalog table and trim its date columns to YYYY-MM-DD
+
+    Returns:
+        DataFrame with processed date columns
+    """
+    with read_connection(db_path) as conn:
+        df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
+
+    # Handle date columns - they're already stored as strings in the database
+    for col in date_columns:
+        if col in df.columns:
+            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
+            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
+
+    return df
+
+def compact_frame(df):
+    """Share one string object per distinct value in repetitive text columns"""
+    for col in df.columns:
+        values = df[col]
+        if values.dtype != object:
+            continue
+        distinct = values.dropna().unique()
+        if len(distinct) <= len(values) * 0.5:
+            lookup = {value: value for value in distinct}
+            df[col] = values.map(lookup)
+    return df
+
+def build_search_index(df, manufacturer_column, model_column):
+    """Build a lowercase manufacturer/model haystack aligned with the frame's index"""
+    manufacturer = df[manufacturer_column].astype(str) if manufacturer_column in df.columns else ''
+    model = df[model_column].astype(str) if model_column in df.columns else ''
+    return (manufacturer + SEARCH_FIELD_SEPARATOR + model).str.lower()
+
+def build_facet_index(df, manufacturer_column, manufacturer_ids=None):
+    """
+    Build the sorted manufacturer facet with item counts
+
+    Catalogs with canonical manufacturer IDs are counted per canonical name,
+    so every spelling of a manufacturer lands in one entry.
+    """
+    if manufacturer_ids and 'manufacturer_id' in df.columns:
+        names_by_id = {manufacturer_id: name for name, manufacturer_id in manufacturer_ids.items()}
+        counts = df['manufacturer_id'].dropna().astype('int64').value_counts()
+        counts.index = counts.index.map(names_by_id)
+        return counts[counts.index.notna()].sort_index()
+    if manufacturer_column not in df.columns:
+        return pd.Series(dtype='int64')
+    counts = df[manufacturer_column].dropna().astype(str).value_counts()
+    return counts.sort_index()
+
+def read_manufacturer_ids(db_path):
+    """Get the canonical manufacturer names and IDs a catalog database uses"""
+    with read_connection(db_path) as conn:
+        return read_manufacturer_lookup(conn)
+
+def build_catalog_snapshot(equipment_type):
+    """
+    Load, compact and index one catalog
+
+    Returns:
+        dict with the DataFrame ('data'), search index ('search'),
+        manufacturer facet ('manufacturers'), canonical manufacturer IDs
+        ('manufacturer_ids'), column profiles
+        ('column_stats') and source signature
+    """
+    catalog = CATALOGS[equipment_type]
+    db_path = get_catalog_db_path(catalog['db_name'])
+    signature = get_source_signature(db_path)
+
+    df = read_catalog_frame(db_path, catalog['table_name'], catalog['date_columns'])
+    df = compact_frame(df)
+    manufacturer_ids = read_manufacturer_ids(db_path)
+
+    return {
+        'signature': signature,
+        'data': df,
+        'search': build_search_index(df, catalog['manufacturer_column'], catalog['model_column']),
+        'manufacturers': build_facet_index(df, catalog['manufacturer_column'], manufacturer_ids),
+        'manufacturer_ids': manufacturer_ids,
+        'column_stats': get_column_stats(equipment_type),
+    }
+
+def load_catalog_snapshot(equipment_type):
+    """Get a catalog snapshot from the cache directory, rebuilding it if the database changed"""
+    catalog = CATALOGS[equipment_type]
+    db_path = get_catalog_db_path(catalog['db_name'])
+    snapshot_path = get_snapshot_path(catalog['table_name'])
+
+    if os.path.exists(snapshot_path):
+        try:
+            snapshot = pd.read_pickle(snapshot_path)
+            if snapshot.get('signature') == get_source_signature(db_path):
+                return snapshot
+        except Exception as e:
+            print(f"Ignoring unreadable snapshot {snapshot_path}: {e}")
+
+    snapshot = build_catalog_snapshot(equipment_type)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{snapshot_path}.tmp"
+        pd.to_pickle(snapshot, temp_path)
+        os.replace(temp_path, snapshot_path)
+    except OSError as e:
+        print(f"Could not write snapshot {snapshot_path}: {e}")
+    return snapshot
+
+def warm_catalog_caches():
+    """
+    Build snapshots for every catalog and log how long each one took
+
+    Returns:
+        dict mapping equipment type to warm time in seconds (None if it failed)
+    """
+    print("Warming catalog caches...")
+    timings = {}
+    start_time = time.time()
+    for equipment_type in CATALOGS:
+        dataset_start = time.perf_counter()
+        try:
+            snapshot = load_catalog_snapshot(equipment_type)
+        except Exception as e:
+            timings[equipment_type] = None
+            print(f"Warmup failed for {equipment_type}: {e}")
+            continue
+        elapsed = time.perf_counter() - dataset_start
+        timings[equipment_type] = elapsed
+        print(f"Warmed {equipment_type}: {len(snapshot['data'])} rows, "
+              f"{len(snapshot['manufacturers'])} manufacturers in {elapsed:.2f} seconds")
+    print(f"Catalog warmup complete in {time.time() - start_time:.2f} seconds")
+    return timings
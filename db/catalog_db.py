@@ -0,0 +1,174 @@
+"""
+Attached catalog database
+
+Each catalog still lives in its own database file, since the downloaders
+rewrite, back up and version them one at a time. For queries that span
+catalogs, this module opens one connection with every catalog database
+ATTACHed under its table name (and the approved vendor list as "avl"), so
+joins such as AVL ↔ CEC or modules ↔ inverters run as a single SQL
+statement, e.g.
+
+    SELECT a.manufacturer, m."Model Number"
+    FROM avl.approved_vendor_list a
+    JOIN pv_modules.pv_modules m ON m."Manufacturer" = a.manufacturer
+
+Backups and WAL checkpoints of all catalogs also go through one connection.
+"""
+
+import os
+import sqlite3
+from urllib.parse import quote
+
+import pandas as pd
+
+from db.approved_vendor_list import get_db_path as get_avl_db_path
+from db.catalogs import CATALOGS, get_catalog_db_path
+from db.connection_pool import READ_PRAGMAS, ReadConnectionPool
+
+AVL_SCHEMA = 'avl'
+
+def get_catalog_schemas():
+    """
+    Get the schema name and database file of every attachable catalog
+
+    Returns:
+        dict mapping schema name to database path
+    """
+    schemas = {catalog['table_name']: get_catalog_db_path(catalog['db_name']) for catalog in CATALOGS.values()}
+    schemas[AVL_SCHEMA] = get_avl_db_path()
+    return schemas
+
+def attach_catalogs(conn, read_only=True):
+    """
+    Attach every existing catalog database to a connection
+
+    Catalogs that haven't been downloaded yet are skipped.
+
+    Returns:
+        list of the attached schema names
+    """
+    attached = []
+    mode = 'ro' if read_only else 'rw'
+    for schema, db_path in get_catalog_schemas().items():
+        if not os.path.exists(db_path):
+            continue
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{quote(os.path.abspath(db_path))}?mode={mode}",))
+        attached.append(schema)
+    return attached
+
+class AttachedCatalogPool(ReadConnectionPool):
+    """Read-only pool whose connections have every catalog attached"""
+
+    def __init__(self):
+        super().__init__(':memory:')
+        self.db_path = 'catalogs (attached)'
+
+    def _open_connection(self):
+        conn = sqlite3.connect('file::memory:', uri=True, check_same_thread=False, timeout=self.timeout)
+        for schema in attach_catalogs(conn):
+            for pragma, value in READ_PRAGMAS.items():
+                if pragma == 'query_only':
+                    continue
+                conn.execute(f"PRAGMA {schema}.{pragma} = {value}")
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA temp_store = {READ_PRAGMAS['temp_store']}")
+        return conn
+
+_catalog_pool = None
+
+def get_catalog_pool():
+    """Get the pool of attached catalog connections"""
+    global _catalog_pool
+    if _catalog_pool is None:
+        _catalog_pool = AttachedCatalogPool()
+    return _catalog_pool
+
+def close_catalog_pool():
+    """Close idle attached connections, so the next query re-attaches the current files"""
+    if _catalog_pool is not None:
+        _catalog_pool.close_all()
+
+def query_catalogs(sql, params=()):
+    """
+    Run a read-only query across the attached catalogs
+
+    Tables are addressed as <schema>.<table>, e.g. inverters.inverters or
+    avl.approved_vendor_list.
+
+    Returns:
+        DataFrame with the query results
+    """
+    with get_catalog_pool().connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+def get_manufacturer_catalog_counts():
+    """
+    Count listings per manufacturer in every CEC catalog with one query
+
+    Returns:
+        DataFrame with a manufacturer column and one count column per catalog
+    """
+    with get_catalog_pool().connection() as conn:
+        attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+        selects = []
+        for catalog in CATALOGS.values():
+            schema = catalog['table_name']
+            if schema not in attached:
+                continue
+            selects.append(
+                f'SELECT "{catalog["manufacturer_column"]}" AS manufacturer, \'{schema}\' AS catalog '
+                f'FROM {schema}."{catalog["table_name"]}"'
+            )
+        if not selects:
+            return pd.DataFrame(columns=['manufacturer'])
+
+        sql = f"""
+        SELECT manufacturer, catalog, COUNT(*) AS listings
+        FROM ({' UNION ALL '.join(selects)})
+        WHERE manufacturer IS NOT NULL
+        GROUP BY manufacturer, catalog
+        """
+        counts = pd.read_sql_query(sql, conn)
+
+    return counts.pivot(index='manufacturer', columns='catalog', values='listings').fillna(0).astype(int).reset_index()
+
+def checkpoint_catalogs():
+    """
+    Checkpoint the WAL of every catalog database through one connection
+
+    Returns:
+        dict mapping schema name to (busy, log frames, checkpointed frames)
+    """
+    results = {}
+    conn = sqlite3.connect('file::memory:', uri=True, timeout=30)
+    try:
+        for schema in attach_catalogs(conn, read_only=False):
+            results[schema] = conn.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+    return results
+
+def backup_catalogs(backup_dir):
+    """
+    Write a consistent copy of every catalog database to a directory
+
+    Uses VACUUM INTO, so each copy is compacted and can be taken while the app
+    is serving reads.
+
+    Returns:
+        dict mapping schema name to backup file path
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    backups = {}
+    conn = sqlite3.connect('file::memory:', uri=True, timeout=30)
+    try:
+        for schema in attach_catalogs(conn):
+            db_name = os.path.basename(get_catalog_schemas()[schema])
+            backup_path = os.path.join(backup_dir, db_name)
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            conn.execute(f"VACUUM {schema} INTO ?", (backup_path,))
+            backups[schema] = backup_path
+    finally:
+        conn.close()
+    return backups
@@ -0,0 +1,237 @@
+"""
+Catalog metadata database
+
+Holds bookkeeping about the CEC catalogs that doesn't belong in the catalog
+tables themselves: the refresh jobs table used by the background job runner,
+the fingerprints of the last source files each downloader loaded and the
+header layouts those files had. It also remembers the column mappings users
+confirmed for uploaded vendor lists, keyed by the upload's header layout.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+
+# Jobs that haven't reported progress for this long are treated as abandoned
+STALE_JOB_SECONDS = 15 * 60
+
+ACTIVE_JOB_STATES = ('queued', 'running')
+
+def get_meta_db_path():
+    """Get the path to the catalog metadata database file"""
+    db_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(db_dir, 'catalog_meta.db')
+
+def connect_meta_db():
+    """Open a write connection to the metadata database"""
+    conn = sqlite3.connect(get_meta_db_path(), timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def create_refresh_jobs_table():
+    """Create the refresh_jobs table if it doesn't exist"""
+    with connect_meta_db() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dataset TEXT NOT NULL,
+            state TEXT NOT NULL,
+            stage TEXT,
+            bytes_downloaded INTEGER DEFAULT 0,
+            bytes_total INTEGER,
+            rows_parsed INTEGER DEFAULT 0,
+            rows_written INTEGER DEFAULT 0,
+            message TEXT,
+            requested_by TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_refresh_jobs_dataset_state ON refresh_jobs (dataset, state)')
+
+def _expire_stale_jobs(conn, dataset):
+    """
+    Mark active jobs that stopped reporting progress as failed
+
+    A job that hasn't started yet is only waiting for the one ahead of it, so
+    it is kept while another job is still running and reporting progress.
+    """
+    cutoff = datetime.fromtimestamp(datetime.now().timestamp() - STALE_JOB_SECONDS).strftime('%Y-%m-%d %H:%M:%S')
+    conn.execute(
+        f"UPDATE refresh_jobs SET state = 'failed', message = 'Job stopped reporting progress', finished_at = ? "
+        f"WHERE dataset = ? AND state IN ({','.join('?' for _ in ACTIVE_JOB_STATES)}) AND updated_at < ? "
+        "AND NOT (state = 'queued' AND EXISTS ("
+        "SELECT 1 FROM refresh_jobs AS running WHERE running.state = 'running' AND running.updated_at >= ?))",
+        (_now(), dataset, *ACTIVE_JOB_STATES, cutoff, cutoff)
+    )
+
+def create_refresh_job(dataset, requested_by=None):
+    """
+    Queue a refresh job unless one is already active for the dataset
+
+    Returns:
+        tuple: (job_id, created) where created is False when an active job was reused
+    """
+    create_refresh_jobs_table()
+    with connect_meta_db() as conn:
+        # Take the write lock up front so two clicks can't both insert a job
+        conn.execute('BEGIN IMMEDIATE')
+        _expire_stale_jobs(conn, dataset)
+        row = conn.execute(
+            f"SELECT job_id FROM refresh_jobs WHERE dataset = ? AND state IN ({','.join('?' for _ in ACTIVE_JOB_STATES)}) "
+            "ORDER BY job_id DESC LIMIT 1",
+            (dataset, *ACTIVE_JOB_STATES)
+        ).fetchone()
+        if row is not None:
+            return row['job_id'], False
+
+        now = _now()
+        cursor = conn.execute(
+            "INSERT INTO refresh_jobs (dataset, state, stage, requested_by, created_at, updated_at) "
+            "VALUES (?, 'queued', 'queued', ?, ?, ?)",
+            (dataset, requested_by, now, now)
+        )
+        return cursor.lastrowid, True
+
+def update_refresh_job(job_id, **fields):
+    """Update progress or state columns of a refresh job"""
+    allowed = {'state', 'stage', 'bytes_downloaded', 'bytes_total', 'rows_parsed', 'rows_written',
+               'message', 'started_at', 'finished_at'}
+    updates = {k: v for k, v in fields.items() if k in allowed}
+    updates['updated_at'] = _now()
+    assignments = ', '.join(f"{column} = ?" for column in updates)
+    with connect_meta_db() as conn:
+        conn.execute(f"UPDATE refresh_jobs SET {assignments} WHERE job_id = ?", (*updates.values(), job_id))
+
+def get_refresh_job(job_id):
+    """Get a refresh job as a dict, or None if it doesn't exist"""
+    create_refresh_jobs_table()
+    with connect_meta_db() as conn:
+        row = conn.execute("SELECT * FROM refresh_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_active_refresh_job(dataset):
+    """Get the queued or running job for a dataset, if any"""
+    create_refresh_jobs_table()
+    with connect_meta_db() as conn:
+        row = conn.execute(
+            f"SELECT * FROM refresh_jobs WHERE dataset = ? AND state IN ({','.join('?' for _ in ACTIVE_JOB_STATES)}) "
+            "ORDER BY job_id DESC LIMIT 1",
+            (dataset, *ACTIVE_JOB_STATES)
+        ).fetchone()
+    return dict(row) if row else None
+
+def create_source_fingerprints_table():
+    """Create the source_fingerprints table if it doesn't exist"""
+    with connect_meta_db() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS source_fingerprints (
+            dataset TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size_bytes INTEGER,
+            checked_at TEXT NOT NULL,
+            changed_at TEXT NOT NULL
+        )
+        ''')
+
+def get_source_fingerprint(dataset):
+    """Get the fingerprint of the last successfully loaded source file for a dataset"""
+    create_source_fingerprints_table()
+    with connect_meta_db() as conn:
+        row = conn.execute("SELECT * FROM source_fingerprints WHERE dataset = ?", (dataset,)).fetchone()
+    return dict(row) if row else None
+
+def record_source_fingerprint(dataset, sha256, size_bytes):
+    """Record the fingerprint of a source file after it has been loaded"""
+    create_source_fingerprints_table()
+    now = _now()
+    with connect_meta_db() as conn:
+        conn.execute('''
+        INSERT INTO source_fingerprints (dataset, sha256, size_bytes, checked_at, changed_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(dataset) DO UPDATE SET
+            sha256 = excluded.sha256,
+            size_bytes = excluded.size_bytes,
+            checked_at = excluded.checked_at,
+            changed_at = CASE WHEN source_fingerprints.sha256 = excluded.sha256
+                              THEN source_fingerprints.changed_at ELSE excluded.changed_at END
+        ''', (dataset, sha256, size_bytes, now, now))
+
+def touch_source_fingerprint(dataset):
+    """Mark a dataset's source as checked without any change"""
+    create_source_fingerprints_table()
+    with connect_meta_db() as conn:
+        conn.execute("UPDATE source_fingerprints SET checked_at = ? WHERE dataset = ?", (_now(), dataset))
+
+def forget_source_fingerprint(dataset):
+    """Drop a dataset's source fingerprint, so its next download loads even an unchanged file"""
+    create_source_fingerprints_table()
+    with connect_meta_db() as conn:
+        conn.execute("DELETE FROM source_fingerprints WHERE dataset = ?", (dataset,))
+
+def create_header_fingerprints_table():
+    """Create the header_fingerprints table if it doesn't exist"""
+    with connect_meta_db() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS header_fingerprints (
+            dataset TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            header_row INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            accepted_at TEXT NOT NULL
+        )
+        ''')
+
+def get_header_fingerprint(dataset):
+    """Get the accepted header layout of a dataset's source file"""
+    create_header_fingerprints_table()
+    with connect_meta_db() as conn:
+        row = conn.execute("SELECT * FROM header_fingerprints WHERE dataset = ?", (dataset,)).fetchone()
+    return dict(row) if row else None
+
+def record_header_fingerprint(dataset, fingerprint, header_row, headers):
+    """Accept a header layout for a dataset's source file"""
+    create_header_fingerprints_table()
+    with connect_meta_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO header_fingerprints (dataset, fingerprint, header_row, headers, accepted_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (dataset, fingerprint, header_row, headers, _now())
+        )
+
+def create_column_mappings_table():
+    """Create the column_mappings table if it doesn't exist"""
+    with connect_meta_db() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS column_mappings (
+            fingerprint TEXT PRIMARY KEY,
+            headers TEXT NOT NULL,
+            mapping TEXT NOT NULL,
+            confirmed_at TEXT NOT NULL,
+            times_used INTEGER NOT NULL DEFAULT 1
+        )
+        ''')
+
+def get_column_mapping(fingerprint):
+    """Get the confirmed column mapping for an upload header layout"""
+    create_column_mappings_table()
+    with connect_meta_db() as conn:
+        row = conn.execute("SELECT * FROM column_mappings WHERE fingerprint = ?", (fingerprint,)).fetchone()
+    return dict(row) if row else None
+
+def record_column_mapping(fingerprint, headers, mapping):
+    """Remember a confirmed column mapping for an upload header layout"""
+    create_column_mappings_table()
+    with connect_meta_db() as conn:
+        conn.execute('''
+        INSERT INTO column_mappings (fingerprint, headers, mapping, confirmed_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (fingerprint) DO UPDATE SET
+            mapping = excluded.mapping,
+            confirmed_at = excluded.confirmed_at,
+            times_used = times_used + 1
+        ''', (fingerprint, headers, mapping, _now()))
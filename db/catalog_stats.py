@@ -0,0 +1,259 @@
+"""
+Materialized catalog statistics
+
+Holds the per-dataset summary behind the stats strip and a profile of every
+column (type, null rate, range, distinct count, top values, histogram). The
+downloaders write these tables into each catalog database in the same
+transaction as the catalog rows, so they always describe the data next to
+them and change version together with it. The UI reads them instead of
+recomputing aggregates over the whole frame on every rerun.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from db.catalogs import CATALOGS, get_catalog_by_table, get_catalog_db_path
+from db.connection_pool import read_connection
+
+def create_dataset_summary_table(conn):
+    """Create the dataset_summary table if it doesn't exist"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS dataset_summary (
+        dataset TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL,
+        manufacturer_count INTEGER NOT NULL,
+        latest_listing_date TEXT,
+        last_refresh TEXT NOT NULL,
+        source_sha256 TEXT
+    )
+    ''')
+
+def summarize_catalog_table(conn, table_name):
+    """
+    Aggregate the stats strip values for a catalog table in one query
+
+    Returns:
+        dict with row_count, manufacturer_count and latest_listing_date
+    """
+    catalog = get_catalog_by_table(table_name)
+    date_column = catalog['listing_date_column']
+    row = conn.execute(f'''
+    SELECT
+        COUNT(*),
+        COUNT(DISTINCT "{catalog['manufacturer_column']}"),
+        MAX(CASE WHEN "{date_column}" NOT IN ('', 'None') THEN substr("{date_column}", 1, 10) END)
+    FROM "{table_name}"
+    ''').fetchone()
+    return {
+        'row_count': row[0],
+        'manufacturer_count': row[1],
+        'latest_listing_date': row[2],
+    }
+
+def write_dataset_summary(conn, table_name, source_sha256=None):
+    """Materialize the summary of a catalog table that was just written on this connection"""
+    create_dataset_summary_table(conn)
+    summary = summarize_catalog_table(conn, table_name)
+    conn.execute('''
+    INSERT OR REPLACE INTO dataset_summary
+        (dataset, row_count, manufacturer_count, latest_listing_date, last_refresh, source_sha256)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        table_name,
+        summary['row_count'],
+        summary['manufacturer_count'],
+        summary['latest_listing_date'],
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        source_sha256,
+    ))
+
+# Number of most frequent values kept per column
+TOP_K_VALUES = 10
+
+# Number of histogram bins for numeric and date columns
+HISTOGRAM_BINS = 20
+
+# Share of non-null values that must parse for a column to get a numeric or date type
+TYPE_INFERENCE_THRESHOLD = 0.95
+
+# Values the downloaders store for missing cells
+NULL_MARKERS = ('', 'None', 'nan', 'NaN', 'NaT')
+
+def create_column_stats_table(conn):
+    """Create the column_stats table if it doesn't exist"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS column_stats (
+        dataset TEXT NOT NULL,
+        column_name TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        inferred_type TEXT NOT NULL,
+        null_rate REAL NOT NULL,
+        min_value,
+        max_value,
+        distinct_count INTEGER NOT NULL,
+        top_values TEXT,
+        histogram TEXT,
+        profiled_at TEXT NOT NULL,
+        PRIMARY KEY (dataset, column_name)
+    )
+    ''')
+
+def _histogram(values, bins=HISTOGRAM_BINS):
+    """Bin numeric values, returning the bin edges and counts"""
+    if values.empty:
+        return None
+    counts, edges = np.histogram(values.to_numpy(dtype=float), bins=bins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+def profile_column(series):
+    """
+    Profile one catalog column
+
+    Returns:
+        dict with the column_stats fields for the column
+    """
+    total = len(series)
+    text = series.astype(object).where(series.notna(), None)
+    present = text[text.notna() & ~text.astype(str).isin(NULL_MARKERS)].astype(str).str.strip()
+
+    profile = {
+        'inferred_type': 'text',
+        'null_rate': 1 - len(present) / total if total else 0.0,
+        'min_value': None,
+        'max_value': None,
+        'distinct_count': int(present.nunique()),
+        'top_values': [[value, int(count)] for value, count in present.value_counts().head(TOP_K_VALUES).items()],
+        'histogram': None,
+    }
+    if present.empty:
+        return profile
+
+    numbers = pd.to_numeric(present, errors='coerce').dropna()
+    if len(numbers) >= len(present) * TYPE_INFERENCE_THRESHOLD:
+        profile.update({
+            'inferred_type': 'integer' if (numbers % 1 == 0).all() else 'real',
+            'min_value': numbers.min().item(),
+            'max_value': numbers.max().item(),
+            'histogram': _histogram(numbers),
+        })
+        return profile
+
+    is_date = present.str.match(r'^\d{4}-\d{2}-\d{2}')
+    if is_date.sum() >= len(present) * TYPE_INFERENCE_THRESHOLD:
+        dates = present[is_date].str[:10]
+        # Bin dates by their ordinal day so the histogram edges stay comparable numbers
+        ordinals = pd.to_datetime(dates, errors='coerce').dropna()
+        profile.update({
+            'inferred_type': 'date',
+            'min_value': dates.min(),
+            'max_value': dates.max(),
+            'histogram': _histogram(ordinals.map(pd.Timestamp.toordinal)),
+        })
+        return profile
+
+    profile['min_value'] = present.min()
+    profile['max_value'] = present.max()
+    return profile
+
+def write_column_stats(conn, table_name):
+    """
+    Profile every column of a catalog table that was just written on this connection
+
+    Also refreshes SQLite's own planner statistics for the table.
+    """
+    create_column_stats_table(conn)
+    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
+    profiled_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    rows = []
+    for position, column in enumerate(df.columns):
+        profile = profile_column(df[column])
+        rows.append((
+            table_name,
+            column,
+            position,
+            profile['inferred_type'],
+            profile['null_rate'],
+            profile['min_value'],
+            profile['max_value'],
+            profile['distinct_count'],
+            json.dumps(profile['top_values']),
+            json.dumps(profile['histogram']) if profile['histogram'] else None,
+            profiled_at,
+        ))
+
+    conn.execute("DELETE FROM column_stats WHERE dataset = ?", (table_name,))
+    conn.executemany('''
+    INSERT INTO column_stats
+        (dataset, column_name, position, inferred_type, null_rate, min_value, max_value,
+         distinct_count, top_values, histogram, profiled_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.execute(f'ANALYZE "{table_name}"')
+
+def get_column_stats(equipment_type):
+    """
+    Get the profiled stats of every column in a catalog
+
+    Returns:
+        dict mapping column name to its stats (empty if the catalog hasn't been profiled)
+    """
+    catalog = CATALOGS[equipment_type]
+    db_path = get_catalog_db_path(catalog['db_name'])
+    try:
+        with read_connection(db_path) as conn:
+            try:
+                cursor = conn.execute(
+                    "SELECT * FROM column_stats WHERE dataset = ? ORDER BY position",
+                    (catalog['table_name'],)
+                )
+            except sqlite3.OperationalError:
+                return {}
+            names = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Could not read column stats for {equipment_type}: {e}")
+        return {}
+
+    stats = {}
+    for row in rows:
+        column_stats = dict(zip(names, row))
+        column_stats['top_values'] = json.loads(column_stats['top_values']) if column_stats['top_values'] else []
+        column_stats['histogram'] = json.loads(column_stats['histogram']) if column_stats['histogram'] else None
+        stats[column_stats['column_name']] = column_stats
+    return stats
+
+def get_dataset_summary(equipment_type):
+    """
+    Get the materialized summary of a catalog
+
+    Falls back to aggregating the table for databases written before the
+    summary table existed.
+
+    Returns:
+        dict with the summary columns, or None if the catalog can't be read
+    """
+    catalog = CATALOGS[equipment_type]
+    db_path = get_catalog_db_path(catalog['db_name'])
+    try:
+        with read_connection(db_path) as conn:
+            try:
+                row = conn.execute(
+                    "SELECT row_count, manufacturer_count, latest_listing_date, last_refresh, source_sha256 "
+                    "FROM dataset_summary WHERE dataset = ?",
+                    (catalog['table_name'],)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            if row is not None:
+                return dict(zip(('row_count', 'manufacturer_count', 'latest_listing_date', 'last_refresh', 'source_sha256'), row))
+            summary = summarize_catalog_table(conn, catalog['table_name'])
+    except sqlite3.Error as e:
+        print(f"Could not read summary for {equipment_type}: {e}")
+        return None
+    summary.update({'last_refresh': None, 'source_sha256': None})
+    return summary
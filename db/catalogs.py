@@ -0,0 +1,97 @@
+"""
+Registry of the CEC equipment catalogs
+
+Maps each equipment type shown in the UI to the database file, table and
+columns that back it, so loaders and lookups don't repeat the same strings.
+"""
+
+import os
+
+CATALOGS = {
+    "PV Modules": {
+        'db_name': 'pv_modules.db',
+        'table_name': 'pv_modules',
+        'downloader': 'modules/pv_module_downloader.py',
+        'refresh_ttl_hours': 24,
+        'id_column': 'module_id',
+        'manufacturer_column': 'Manufacturer',
+        'model_column': 'Model Number',
+        'listing_date_column': 'CEC Listing Date',
+        'listing_date_label': 'Latest CEC Listing Date',
+        'date_columns': ['CEC Listing Date', 'Last Update', 'Date Added to Tool'],
+    },
+    "Grid Support Inverter List": {
+        'db_name': 'inverters.db',
+        'table_name': 'inverters',
+        'downloader': 'inverters/inverter_downloader.py',
+        'refresh_ttl_hours': 24,
+        'id_column': 'inverter_id',
+        'manufacturer_column': 'Manufacturer Name',
+        'model_column': 'Model Number1',
+        'listing_date_column': 'Grid Support Listing Date',
+        'listing_date_label': 'Latest Grid Support Listing Date',
+        'date_columns': ['Date Added to Tool', 'Last Update', 'Grid Support Listing Date'],
+    },
+    "Energy Storage Systems": {
+        'db_name': 'energy_storage.db',
+        'table_name': 'energy_storage',
+        'downloader': 'storage/energy_storage_downloader.py',
+        'refresh_ttl_hours': 24,
+        'id_column': 'storage_id',
+        'manufacturer_column': 'Manufacturer',
+        'model_column': 'Model Number',
+        'listing_date_column': 'Energy Storage Listing Date',
+        'listing_date_label': 'Latest Energy Storage Listing Date',
+        'date_columns': ['Date Added to Tool', 'Last Update', 'Energy Storage Listing Date', 'Certificate Date'],
+    },
+    "Batteries": {
+        'db_name': 'batteries.db',
+        'table_name': 'batteries',
+        'downloader': 'batteries/battery_downloader.py',
+        'refresh_ttl_hours': 24,
+        'id_column': 'battery_id',
+        'manufacturer_column': 'Manufacturer',
+        'model_column': 'Model Number',
+        'listing_date_column': 'Battery Listing Date',
+        'listing_date_label': 'Latest Battery Listing Date',
+        'date_columns': ['Date Added to Tool', 'Last Update', 'Battery Listing Date', 'Certificate Date'],
+    },
+    "Meters": {
+        'db_name': 'meters.db',
+        'table_name': 'meters',
+        'downloader': 'meters/meter_downloader.py',
+        'refresh_ttl_hours': 24,
+        'id_column': 'meter_id',
+        'manufacturer_column': 'Manufacturer',
+        'model_column': 'Model Number',
+        'listing_date_column': 'Meter Listing Date',
+        'listing_date_label': 'Latest Meter Listing Date',
+        'date_columns': ['Date Added to Tool', 'Last Update', 'Meter Listing Date'],
+    },
+}
+
+def get_catalog_by_table(table_name):
+    """Get the registry entry for a catalog table name"""
+    for catalog in CATALOGS.values():
+        if catalog['table_name'] == table_name:
+            return catalog
+    raise KeyError(f"Unknown catalog table: {table_name}")
+
+def get_refresh_ttl_hours(equipment_type):
+    """
+    Get how old a catalog may get before it is refreshed
+
+    Can be overridden per table with REFRESH_TTL_HOURS_<TABLE_NAME>, e.g.
+    REFRESH_TTL_HOURS_INVERTERS=6
+    """
+    catalog = CATALOGS[equipment_type]
+    env_name = f"REFRESH_TTL_HOURS_{catalog['table_name'].upper()}"
+    try:
+        return float(os.environ.get(env_name, catalog['refresh_ttl_hours']))
+    except ValueError:
+        return float(catalog['refresh_ttl_hours'])
+
+def get_catalog_db_path(db_name):
+    """Get the path to a catalog database file in the db directory"""
+    db_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(db_dir, db_name)
@@ -0,0 +1,391 @@
+"""
+AVL ↔ CEC listing cross-validation
+
+Matches every AVL row to its CEC record(s) in one pass instead of checking
+model numbers by hand. Model numbers on both sides are reduced to a
+normalized key (case, whitespace and punctuation removed) and a base key that
+also drops variant suffixes such as "-US" or "[240V]"; the AVL is then
+hash-joined to the CEC catalogs on those keys, and on the prefixes of its
+base keys for ordering SKUs that extend the listed model number. Candidate matches and a
+listed/delisted/ambiguous status per AVL item are stored in the metadata
+database together with the AVL and catalog versions they were computed from,
+so the AVL tabs read one small table and the match only reruns after the AVL
+or a catalog changes.
+"""
+
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from db.approved_vendor_list import get_avl_version
+from db.catalog_cache import get_dataset_versions
+from db.catalog_db import AVL_SCHEMA, get_catalog_pool
+from db.catalog_meta import connect_meta_db
+from db.catalogs import CATALOGS
+from db.manufacturers import create_manufacturer_tables, normalize_manufacturer_key
+
+# CEC catalogs that list the equipment of each AVL category; the others aren't on a CEC list
+CATEGORY_CATALOGS = {
+    "PV Module": ["PV Modules"],
+    "PV Module + Inverter": ["PV Modules", "Grid Support Inverter List"],
+    "Inverter": ["Grid Support Inverter List"],
+    "Battery": ["Batteries", "Energy Storage Systems"],
+    "Battery Expansion": ["Batteries", "Energy Storage Systems"],
+}
+
+# Region, voltage and listing variant suffixes that don't change the product, e.g. "-US", "[240V]" or "(BLK)"
+MODEL_VARIANT_SUFFIX = r'(?:[\s\-_/.]*(?:\([^)]*\)|\[[^\]]*\]|\bUSA?\b|\bNA\b|\bUL\b|\bCA\b))+\s*$'
+
+# Confidence of a match on the normalized key, on the base key and on a prefix of the AVL key
+EXACT_CONFIDENCE = 1.0
+VARIANT_CONFIDENCE = 0.85
+PREFIX_CONFIDENCE = 0.8
+
+# Shortest CEC base key matched as a prefix of a longer AVL ordering SKU
+MIN_PREFIX_LENGTH = 5
+
+# Confidence taken off when the manufacturers don't agree. Small enough that a
+# single exact or variant match still counts as listed, while a candidate from
+# the named manufacturer still outranks one from another
+MANUFACTURER_MISMATCH_PENALTY = 0.05
+
+# A single best match at or above this confidence counts as listed
+LISTED_MIN_CONFIDENCE = 0.8
+
+# 'not checked' is for items none of whose catalogs could be read, e.g. a catalog database that isn't there yet
+LISTING_STATUSES = ['listed', 'delisted', 'ambiguous', 'not listed', 'not applicable', 'not checked']
+
+def normalize_model_numbers(models):
+    """
+    Reduce model numbers to their match keys
+
+    Args:
+        models: Series of raw model numbers
+
+    Returns:
+        tuple: (Series of normalized keys, Series of base keys without variant suffixes)
+    """
+    upper = models.astype('string').str.upper().str.strip()
+    model_key = upper.str.replace(r'[^A-Z0-9]', '', regex=True)
+    base_key = upper.str.replace(MODEL_VARIANT_SUFFIX, '', regex=True).str.replace(r'[^A-Z0-9]', '', regex=True)
+    # Blank keys never match anything
+    return model_key.where(model_key != ''), base_key.where(base_key != '')
+
+def manufacturer_keys(names):
+    """
+    Map manufacturer names to a comparable key, merging known aliases
+
+    Returns:
+        Series of canonical manufacturer IDs (as text) or normalized names for unknown manufacturers
+    """
+    with connect_meta_db() as conn:
+        create_manufacturer_tables(conn)
+        aliases = dict(conn.execute("SELECT alias_key, manufacturer_id FROM manufacturer_aliases").fetchall())
+    distinct = pd.Series(names.dropna().unique())
+    key_by_name = {}
+    for name in distinct:
+        key = normalize_manufacturer_key(name)
+        key_by_name[name] = f"#{aliases[key]}" if key in aliases else key
+    return names.map(key_by_name)
+
+def _attached_schemas(conn):
+    return {row[1] for row in conn.execute("PRAGMA database_list")}
+
+def available_catalogs(conn, equipment_types):
+    """Get the catalogs among equipment_types whose database is attached and can be matched against"""
+    attached = _attached_schemas(conn)
+    return [equipment_type for equipment_type in equipment_types if CATALOGS[equipment_type]['table_name'] in attached]
+
+def load_cec_models(conn, equipment_types):
+    """
+    Read the manufacturer and model number of every record in the given catalogs
+
+    Returns:
+        DataFrame with catalog, cec_id, cec_manufacturer and cec_model columns
+    """
+    attached = _attached_schemas(conn)
+    selects = []
+    for equipment_type in equipment_types:
+        catalog = CATALOGS[equipment_type]
+        schema = catalog['table_name']
+        if schema not in attached:
+            continue
+        selects.append(
+            f'SELECT \'{equipment_type}\' AS catalog, "{catalog["id_column"]}" AS cec_id, '
+            f'"{catalog["manufacturer_column"]}" AS cec_manufacturer, "{catalog["model_column"]}" AS cec_model '
+            f'FROM {schema}."{catalog["table_name"]}"'
+        )
+    if not selects:
+        return pd.DataFrame(columns=['catalog', 'cec_id', 'cec_manufacturer', 'cec_model'])
+    return pd.read_sql_query(' UNION ALL '.join(selects), conn)
+
+def load_listing_history(conn, equipment_types):
+    """
+    Read the model numbers each catalog has listed at some point from its append-only row_keys table
+
+    Natural keys are "<manufacturer>_<model number>"; catalogs created before
+    row keys existed contribute nothing.
+
+    Returns:
+        DataFrame with catalog and model_key columns
+    """
+    attached = _attached_schemas(conn)
+    frames = []
+    for equipment_type in equipment_types:
+        schema = CATALOGS[equipment_type]['table_name']
+        if schema not in attached:
+            continue
+        if not conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'row_keys'").fetchone():
+            continue
+        keys = pd.read_sql_query(f"SELECT natural_key FROM {schema}.row_keys", conn)['natural_key']
+        model_key, _ = normalize_model_numbers(keys.str.split('_', n=1).str[1])
+        frames.append(pd.DataFrame({'catalog': equipment_type, 'model_key': model_key}).dropna())
+    if not frames:
+        return pd.DataFrame(columns=['catalog', 'model_key'])
+    return pd.concat(frames, ignore_index=True).drop_duplicates()
+
+def find_candidates(rows, cec):
+    """
+    Hash-join AVL rows to CEC records in tiers, each tier only for rows the previous ones left unmatched
+
+    The tiers are the normalized key, the base key, and the longest prefix of
+    the row's base key that is a CEC base key. Rows with a catalog column are
+    only joined to records of that catalog; rows without one to every catalog.
+
+    Args:
+        rows: Rows with item_id, model_key, base_key, manufacturer_key and optionally catalog
+        cec: CEC records with catalog, cec_id, cec_manufacturer, cec_model, model_key,
+            base_key and manufacturer_key
+
+    Returns:
+        DataFrame of candidate matches with the CEC base key, match_type and confidence
+    """
+    cec = cec.rename(columns={'base_key': 'cec_base_key'})
+    scope = ['catalog'] if 'catalog' in rows.columns else []
+    exact = rows.dropna(subset=['model_key']).merge(
+        cec.dropna(subset=['model_key']), on=scope + ['model_key'], suffixes=('', '_cec')
+    )
+    exact['match_type'] = 'exact'
+    exact['confidence'] = EXACT_CONFIDENCE
+
+    leftover = rows[~rows['item_id'].isin(exact['item_id'])].dropna(subset=['base_key'])
+    variant = leftover.merge(
+        cec.drop(columns='model_key').dropna(subset=['cec_base_key']),
+        left_on=scope + ['base_key'], right_on=scope + ['cec_base_key'], suffixes=('', '_cec')
+    )
+    variant['match_type'] = 'variant'
+    variant['confidence'] = VARIANT_CONFIDENCE
+
+    leftover = leftover[~leftover['item_id'].isin(variant['item_id'])].copy()
+    leftover['prefix'] = leftover['base_key'].map(
+        lambda key: [key[:length] for length in range(len(key) - 1, MIN_PREFIX_LENGTH - 1, -1)]
+    )
+    prefix = leftover.explode('prefix').dropna(subset=['prefix']).merge(
+        cec.drop(columns='model_key').dropna(subset=['cec_base_key']),
+        left_on=scope + ['prefix'], right_on=scope + ['cec_base_key'], suffixes=('', '_cec')
+    )
+    # Keep only the longest matching prefix of each item
+    prefix['prefix_length'] = prefix['prefix'].str.len()
+    prefix = prefix[prefix['prefix_length'] == prefix.groupby('item_id')['prefix_length'].transform('max')]
+    prefix['match_type'] = 'prefix'
+    prefix['confidence'] = PREFIX_CONFIDENCE
+
+    candidates = pd.concat([exact, variant, prefix], ignore_index=True)
+    # Rows without a manufacturer aren't penalized, only ones naming a different one
+    mismatch = candidates['manufacturer_key'].notna() & (candidates['manufacturer_key'] != candidates['manufacturer_key_cec'])
+    candidates.loc[mismatch, 'confidence'] = (candidates.loc[mismatch, 'confidence'] - MANUFACTURER_MISMATCH_PENALTY).round(2)
+    candidates.loc[mismatch, 'match_type'] += ', other manufacturer'
+    return candidates[[
+        'item_id', 'catalog', 'cec_id', 'cec_manufacturer', 'cec_model', 'cec_base_key', 'match_type', 'confidence'
+    ]]
+
+def classify_listings(avl_items, candidates, history, previously_listed, checked_catalogs=None):
+    """
+    Derive one listing status per AVL item from its candidate matches
+
+    Args:
+        avl_items: AVL rows with item_id, equipment_category, catalog and model_key
+        candidates: Candidate matches from find_candidates
+        history: Model keys each catalog has ever listed (catalog, model_key)
+        previously_listed: Set of (item_id, model_key) pairs that were listed at the last match
+        checked_catalogs: Catalogs that were read, or None if all were; items none of
+            whose catalogs were read are 'not checked' rather than not listed or delisted
+
+    Returns:
+        DataFrame with item_id, model_key, status, confidence, the number of distinct
+        CEC products among the best matches and one of their model numbers
+    """
+    best = candidates.groupby('item_id')['confidence'].transform('max')
+    top = candidates[candidates['confidence'] == best]
+    # Voltage or region variants of one listed product count as a single match
+    summary = top.assign(product=top['catalog'] + '\x1f' + top['cec_base_key'].fillna(top['cec_id'])).groupby('item_id').agg(
+        confidence=('confidence', 'max'),
+        matches=('product', 'nunique'),
+        cec_model=('cec_model', 'first'),
+    )
+    status = avl_items[['item_id', 'equipment_category', 'model_key']].drop_duplicates('item_id').set_index('item_id')
+    status = status.join(summary)
+
+    applicable = status['equipment_category'].isin(list(CATEGORY_CATALOGS))
+    matched = status['matches'].notna()
+    status['status'] = 'not listed'
+    status.loc[~applicable, 'status'] = 'not applicable'
+    status.loc[matched, 'status'] = 'ambiguous'
+    status.loc[matched & (status['matches'] == 1) & (status['confidence'] >= LISTED_MIN_CONFIDENCE), 'status'] = 'listed'
+
+    # Unmatched items whose model a catalog listed before, or that were listed at the last match
+    catalogs = avl_items[['item_id', 'catalog', 'model_key']].dropna()
+    seen = catalogs.merge(history, on=['catalog', 'model_key'])['item_id']
+    was_listed = pd.Series(
+        [(item_id, model_key) in previously_listed for item_id, model_key in zip(status.index, status['model_key'])],
+        index=status.index
+    )
+    delisted = applicable & ~matched & (status.index.isin(seen) | was_listed)
+    status.loc[delisted, 'status'] = 'delisted'
+
+    # Without any of its catalogs there is nothing to decide a verdict from
+    if checked_catalogs is not None:
+        checked = catalogs.loc[catalogs['catalog'].isin(checked_catalogs), 'item_id']
+        unchecked = applicable & ~matched & ~status.index.isin(checked)
+        status.loc[unchecked, 'status'] = 'not checked'
+
+    status['matches'] = status['matches'].fillna(0).astype(int)
+    return status.reset_index()[['item_id', 'model_key', 'status', 'confidence', 'matches', 'cec_model']]
+
+def create_match_tables(conn):
+    """Create the match tables in the metadata database if they don't exist"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_cec_matches (
+        item_id INTEGER NOT NULL,
+        catalog TEXT NOT NULL,
+        cec_id TEXT NOT NULL,
+        cec_manufacturer TEXT,
+        cec_model TEXT,
+        cec_base_key TEXT,
+        match_type TEXT NOT NULL,
+        confidence REAL NOT NULL
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_avl_cec_matches_item_id ON avl_cec_matches (item_id)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_listing_status (
+        item_id INTEGER PRIMARY KEY,
+        model_key TEXT,
+        status TEXT NOT NULL,
+        confidence REAL,
+        matches INTEGER NOT NULL,
+        cec_model TEXT
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS avl_match_runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        versions TEXT NOT NULL,
+        items INTEGER NOT NULL,
+        candidates INTEGER NOT NULL,
+        matched_at TEXT NOT NULL
+    )
+    ''')
+
+def _current_versions():
+    """Versions of the AVL and catalogs a match is computed from, as comparable JSON"""
+    return json.dumps({'avl': get_avl_version(), 'catalogs': get_dataset_versions()}, sort_keys=True)
+
+def match_avl_to_cec():
+    """
+    Match the whole AVL to the CEC catalogs and replace the stored matches
+
+    Returns:
+        dict with the item and candidate counts and the count of items per status
+    """
+    equipment_types = sorted({equipment_type for types in CATEGORY_CATALOGS.values() for equipment_type in types})
+    versions = _current_versions()
+    with get_catalog_pool().connection() as conn:
+        if AVL_SCHEMA not in _attached_schemas(conn):
+            avl = pd.DataFrame(columns=['item_id', 'equipment_category', 'manufacturer', 'model_sku'])
+        else:
+            avl = pd.read_sql_query(
+                f"SELECT item_id, equipment_category, manufacturer, model_sku FROM {AVL_SCHEMA}.approved_vendor_list", conn
+            )
+        checked_catalogs = available_catalogs(conn, equipment_types)
+        cec = load_cec_models(conn, checked_catalogs)
+        history = load_listing_history(conn, checked_catalogs)
+
+    avl['model_key'], avl['base_key'] = normalize_model_numbers(avl['model_sku'])
+    avl['manufacturer_key'] = manufacturer_keys(avl['manufacturer'])
+    cec['model_key'], cec['base_key'] = normalize_model_numbers(cec['cec_model'])
+    cec['manufacturer_key'] = manufacturer_keys(cec['cec_manufacturer'])
+
+    # One row per AVL item and catalog its category is listed in
+    catalog_map = pd.DataFrame(
+        [(category, equipment_type) for category, types in CATEGORY_CATALOGS.items() for equipment_type in types],
+        columns=['equipment_category', 'catalog']
+    )
+    avl_items = avl.merge(catalog_map, on='equipment_category', how='left')
+    candidates = find_candidates(avl_items.dropna(subset=['catalog']), cec)
+
+    with connect_meta_db() as conn:
+        create_match_tables(conn)
+        previously_listed = {tuple(row) for row in conn.execute(
+            "SELECT item_id, model_key FROM avl_listing_status WHERE status = 'listed'"
+        )}
+        status = classify_listings(avl_items, candidates, history, previously_listed, checked_catalogs)
+
+        conn.execute("DELETE FROM avl_cec_matches")
+        conn.execute("DELETE FROM avl_listing_status")
+        candidates.to_sql('avl_cec_matches', conn, if_exists='append', index=False)
+        status.to_sql('avl_listing_status', conn, if_exists='append', index=False)
+        conn.execute(
+            "INSERT INTO avl_match_runs (versions, items, candidates, matched_at) VALUES (?, ?, ?, ?)",
+            (versions, len(status), len(candidates), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+
+    counts = status['status'].value_counts().to_dict()
+    missing = sorted(set(equipment_types) - set(checked_catalogs))
+    print(f"Matched {len(status)} AVL items to {len(candidates)} CEC candidates: {counts}"
+          + (f" (not checked against {', '.join(missing)})" if missing else ''))
+    return {'items': len(status), 'candidates': len(candidates), 'statuses': counts}
+
+def ensure_avl_matches():
+    """
+    Rerun the match if the AVL or a catalog changed since the stored one
+
+    Returns:
+        bool True if the match was rerun
+    """
+    with connect_meta_db() as conn:
+        create_match_tables(conn)
+        last = conn.execute("SELECT versions FROM avl_match_runs ORDER BY run_id DESC LIMIT 1").fetchone()
+    if last is not None and last['versions'] == _current_versions():
+        return False
+    match_avl_to_cec()
+    return True
+
+def get_listing_status():
+    """
+    Read the stored listing status of every AVL item
+
+    Returns:
+        DataFrame indexed by item_id with status, confidence, matches and cec_model columns
+    """
+    with connect_meta_db() as conn:
+        create_match_tables(conn)
+        return pd.read_sql_query(
+            "SELECT item_id, status, confidence, matches, cec_model FROM avl_listing_status", conn, index_col='item_id'
+        )
+
+def get_item_matches(item_id):
+    """
+    Read the candidate CEC records of one AVL item, best first
+
+    Returns:
+        DataFrame of candidate matches
+    """
+    with connect_meta_db() as conn:
+        create_match_tables(conn)
+        return pd.read_sql_query(
+            "SELECT catalog, cec_id, cec_manufacturer, cec_model, match_type, confidence "
+            "FROM avl_cec_matches WHERE item_id = ? ORDER BY confidence DESC",
+            conn, params=(int(item_id),)
+        )
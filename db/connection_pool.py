@@ -0,0 +1,174 @@
+"""
+Read-only SQLite connection pool
+
+The UI issues many small queries per rerun. Opening a fresh connection for
+each one means re-parsing the schema and starting with a cold page cache, so
+read paths borrow long-lived read-only connections from a small pool per
+database file instead. Writes keep using their own sqlite3.connect calls.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# Maximum number of open connections per database file
+POOL_SIZE = 4
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 10.0
+
+# Pragmas applied to every pooled connection
+READ_PRAGMAS = {
+    'query_only': 'ON',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,  # negative values are KiB, so ~16 MB
+    'temp_store': 'MEMORY',
+}
+
+class ReadConnectionPool:
+    """A bounded pool of read-only connections to one SQLite database"""
+
+    def __init__(self, db_path, max_size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = os.path.abspath(db_path)
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._stats = {
+            'connections_opened': 0,
+            'checkouts': 0,
+            'reuses': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def _open_connection(self):
+        """Open a new read-only connection with the read pragmas applied"""
+        uri = f"file:{quote(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=self.timeout)
+        for pragma, value in READ_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def acquire(self):
+        """Borrow a connection, opening a new one while the pool is below capacity"""
+        start = time.perf_counter()
+        reused = True
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.max_size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = self._open_connection()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+                reused = False
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f"Timed out waiting for a connection to {self.db_path}"
+                    ) from None
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats['checkouts'] += 1
+            if reused:
+                self._stats['reuses'] += 1
+            else:
+                self._stats['connections_opened'] += 1
+            self._stats['total_wait_seconds'] += waited
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def discard(self, conn):
+        """Close a connection that should not be reused"""
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._opened -= 1
+
+    @contextmanager
+    def connection(self):
+        """Context manager that borrows a connection and always returns it"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            self.discard(conn)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection (used before a database file is rewritten)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+    def stats(self):
+        """Get reuse and wait-time counters for this pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = self._opened
+        checkouts = stats['checkouts']
+        stats['reuse_rate'] = stats['reuses'] / checkouts if checkouts else 0.0
+        stats['avg_wait_seconds'] = stats['total_wait_seconds'] / checkouts if checkouts else 0.0
+        return stats
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_read_pool(db_path):
+    """Get (or create) the pool for a database file"""
+    db_path = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ReadConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+@contextmanager
+def read_connection(db_path):
+    """Borrow a pooled read-only connection to a database file"""
+    with get_read_pool(db_path).connection() as conn:
+        yield conn
+
+def get_pool_stats():
+    """Get stats for every pool, keyed by database file name"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {os.path.basename(pool.db_path): pool.stats() for pool in pools}
+
+def close_read_pools():
+    """Close all idle pooled connections"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -0,0 +1,172 @@
+"""
+Manufacturer canonicalization
+
+CEC lists spell the same manufacturer several ways ("Hanwha Q CELLS",
+"Qcells", "Q-Cells"). Ingest maps every raw name to a canonical manufacturer
+ID through a normalization rule and an alias table kept in the metadata
+database, so the IDs are shared by all catalogs and stay stable across
+refreshes. Each catalog table gets an integer manufacturer_id column plus a
+small manufacturers lookup table for the IDs it uses.
+"""
+
+import re
+import sqlite3
+
+import pandas as pd
+
+from db.catalog_meta import connect_meta_db
+
+# Canonical name of the manufacturer the UI lists first
+PRIORITY_MANUFACTURER = 'Qcells'
+
+# Known spellings of the same manufacturer, keyed by canonical name
+MANUFACTURER_ALIASES = {
+    'Qcells': ['Hanwha Q CELLS', 'Hanwha Q-Cells', 'Hanwha Qcells', 'Q CELLS', 'Q-Cells', 'Hanwha Q CELLS America',
+               'Qcells North America', 'Q CELLS North America', 'Hanwha Q CELLS North America'],
+    'SMA': ['SMA America', 'SMA Solar Technology', 'SMA Solar Technology America'],
+    'SolarEdge': ['SolarEdge Technologies', 'SolarEdge Technologies Ltd'],
+    'Enphase Energy': ['Enphase'],
+    'LONGi': ['LONGi Green Energy Technology', 'LONGi Solar'],
+    'JinkoSolar': ['Jinko Solar'],
+    'Canadian Solar': ['CSI Solar'],
+    'Tesla': ['Tesla Motors', 'Tesla Energy'],
+    # LG Energy Solution lists separately from LG Electronics on the CEC lists
+    'LG Electronics': ['LG'],
+}
+
+# Legal-form words that don't distinguish manufacturers wherever they appear
+CORPORATE_SUFFIXES = re.compile(
+    r'\b(inc|incorporated|llc|l\.l\.c|ltd|limited|corp|corporation|company|gmbh|plc|pty)\b\.?',
+    re.IGNORECASE
+)
+
+# Short legal forms and country codes, only dropped at the end of a name since
+# they are also real name tokens ("SA Power", "AG Energy", "Co-op")
+TRAILING_SUFFIXES = re.compile(r'(?:[\s,.&]+(?:co|sa|s\.a|ag|bv|kg|us|usa)\b\.?)+[\s,.]*$', re.IGNORECASE)
+
+def normalize_manufacturer_key(name):
+    """
+    Reduce a raw manufacturer name to its alias key
+
+    Lowercases, drops legal-form suffixes and removes everything that isn't a
+    letter or digit, so "Hanwha Q-CELLS, Inc." and "hanwha q cells" match.
+    """
+    if name is None or pd.isna(name):
+        return None
+    key = CORPORATE_SUFFIXES.sub(' ', str(name).lower())
+    key = TRAILING_SUFFIXES.sub('', ' ' + key.strip(' ,.'))
+    key = re.sub(r'[^a-z0-9]', '', key)
+    return key or None
+
+def create_manufacturer_tables(conn):
+    """Create the manufacturers and manufacturer_aliases tables and seed the alias rules"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS manufacturers (
+        manufacturer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        canonical_name TEXT NOT NULL UNIQUE
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS manufacturer_aliases (
+        alias_key TEXT PRIMARY KEY,
+        manufacturer_id INTEGER NOT NULL REFERENCES manufacturers (manufacturer_id),
+        raw_name TEXT,
+        source TEXT NOT NULL
+    )
+    ''')
+
+    # Rules dropped from MANUFACTURER_ALIASES no longer merge manufacturers
+    rule_keys = {normalize_manufacturer_key(raw_name)
+                 for canonical_name, aliases in MANUFACTURER_ALIASES.items() for raw_name in [canonical_name] + aliases}
+    conn.execute(
+        f"DELETE FROM manufacturer_aliases WHERE source = 'rule' AND alias_key NOT IN ({','.join('?' for _ in rule_keys)})",
+        tuple(rule_keys)
+    )
+
+    for canonical_name, aliases in MANUFACTURER_ALIASES.items():
+        conn.execute("INSERT OR IGNORE INTO manufacturers (canonical_name) VALUES (?)", (canonical_name,))
+        manufacturer_id = conn.execute(
+            "SELECT manufacturer_id FROM manufacturers WHERE canonical_name = ?", (canonical_name,)
+        ).fetchone()[0]
+        for raw_name in [canonical_name] + aliases:
+            # Rules win over names learned from earlier loads
+            conn.execute(
+                "INSERT OR REPLACE INTO manufacturer_aliases (alias_key, manufacturer_id, raw_name, source) "
+                "VALUES (?, ?, ?, 'rule')",
+                (normalize_manufacturer_key(raw_name), manufacturer_id, raw_name)
+            )
+
+def resolve_manufacturer_ids(names):
+    """
+    Map raw manufacturer names to canonical manufacturer IDs
+
+    Names with no alias yet become a new canonical manufacturer under the
+    first spelling seen.
+
+    Args:
+        names: Series of raw manufacturer names
+
+    Returns:
+        Series of nullable integer IDs aligned with names
+    """
+    distinct = pd.Series(names.dropna().unique())
+    keys = distinct.map(normalize_manufacturer_key)
+
+    with connect_meta_db() as conn:
+        create_manufacturer_tables(conn)
+        known = dict(conn.execute("SELECT alias_key, manufacturer_id FROM manufacturer_aliases").fetchall())
+
+        for raw_name, key in zip(distinct, keys):
+            if key is None or key in known:
+                continue
+            conn.execute("INSERT OR IGNORE INTO manufacturers (canonical_name) VALUES (?)", (str(raw_name).strip(),))
+            manufacturer_id = conn.execute(
+                "SELECT manufacturer_id FROM manufacturers WHERE canonical_name = ?", (str(raw_name).strip(),)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO manufacturer_aliases (alias_key, manufacturer_id, raw_name, source) VALUES (?, ?, ?, 'seen')",
+                (key, manufacturer_id, raw_name)
+            )
+            known[key] = manufacturer_id
+
+    id_by_name = {raw_name: known.get(key) for raw_name, key in zip(distinct, keys)}
+    return names.map(id_by_name).astype('Int64')
+
+def write_manufacturer_lookup(conn, table_name, manufacturer_ids):
+    """
+    Store the canonical names of the IDs a catalog uses and index its manufacturer_id column
+
+    Written into the catalog database, so the catalog can be read without the
+    metadata database.
+    """
+    used_ids = sorted(int(i) for i in pd.Series(manufacturer_ids).dropna().unique())
+    with connect_meta_db() as meta_conn:
+        create_manufacturer_tables(meta_conn)
+        names = dict(meta_conn.execute("SELECT manufacturer_id, canonical_name FROM manufacturers").fetchall())
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS manufacturers (
+        manufacturer_id INTEGER PRIMARY KEY,
+        canonical_name TEXT NOT NULL
+    )
+    ''')
+    conn.execute("DELETE FROM manufacturers")
+    conn.executemany(
+        "INSERT INTO manufacturers (manufacturer_id, canonical_name) VALUES (?, ?)",
+        [(manufacturer_id, names[manufacturer_id]) for manufacturer_id in used_ids if manufacturer_id in names]
+    )
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_manufacturer_id" ON "{table_name}" (manufacturer_id)')
+
+def read_manufacturer_lookup(conn):
+    """
+    Read a catalog's manufacturers lookup table
+
+    Returns:
+        dict mapping canonical name to manufacturer ID (empty for older databases)
+    """
+    try:
+        return {name: manufacturer_id for manufacturer_id, name in conn.execute(
+            "SELECT manufacturer_id, canonical_name FROM manufacturers"
+        ).fetchall()}
+    except sqlite3.OperationalError:
+        return {}
@@ -0,0 +1,115 @@
+"""
+Primary-key record lookup for the CEC catalogs
+
+The comparison view only ever needs a handful of full-width rows, so instead
+of slicing the whole filtered frame we fetch the selected IDs straight from
+SQLite and keep recently used records in a small LRU cache.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from db.connection_pool import read_connection
+
+# Maximum number of individual records kept in memory
+RECORD_CACHE_SIZE = 256
+
+# Number of IDs offered per page in the comparison picker
+ID_PAGE_SIZE = 50
+
+_record_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_key(db_path, table_name, record_id):
+    """Build a cache key that changes whenever the database file is rewritten"""
+    try:
+        version = os.path.getmtime(db_path)
+    except OSError:
+        version = None
+    return (db_path, table_name, version, record_id)
+
+def fetch_records_by_id(db_path, table_name, id_column, record_ids):
+    """
+    Fetch full records for the given primary keys
+
+    Args:
+        db_path: Path to the SQLite database file
+        table_name: Name of the table holding the records
+        id_column: Name of the primary key column
+        record_ids: List of primary key values to fetch
+
+    Returns:
+        DataFrame with one row per found ID, in the order requested
+    """
+    records = {}
+    missing_ids = []
+
+    with _cache_lock:
+        for record_id in record_ids:
+            key = _cache_key(db_path, table_name, record_id)
+            if key in _record_cache:
+                _record_cache.move_to_end(key)
+                records[record_id] = _record_cache[key]
+            else:
+                missing_ids.append(record_id)
+
+    if missing_ids:
+        placeholders = ','.join(['?' for _ in missing_ids])
+        query = f'SELECT * FROM "{table_name}" WHERE "{id_column}" IN ({placeholders})'
+        with read_connection(db_path) as conn:
+            fetched_df = pd.read_sql_query(query, conn, params=missing_ids)
+
+        with _cache_lock:
+            for record in fetched_df.to_dict('records'):
+                record_id = record[id_column]
+                records[record_id] = record
+                _record_cache[_cache_key(db_path, table_name, record_id)] = record
+            while len(_record_cache) > RECORD_CACHE_SIZE:
+                _record_cache.popitem(last=False)
+
+    ordered = [records[record_id] for record_id in record_ids if record_id in records]
+    return pd.DataFrame(ordered)
+
+def clear_record_cache():
+    """Drop all cached records, e.g. after a catalog refresh"""
+    with _cache_lock:
+        _record_cache.clear()
+
+def search_record_ids(record_ids, search_term, labels=None):
+    """
+    Filter a Series of IDs by a case-insensitive substring
+
+    Args:
+        record_ids: Series of IDs
+        search_term: Text to look for
+        labels: Optional Series aligned with record_ids to search instead of
+            the IDs themselves, e.g. natural keys for integer row IDs
+
+    Returns:
+        Series of matching IDs (all IDs when the search term is empty)
+    """
+    if not search_term:
+        return record_ids
+    haystack = record_ids if labels is None else labels
+    mask = haystack.astype(str).str.contains(search_term, case=False, regex=False, na=False)
+    return record_ids[mask.to_numpy()]
+
+def get_id_options_page(record_ids, page, page_size=ID_PAGE_SIZE):
+    """
+    Slice one page of IDs for a picker widget
+
+    Args:
+        record_ids: Series of IDs (already searched/filtered)
+        page: 1-based page number
+        page_size: Number of IDs per page
+
+    Returns:
+        tuple: (list of IDs on the page, total number of pages)
+    """
+    total_pages = max(1, -(-len(record_ids) // page_size))
+    page = min(max(1, page), total_pages)
+    start = (page - 1) * page_size
+    return record_ids.iloc[start:start + page_size].tolist(), total_pages
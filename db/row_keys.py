@@ -0,0 +1,65 @@
+"""
+Integer surrogate keys for catalog rows
+
+Catalog rows are identified by synthesized natural keys such as
+"Manufacturer_Model Number". Each catalog database keeps an append-only
+row_keys table mapping every natural key it has ever seen to an integer, so a
+row keeps the same row_id across refreshes (and if it is delisted and comes
+back). Selections, caches and joins use the integer; the natural key stays as
+an indexed column on the catalog table.
+"""
+
+import sqlite3
+
+def create_row_keys_table(conn):
+    """Create the row_keys table if it doesn't exist"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS row_keys (
+        row_id INTEGER PRIMARY KEY,
+        natural_key TEXT NOT NULL UNIQUE,
+        first_seen TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    ''')
+
+def assign_row_ids(conn, natural_keys):
+    """
+    Map natural keys to their stable integer row IDs, registering new keys
+
+    Args:
+        conn: Connection to the catalog database
+        natural_keys: Series of natural keys
+
+    Returns:
+        Series of integer row IDs aligned with natural_keys
+    """
+    create_row_keys_table(conn)
+    keys = natural_keys.astype(str)
+    known = dict(conn.execute("SELECT natural_key, row_id FROM row_keys").fetchall())
+
+    new_keys = [key for key in keys.unique() if key not in known]
+    if new_keys:
+        conn.executemany("INSERT INTO row_keys (natural_key) VALUES (?)", [(key,) for key in new_keys])
+        # Look the new IDs up in batches to stay under SQLite's variable limit
+        for start in range(0, len(new_keys), 500):
+            batch = new_keys[start:start + 500]
+            placeholders = ','.join('?' for _ in batch)
+            known.update(conn.execute(
+                f"SELECT natural_key, row_id FROM row_keys WHERE natural_key IN ({placeholders})", batch
+            ).fetchall())
+
+    return keys.map(known).astype('int64')
+
+def index_row_keys(conn, table_name, id_column):
+    """
+    Index the surrogate and natural keys of a catalog table
+
+    The indexes are unique when the keys are; catalogs that still carry
+    duplicate natural keys get plain indexes instead.
+    """
+    for column in ('row_id', id_column):
+        index_name = f"idx_{table_name}_{column}"
+        try:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ("{column}")')
+        except sqlite3.IntegrityError:
+            print(f"Duplicate {column} values in {table_name}, creating a non-unique index")
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ("{column}")')
@@ -0,0 +1,132 @@
+"""
+Catalog snapshots
+
+Checks and backups of the catalog database files. A refresh keeps a copy of
+the current snapshot aside and puts it back if the downloader fails, so the
+app never serves a half-written or empty catalog. Backups are taken with
+SQLite's backup API, so they are consistent while the app is reading the
+file, and restores are swapped in with a rename.
+"""
+
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from db.catalog_db import close_catalog_pool
+from db.catalog_meta import forget_source_fingerprint, get_source_fingerprint
+from db.catalogs import CATALOGS, get_catalog_db_path, get_refresh_ttl_hours
+from db.connection_pool import close_read_pools
+
+def is_valid_snapshot(db_path, table_name):
+    """Check that a database file holds a readable, non-empty catalog table"""
+    if not db_path.exists() or db_path.stat().st_size == 0:
+        return False
+    try:
+        with sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True) as conn:
+            row = conn.execute(f'SELECT 1 FROM "{table_name}" LIMIT 1').fetchone()
+        return row is not None
+    except sqlite3.Error:
+        return False
+
+def get_snapshot_age_hours(db_path, table_name):
+    """
+    Get the number of hours since a catalog was last downloaded or confirmed unchanged
+
+    Uses the "Date Added to Tool" stamp the downloaders write (or the last time
+    the source was checked and found unchanged), since the file's modification
+    time only reflects when the build was checked out.
+    """
+    try:
+        with sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True) as conn:
+            row = conn.execute(f'SELECT MAX("Date Added to Tool") FROM "{table_name}"').fetchone()
+        refreshed_at = datetime.strptime(str(row[0])[:19], '%Y-%m-%d %H:%M:%S').timestamp()
+    except (sqlite3.Error, TypeError, ValueError):
+        refreshed_at = db_path.stat().st_mtime
+
+    fingerprint = get_source_fingerprint(table_name)
+    if fingerprint:
+        checked_at = datetime.strptime(fingerprint['checked_at'], '%Y-%m-%d %H:%M:%S').timestamp()
+        refreshed_at = max(refreshed_at, checked_at)
+    return (time.time() - refreshed_at) / 3600
+
+def needs_refresh(equipment_type):
+    """
+    Decide whether a catalog should be downloaded again
+
+    Returns:
+        tuple: (needs_refresh, reason)
+    """
+    catalog = CATALOGS[equipment_type]
+    db_path = Path(get_catalog_db_path(catalog['db_name']))
+
+    if not is_valid_snapshot(db_path, catalog['table_name']):
+        return True, "no usable snapshot"
+
+    age_hours = get_snapshot_age_hours(db_path, catalog['table_name'])
+    ttl_hours = get_refresh_ttl_hours(equipment_type)
+    if age_hours >= ttl_hours:
+        return True, f"snapshot is {age_hours:.1f}h old (TTL {ttl_hours:g}h)"
+
+    return False, f"snapshot is {age_hours:.1f}h old (TTL {ttl_hours:g}h)"
+
+def get_backup_path(db_path):
+    """Get the path of the copy kept of a snapshot while it's being refreshed"""
+    return db_path.with_name(f"{db_path.name}.bak")
+
+def _copy_database(source_path, target_path):
+    """Copy one SQLite database over another page by page, under SQLite's own locking"""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def backup_snapshot(db_path, table_name):
+    """
+    Keep a copy of the current snapshot so a failed download can't leave us with nothing
+
+    Returns:
+        bool: True if there was a usable snapshot to copy
+    """
+    if not is_valid_snapshot(db_path, table_name):
+        return False
+    discard_backup(db_path)
+    _copy_database(db_path, get_backup_path(db_path))
+    return True
+
+def discard_backup(db_path):
+    """Remove the copy of a snapshot once its refresh is over"""
+    backup_path = get_backup_path(db_path)
+    if backup_path.exists():
+        backup_path.unlink()
+
+def restore_snapshot(db_path, table_name):
+    """
+    Put the last good snapshot back after a failed download
+
+    The backup is copied next to the catalog and swapped in with a rename, so
+    readers see either the old file or the whole restored one. A rollback
+    journal left by a stopped downloader is removed first, since SQLite would
+    otherwise replay it into the restored file. The downloader may also have
+    recorded its source fingerprint before it was stopped, so that is dropped;
+    otherwise the next run would skip the same file as unchanged. Pooled read
+    connections are closed so the next query opens the restored file.
+    """
+    backup_path = get_backup_path(db_path)
+    if not backup_path.exists():
+        return
+    print(f"Restoring last good snapshot of {db_path.name}")
+    restore_path = db_path.with_name(f"{db_path.name}.restore")
+    shutil.copy2(backup_path, restore_path)
+    journal_path = db_path.with_name(f"{db_path.name}-journal")
+    if journal_path.exists():
+        journal_path.unlink()
+    os.replace(restore_path, db_path)
+    forget_source_fingerprint(table_name)
+    close_read_pools()
+    close_catalog_pool()
@@ -1,26 +1,38 @@
-import requests
 import pandas as pd
 import sqlite3
 from io import BytesIO
 from datetime import datetime
+import os
+import sys
+
+# Add parent directory to path so we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress import download_with_progress, report_progress
+from utils.source_schema import detect_header, record_header_layout, read_rows_below_header
+from utils.ingest import skip_if_source_unchanged, mark_source_loaded, add_manufacturer_ids, deduplicate_rows, write_rejects, add_missing_columns
+from db.catalog_stats import write_dataset_summary, write_column_stats
+from db.manufacturers import write_manufacturer_lookup
+from db.row_keys import assign_row_ids, index_row_keys
 
 # Step 1: Download the Excel file
 url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=InvertersList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
+content = download_with_progress(url)
+source_sha256 = skip_if_source_unchanged('inverters', content)
 
 # Step 2: Load the Excel file into a pandas DataFrame
-# Skip to row 14 (0-indexed, so this is the 15th row) for headers
-# And use row 15 (0-indexed, so this is the 16th row) for units
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=14, nrows=1)
+# Find the header row by its column names rather than a fixed row number,
+# and stop here if the header layout changed since the last accepted load
+# The units row follows the header row
+header_row, headers = detect_header(content, 'inverters')
+excel_data = BytesIO(content)
+df_headers = pd.read_excel(excel_data, engine='openpyxl', header=header_row, nrows=1)
 excel_data.seek(0)  # Reset the file pointer
-df_units = pd.read_excel(excel_data, engine='openpyxl', header=None, skiprows=15, nrows=1)
+df_units = pd.read_excel(excel_data, engine='openpyxl', header=None, skiprows=header_row + 1, nrows=1)
 
-# Get the actual data starting from row 16 (0-indexed, so this is the 17th row)
-excel_data.seek(0)  # Reset the file pointer
-df = pd.read_excel(excel_data, engine='openpyxl', header=14, skiprows=2)
+# Data starts at the first row under the detected header that has a manufacturer
+# and model number, so the units row and any notes rows are skipped
+df = read_rows_below_header(content, header_row, headers)
 
 # Combine column names with units
 column_names = []
@@ -31,7 +43,9 @@ for i, col in enumerate(df_headers.columns):
     else:
         column_names.append(col)
 
-df.columns = column_names
+# Data columns line up with the header cells by position
+df = df.iloc[:, :len(column_names)]
+df.columns = column_names[:df.shape[1]]
 
 # Print column names to debug
 print("Available columns:")
@@ -47,10 +61,22 @@ df['inverter_id'] = df['Manufacturer Name'].astype(str) + '_' + df['Model Number
 current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 df['Date Added to Tool'] = current_time
 
+# Map manufacturer spellings to canonical integer IDs
+add_manufacturer_ids(df, 'Manufacturer Name')
+
+# Resolve duplicate keys up front so the bulk insert never hits them
+df, rejects = deduplicate_rows(df, 'inverter_id')
+
+report_progress('parse', rows_parsed=len(df))
+
 # Step 5: Connect to SQLite database (or create it) using context manager
+rows_written = 0
 with sqlite3.connect('db/inverters.db') as conn:
     cursor = conn.cursor()
 
+    # Give every row its stable integer key before the table is written
+    df['row_id'] = assign_row_ids(conn, df['inverter_id'])
+
     # Step 6: Check if the table exists, if not create it with a primary key
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inverters'")
     table_exists = cursor.fetchone() is not None
@@ -83,6 +109,8 @@ with sqlite3.connect('db/inverters.db') as conn:
         for col in columns:
             if col == 'inverter_id':
                 column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+            elif col in ('manufacturer_id', 'row_id'):
+                column_defs.append(f'"{col}" INTEGER')
             else:
                 column_defs.append(f'"{col}" TEXT')
         
@@ -90,27 +118,16 @@ with sqlite3.connect('db/inverters.db') as conn:
         create_table_query = f'CREATE TABLE IF NOT EXISTS inverters ({columns_str});'
         cursor.execute(create_table_query)
         
-        # Insert all data - use try/except to handle any integrity errors
-        try:
-            # First try with if_exists='append'
-            df.to_sql('inverters', conn, if_exists='append', index=False)
-            print(f"Created new table and inserted {len(df)} rows.")
-        except sqlite3.IntegrityError:
-            # If we get integrity errors, try inserting one by one
-            print("Handling duplicate primary keys...")
-            inserted = 0
-            for _, row in df.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('inverters', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} rows, skipped {len(df) - inserted} duplicates.")
-        except Exception as e:
-            print(f"Error inserting data: {e}")
+        # Keys are unique after deduplication, so all rows go in as one batch.
+        # A failed write raises, failing the refresh so the last good snapshot is restored
+        df.to_sql('inverters', conn, if_exists='append', index=False)
+        rows_written = len(df)
+        print(f"Created new table and inserted {len(df)} rows.")
     else:
         # Table exists with inverter_id column, we need to handle upserts
+        # Tables written before a column was introduced get it added
+        add_missing_columns(conn, 'inverters', df.columns, {'manufacturer_id': 'INTEGER', 'row_id': 'INTEGER'})
+
         # First, get existing inverter_ids
         cursor.execute("SELECT inverter_id FROM inverters")
         existing_ids = [row[0] for row in cursor.fetchall()]
@@ -121,16 +138,10 @@ with sqlite3.connect('db/inverters.db') as conn:
         
         # Insert new records
         if not df_new.empty:
-            # Insert one by one to handle any potential integrity errors
-            inserted = 0
-            for _, row in df_new.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('inverters', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} new inverters.")
+            # Keys are unique after deduplication, so new records go in as one batch
+            df_new.to_sql('inverters', conn, if_exists='append', index=False)
+            rows_written += len(df_new)
+            print(f"Inserted {len(df_new)} new inverters.")
         else:
             print("No new inverters to insert.")
         
@@ -162,10 +173,22 @@ with sqlite3.connect('db/inverters.db') as conn:
             cursor.execute(update_query, params)
             update_count += cursor.rowcount
         
+        rows_written += update_count
         print(f"Updated {update_count} existing inverters.")
 
+    # Materialize the stats shown at the top of the tab and the column profiles alongside the rows
+    index_row_keys(conn, 'inverters', 'inverter_id')
+    write_rejects(conn, 'inverters', rejects, 'inverter_id')
+    write_manufacturer_lookup(conn, 'inverters', df['manufacturer_id'])
+    write_dataset_summary(conn, 'inverters', source_sha256)
+    write_column_stats(conn, 'inverters')
+
     # Connection will be automatically committed and closed by the context manager
 
+report_progress('write', rows_written=rows_written)
+record_header_layout('inverters', header_row, headers)
+mark_source_loaded('inverters', source_sha256, content)
+
 print("Inverter data has been successfully downloaded and stored in the database.")
 print(f"Total rows: {len(df)}")
 print(f"Total columns: {len(df.columns)}")
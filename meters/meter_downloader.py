@@ -1,9 +1,19 @@
-import requests
 import pandas as pd
 import sqlite3
-from io import BytesIO
 from datetime import datetime
 import re
+import os
+import sys
+
+# Add parent directory to path so we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress import download_with_progress, report_progress
+from utils.source_schema import detect_header, record_header_layout, read_rows_below_header, map_columns_by_name
+from utils.ingest import skip_if_source_unchanged, mark_source_loaded, add_manufacturer_ids, deduplicate_rows, write_rejects
+from db.catalog_stats import write_dataset_summary, write_column_stats
+from db.manufacturers import write_manufacturer_lookup
+from db.row_keys import assign_row_ids, index_row_keys
 
 def parse_date_to_standard_format(date_value):
     """
@@ -56,96 +66,55 @@ def parse_date_to_standard_format(date_value):
 
 # Step 1: Download the Excel file
 url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=MeterList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
+content = download_with_progress(url)
+source_sha256 = skip_if_source_unchanged('meters', content)
 
 # Step 2: Load the Excel file into a pandas DataFrame
-# Headers are on row 8 (0-indexed, so this is the 9th row)
-# Data starts from row 9 (0-indexed, so this is the 10th row)
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=7, nrows=1)
-excel_data.seek(0)  # Reset the file pointer
+# Find the header row by its column names rather than a fixed row number,
+# and stop here if the header layout changed since the last accepted load
+header_row, headers = detect_header(content, 'meters')
+df = read_rows_below_header(content, header_row, headers)
 
-# Get the actual data starting from row 9 (0-indexed, so this is the 10th row)
-df = pd.read_excel(excel_data, engine='openpyxl', header=7, skiprows=1)
+# Define the current time for the timestamp
+current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-# Print column names to debug
-print("Available columns:")
-for i, col in enumerate(df.columns):
-    print(f"{i}: {col}")
+# Step 3: Map the source columns to our standardized names by header name
+METERS_COLUMNS = {
+    'Manufacturer': ['Manufacturer Name', 'Manufacturer'],
+    'Model Number': ['Model Number'],
+    'Display Type': ['Display Type'],
+    'PBI Meter': ['PBI Meter'],
+    'Note': ['Note', 'Notes'],
+    'Meter Listing Date': ['CEC Listing Date', 'Listing Date'],
+    'Last Update': ['Last Update', 'Last Update Date'],
+}
+df = map_columns_by_name(df, headers, METERS_COLUMNS)
 
-# Print the first row's values to debug
-print("\nFirst row values:")
-for i, val in enumerate(df.iloc[0]):
-    print(f"{i}: {val}")
+# Convert the dates to standardized YYYY-MM-DD format
+df['Meter Listing Date'] = df['Meter Listing Date'].apply(parse_date_to_standard_format)
+df['Last Update'] = df['Last Update'].apply(parse_date_to_standard_format)
 
-# Define the current time for the timestamp
-current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# Add the Date Added to Tool column
+df['Date Added to Tool'] = current_time
 
-# Create a new DataFrame with only the columns we need
-new_df = pd.DataFrame()
+# Create a unique identifier for each meter
+df['meter_id'] = df['Manufacturer'].astype(str) + '_' + df['Model Number'].astype(str)
 
-try:
-    # Map columns according to the Excel structure provided by the user
-    # Column A: Manufacturer Name
-    new_df['Manufacturer'] = df.iloc[:, 0]
-    
-    # Column B: Model Number
-    new_df['Model Number'] = df.iloc[:, 1]
-    
-    # Column C: Display Type
-    new_df['Display Type'] = df.iloc[:, 2]
-    
-    # Column D: PBI Meter
-    new_df['PBI Meter'] = df.iloc[:, 3]
-    
-    # Column E: Note
-    new_df['Note'] = df.iloc[:, 4]
-    
-    # Column I: CEC Listing Date - Convert to standardized YYYY-MM-DD format
-    new_df['Meter Listing Date'] = df.iloc[:, 8].apply(parse_date_to_standard_format)
-    
-    # Column J: Last Update - Convert to standardized YYYY-MM-DD format
-    new_df['Last Update'] = df.iloc[:, 9].apply(parse_date_to_standard_format)
-    
-    # Add the Date Added to Tool column
-    new_df['Date Added to Tool'] = current_time
-    
-    # Create a unique identifier for each meter
-    new_df['meter_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    
-    # Print the columns in our new DataFrame
-    print("\nNew DataFrame columns:")
-    for col in new_df.columns:
-        print(f"- {col}")
-    
-    # Replace the original DataFrame with our new one
-    df = new_df
-    
-except Exception as e:
-    print(f"Error mapping columns: {e}")
-    # If we encounter an error, we'll create a minimal DataFrame with just the essential columns
-    new_df = pd.DataFrame()
-    new_df['Manufacturer'] = df.iloc[:, 0]  # Column A: Manufacturer Name
-    new_df['Model Number'] = df.iloc[:, 1]  # Column B: Model Number
-    new_df['Display Type'] = df.iloc[:, 2]  # Column C: Display Type
-    new_df['PBI Meter'] = df.iloc[:, 3]  # Column D: PBI Meter
-    new_df['Note'] = df.iloc[:, 4]  # Column E: Note
-    # Column I: CEC Listing Date - Convert to standardized YYYY-MM-DD format
-    new_df['Meter Listing Date'] = df.iloc[:, 8].apply(parse_date_to_standard_format)
-    
-    # Column J: Last Update - Convert to standardized YYYY-MM-DD format
-    new_df['Last Update'] = df.iloc[:, 9].apply(parse_date_to_standard_format)
-    new_df['Date Added to Tool'] = current_time
-    new_df['meter_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
-    df = new_df
-    print("Created minimal DataFrame due to error")
+# Map manufacturer spellings to canonical integer IDs
+add_manufacturer_ids(df, 'Manufacturer')
+
+# Resolve duplicate keys up front so the bulk insert never hits them
+df, rejects = deduplicate_rows(df, 'meter_id')
+
+report_progress('parse', rows_parsed=len(df))
 
 # Step 5: Connect to SQLite database (or create it) using context manager
 with sqlite3.connect('db/meters.db') as conn:
     cursor = conn.cursor()
 
+    # Give every row its stable integer key before the table is written
+    df['row_id'] = assign_row_ids(conn, df['meter_id'])
+
     # Step 6: Check if the table exists, if not create it with a primary key
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='meters'")
     table_exists = cursor.fetchone() is not None
@@ -167,6 +136,8 @@ with sqlite3.connect('db/meters.db') as conn:
     for col in columns:
         if col == 'meter_id':
             column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+        elif col in ('manufacturer_id', 'row_id'):
+            column_defs.append(f'"{col}" INTEGER')
         else:
             column_defs.append(f'"{col}" TEXT')
     
@@ -179,6 +150,7 @@ with sqlite3.connect('db/meters.db') as conn:
     try:
         # First try with if_exists='replace' to ensure we have a clean table
         df.to_sql('meters', conn, if_exists='replace', index=False)
+        rows_written = len(df)
         print(f"Created new table and inserted {len(df)} rows.")
     except Exception as e:
         print(f"Error inserting data: {e}")
@@ -193,10 +165,22 @@ with sqlite3.connect('db/meters.db') as conn:
                 print(f"Error inserting row: {e}")
                 # Skip problematic rows
                 pass
+        rows_written = inserted
         print(f"Inserted {inserted} rows out of {len(df)}.")
     
+    # Materialize the stats shown at the top of the tab and the column profiles alongside the rows
+    index_row_keys(conn, 'meters', 'meter_id')
+    write_rejects(conn, 'meters', rejects, 'meter_id')
+    write_manufacturer_lookup(conn, 'meters', df['manufacturer_id'])
+    write_dataset_summary(conn, 'meters', source_sha256)
+    write_column_stats(conn, 'meters')
+
     # Connection will be automatically committed and closed by the context manager
 
+report_progress('write', rows_written=rows_written)
+record_header_layout('meters', header_row, headers)
+mark_source_loaded('meters', source_sha256, content)
+
 print("Meter data has been successfully downloaded and stored in the database.")
 print(f"Total rows: {len(df)}")
 print(f"Total columns: {len(df.columns)}")
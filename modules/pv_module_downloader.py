@@ -1,26 +1,38 @@
-import requests
 import pandas as pd
 import sqlite3
 from io import BytesIO
 from datetime import datetime
+import os
+import sys
+
+# Add parent directory to path so we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress import download_with_progress, report_progress
+from utils.source_schema import detect_header, record_header_layout, read_rows_below_header
+from utils.ingest import skip_if_source_unchanged, mark_source_loaded, add_manufacturer_ids, deduplicate_rows, write_rejects, add_missing_columns
+from db.catalog_stats import write_dataset_summary, write_column_stats
+from db.manufacturers import write_manufacturer_lookup
+from db.row_keys import assign_row_ids, index_row_keys
 
 # Step 1: Download the Excel file
 url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=PVModuleList'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
+content = download_with_progress(url)
+source_sha256 = skip_if_source_unchanged('pv_modules', content)
 
 # Step 2: Load the Excel file into a pandas DataFrame
-# Skip to row 16 (0-indexed, so this is the 17th row) for headers
-# And use row 17 (0-indexed, so this is the 18th row) for units
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=16, nrows=1)
+# Find the header row by its column names rather than a fixed row number,
+# and stop here if the header layout changed since the last accepted load
+# The units row follows the header row
+header_row, headers = detect_header(content, 'pv_modules')
+excel_data = BytesIO(content)
+df_headers = pd.read_excel(excel_data, engine='openpyxl', header=header_row, nrows=1)
 excel_data.seek(0)  # Reset the file pointer
-df_units = pd.read_excel(excel_data, engine='openpyxl', header=None, skiprows=17, nrows=1)
+df_units = pd.read_excel(excel_data, engine='openpyxl', header=None, skiprows=header_row + 1, nrows=1)
 
-# Get the actual data starting from row 18 (0-indexed, so this is the 19th row)
-excel_data.seek(0)  # Reset the file pointer
-df = pd.read_excel(excel_data, engine='openpyxl', header=16, skiprows=2)
+# Data starts at the first row under the detected header that has a manufacturer
+# and model number, so the units row and any notes rows are skipped
+df = read_rows_below_header(content, header_row, headers)
 
 # Combine column names with units
 column_names = []
@@ -31,7 +43,9 @@ for i, col in enumerate(df_headers.columns):
     else:
         column_names.append(col)
 
-df.columns = column_names
+# Data columns line up with the header cells by position
+df = df.iloc[:, :len(column_names)]
+df.columns = column_names[:df.shape[1]]
 
 # Step 3: Create a unique identifier for each module
 # We'll use a combination of Manufacturer and Model Number
@@ -42,10 +56,22 @@ df['module_id'] = df['Manufacturer'].astype(str) + '_' + df['Model Number'].asty
 current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 df['Date Added to Tool'] = current_time
 
+# Map manufacturer spellings to canonical integer IDs
+add_manufacturer_ids(df, 'Manufacturer')
+
+# Resolve duplicate keys up front so the bulk insert never hits them
+df, rejects = deduplicate_rows(df, 'module_id')
+
+report_progress('parse', rows_parsed=len(df))
+
 # Step 5: Connect to SQLite database (or create it) using context manager
-with sqlite3.connect('pv_modules.db') as conn:
+rows_written = 0
+with sqlite3.connect('db/pv_modules.db') as conn:
     cursor = conn.cursor()
 
+    # Give every row its stable integer key before the table is written
+    df['row_id'] = assign_row_ids(conn, df['module_id'])
+
     # Step 6: Check if the table exists, if not create it with a primary key
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pv_modules'")
     table_exists = cursor.fetchone() is not None
@@ -72,6 +98,8 @@ with sqlite3.connect('pv_modules.db') as conn:
         for col in columns:
             if col == 'module_id':
                 column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+            elif col in ('manufacturer_id', 'row_id'):
+                column_defs.append(f'"{col}" INTEGER')
             else:
                 column_defs.append(f'"{col}" TEXT')
         
@@ -85,27 +113,16 @@ with sqlite3.connect('pv_modules.db') as conn:
                                   else x.strftime('%Y-%m-%d %H:%M:%S') if isinstance(x, pd.Timestamp) 
                                   else x)
         
-        # Insert all data - use try/except to handle any integrity errors
-        try:
-            # First try with if_exists='append'
-            df.to_sql('pv_modules', conn, if_exists='append', index=False)
-            print(f"Created new table and inserted {len(df)} rows.")
-        except sqlite3.IntegrityError:
-            # If we get integrity errors, try inserting one by one
-            print("Handling duplicate primary keys...")
-            inserted = 0
-            for _, row in df.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('pv_modules', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} rows, skipped {len(df) - inserted} duplicates.")
-        except Exception as e:
-            print(f"Error inserting data: {e}")
+        # Keys are unique after deduplication, so all rows go in as one batch.
+        # A failed write raises, failing the refresh so the last good snapshot is restored
+        df.to_sql('pv_modules', conn, if_exists='append', index=False)
+        rows_written = len(df)
+        print(f"Created new table and inserted {len(df)} rows.")
     else:
         # Table exists with module_id column, we need to handle upserts
+        # Tables written before a column was introduced get it added
+        add_missing_columns(conn, 'pv_modules', df.columns, {'manufacturer_id': 'INTEGER', 'row_id': 'INTEGER'})
+
         # First, get existing module_ids
         cursor.execute("SELECT module_id FROM pv_modules")
         existing_ids = [row[0] for row in cursor.fetchall()]
@@ -116,16 +133,10 @@ with sqlite3.connect('pv_modules.db') as conn:
         
         # Insert new records
         if not df_new.empty:
-            # Insert one by one to handle any potential integrity errors
-            inserted = 0
-            for _, row in df_new.iterrows():
-                try:
-                    pd.DataFrame([row]).to_sql('pv_modules', conn, if_exists='append', index=False)
-                    inserted += 1
-                except sqlite3.IntegrityError:
-                    # Skip duplicates
-                    pass
-            print(f"Inserted {inserted} new modules.")
+            # Keys are unique after deduplication, so new records go in as one batch
+            df_new.to_sql('pv_modules', conn, if_exists='append', index=False)
+            rows_written += len(df_new)
+            print(f"Inserted {len(df_new)} new modules.")
         else:
             print("No new modules to insert.")
         
@@ -157,10 +168,22 @@ with sqlite3.connect('pv_modules.db') as conn:
             cursor.execute(update_query, params)
             update_count += cursor.rowcount
         
+        rows_written += update_count
         print(f"Updated {update_count} existing modules.")
 
+    # Materialize the stats shown at the top of the tab and the column profiles alongside the rows
+    index_row_keys(conn, 'pv_modules', 'module_id')
+    write_rejects(conn, 'pv_modules', rejects, 'module_id')
+    write_manufacturer_lookup(conn, 'pv_modules', df['manufacturer_id'])
+    write_dataset_summary(conn, 'pv_modules', source_sha256)
+    write_column_stats(conn, 'pv_modules')
+
     # Connection will be automatically committed and closed by the context manager
 
+report_progress('write', rows_written=rows_written)
+record_header_layout('pv_modules', header_row, headers)
+mark_source_loaded('pv_modules', source_sha256, content)
+
 print("Data has been successfully downloaded and stored in the database.")
 print(f"Total rows: {len(df)}")
 print(f"Total columns: {len(df.columns)}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Catalog refresh scheduler
+
+Long-running process that refreshes each CEC catalog on its own interval.
+The interval is the catalog's refresh TTL (REFRESH_TTL_HOURS_<TABLE>), with
+random jitter so the datasets don't all come due at once. Downloaders run at
+a lower CPU priority and share the job runner's file lock, so only one heavy
+parse runs at a time and Streamlit keeps serving requests. Unchanged source
+files are detected by their fingerprint and skipped without a reload.
+Old entries of the AVL audit log are compacted once a day.
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from db.avl_audit import compact_audit_log
+from db.catalog_meta import create_refresh_job
+from db.catalogs import CATALOGS, get_catalog_db_path, get_refresh_ttl_hours
+from db.snapshots import get_snapshot_age_hours, needs_refresh
+from utils.refresh_jobs import run_refresh_job
+
+# Fraction of each interval added or removed at random
+JITTER_FRACTION = float(os.environ.get('REFRESH_JITTER_FRACTION', '0.1'))
+
+# Niceness applied to downloader processes started by the scheduler
+SCHEDULER_NICENESS = int(os.environ.get('REFRESH_NICENESS', '10'))
+
+# Longest time to sleep between checks for due datasets, in seconds
+MAX_SLEEP_SECONDS = 60
+
+# Time between compactions of the AVL audit log, in seconds
+AUDIT_COMPACT_INTERVAL_SECONDS = 24 * 3600
+
+def get_interval_seconds(equipment_type):
+    """Get the time until the next refresh of a dataset, with jitter applied"""
+    interval = get_refresh_ttl_hours(equipment_type) * 3600
+    jitter = interval * JITTER_FRACTION
+    return max(interval + random.uniform(-jitter, jitter), 60)
+
+def get_initial_due_time(equipment_type, now):
+    """
+    Get when a dataset should first be refreshed
+
+    Stale or missing datasets are due right away; fresh ones are due once the
+    rest of their TTL has passed.
+    """
+    stale, reason = needs_refresh(equipment_type)
+    print(f"{equipment_type}: {reason}")
+    if stale:
+        return now
+
+    catalog = CATALOGS[equipment_type]
+    db_path = Path(get_catalog_db_path(catalog['db_name']))
+    age_hours = get_snapshot_age_hours(db_path, catalog['table_name'])
+    remaining = max(get_refresh_ttl_hours(equipment_type) - age_hours, 0) * 3600
+    return now + remaining + random.uniform(0, remaining * JITTER_FRACTION)
+
+def refresh_dataset(equipment_type):
+    """Run one scheduled refresh, unless a refresh of the dataset is already active"""
+    job_id, created = create_refresh_job(equipment_type, requested_by='scheduler')
+    if not created:
+        print(f"{equipment_type}: refresh job {job_id} already active, skipping")
+        return
+
+    print(f"{equipment_type}: starting scheduled refresh (job {job_id})")
+    start_time = time.time()
+    success = run_refresh_job(job_id, equipment_type, niceness=SCHEDULER_NICENESS)
+    status = "finished" if success else "failed"
+    print(f"{equipment_type}: scheduled refresh {status} in {time.time() - start_time:.1f}s")
+
+def run_scheduler():
+    """Refresh each catalog on its own cadence, forever"""
+    now = time.time()
+    due_times = {equipment_type: get_initial_due_time(equipment_type, now) for equipment_type in CATALOGS}
+    compact_due = now
+
+    while True:
+        now = time.time()
+        # Refreshes run one after another, most overdue first
+        for equipment_type in sorted(due_times, key=due_times.get):
+            if due_times[equipment_type] > now:
+                continue
+            try:
+                refresh_dataset(equipment_type)
+            except Exception as e:
+                print(f"{equipment_type}: scheduled refresh raised {e}")
+            due_times[equipment_type] = time.time() + get_interval_seconds(equipment_type)
+
+        if compact_due <= time.time():
+            try:
+                compact_audit_log()
+            except Exception as e:
+                print(f"AVL audit log compaction raised {e}")
+            compact_due = time.time() + AUDIT_COMPACT_INTERVAL_SECONDS
+
+        next_due = min(due_times.values())
+        time.sleep(min(max(next_due - time.time(), 1), MAX_SLEEP_SECONDS))
+
+if __name__ == "__main__":
+    try:
+        run_scheduler()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -5,6 +5,9 @@ import time
 import concurrent.futures
 from pathlib import Path
 
+from db.catalogs import CATALOGS, get_catalog_db_path
+from db.snapshots import backup_snapshot, discard_backup, is_valid_snapshot, needs_refresh, restore_snapshot
+
 # Maximum time to wait for each downloader in seconds
 DOWNLOADER_TIMEOUT = 120
 
@@ -14,124 +17,101 @@ MAX_RETRIES = 2
 # Check if we're running on Railway
 IS_RAILWAY = 'RAILWAY_ENVIRONMENT' in os.environ
 
-def run_downloader(downloader_path, python_executable):
-    """Run a single downloader script with timeout and retries."""
-    downloader_str = str(downloader_path)
-    db_name = os.path.basename(downloader_str).replace('_downloader.py', '.db')
-    if 'inverter' in downloader_str:
-        db_name = 'inverters.db'
-    elif 'energy_storage' in downloader_str:
-        db_name = 'energy_storage.db'
-    elif 'battery' in downloader_str:
-        db_name = 'batteries.db'
-    elif 'meter' in downloader_str:
-        db_name = 'meters.db'
-    elif 'pv_module' in downloader_str:
-        db_name = 'pv_modules.db'
-    
-    # Check if database already exists
+def run_downloader(equipment_type, python_executable, force=False):
+    """Run a single downloader script with timeout and retries, keeping the last good snapshot."""
+    catalog = CATALOGS[equipment_type]
     base_dir = Path(os.path.dirname(os.path.abspath(__file__)))
-    db_path = base_dir / 'db' / db_name
-    
-    if db_path.exists() and db_path.stat().st_size > 0:
-        print(f"Database {db_name} already exists, skipping download")
+    downloader_str = str(base_dir / catalog['downloader'])
+    db_name = catalog['db_name']
+    db_path = Path(get_catalog_db_path(db_name))
+
+    # Serve the existing snapshot while it's still fresh
+    stale, reason = needs_refresh(equipment_type)
+    if not stale and not force:
+        print(f"Database {db_name} is fresh ({reason}), skipping download")
         return True
-    
-    print(f"Running {downloader_str}...")
-    
-    for attempt in range(MAX_RETRIES + 1):
-        try:
-            # Run with timeout
-            process = subprocess.run(
-                [python_executable, downloader_str],
-                check=True,
-                timeout=DOWNLOADER_TIMEOUT,
-                capture_output=True,
-                text=True
-            )
-            print(f"Successfully ran {downloader_str}")
-            return True
-        except subprocess.TimeoutExpired:
-            print(f"Timeout running {downloader_str} (attempt {attempt+1}/{MAX_RETRIES+1})")
-            if attempt == MAX_RETRIES:
-                print(f"Giving up on {downloader_str} after {MAX_RETRIES+1} attempts")
-                # Create an empty file to prevent future download attempts
-                if IS_RAILWAY and not db_path.exists():
-                    print(f"Creating empty database {db_name} to continue deployment")
-                    db_path.touch()
-                return False
-        except subprocess.CalledProcessError as e:
-            print(f"Error running {downloader_str}: {e}")
-            print(f"STDOUT: {e.stdout}")
-            print(f"STDERR: {e.stderr}")
-            if attempt == MAX_RETRIES:
-                print(f"Giving up on {downloader_str} after {MAX_RETRIES+1} attempts")
-                # Create an empty file to prevent future download attempts
-                if IS_RAILWAY and not db_path.exists():
-                    print(f"Creating empty database {db_name} to continue deployment")
-                    db_path.touch()
-                return False
-        except Exception as e:
-            print(f"Unexpected error running {downloader_str}: {e}")
-            if attempt == MAX_RETRIES:
-                print(f"Giving up on {downloader_str} after {MAX_RETRIES+1} attempts")
-                # Create an empty file to prevent future download attempts
-                if IS_RAILWAY and not db_path.exists():
-                    print(f"Creating empty database {db_name} to continue deployment")
-                    db_path.touch()
-                return False
-        
-        # Wait before retrying
-        if attempt < MAX_RETRIES:
-            wait_time = 2 ** attempt  # Exponential backoff
-            print(f"Waiting {wait_time} seconds before retrying...")
-            time.sleep(wait_time)
-    
-    return False
-
-def run_downloaders():
-    """Run all data downloaders to set up the databases."""
+
+    print(f"Running {downloader_str} ({reason})...")
+
+    has_snapshot = backup_snapshot(db_path, catalog['table_name'])
+
+    # Without a usable snapshot, reload even if the source file is unchanged
+    command = [python_executable, downloader_str]
+    if force or not has_snapshot:
+        command.append('--force')
+
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                # Run with timeout
+                subprocess.run(
+                    command,
+                    check=True,
+                    timeout=DOWNLOADER_TIMEOUT,
+                    capture_output=True,
+                    text=True,
+                    cwd=str(base_dir)
+                )
+                if is_valid_snapshot(db_path, catalog['table_name']):
+                    print(f"Successfully ran {downloader_str}")
+                    return True
+                print(f"{downloader_str} finished without producing a usable {db_name} "
+                      f"(attempt {attempt+1}/{MAX_RETRIES+1})")
+            except subprocess.TimeoutExpired:
+                print(f"Timeout running {downloader_str} (attempt {attempt+1}/{MAX_RETRIES+1})")
+            except subprocess.CalledProcessError as e:
+                print(f"Error running {downloader_str}: {e}")
+                print(f"STDOUT: {e.stdout}")
+                print(f"STDERR: {e.stderr}")
+            except Exception as e:
+                print(f"Unexpected error running {downloader_str}: {e}")
+
+            restore_snapshot(db_path, catalog['table_name'])
+
+            # Wait before retrying
+            if attempt < MAX_RETRIES:
+                wait_time = 2 ** attempt  # Exponential backoff
+                print(f"Waiting {wait_time} seconds before retrying...")
+                time.sleep(wait_time)
+
+        print(f"Giving up on {downloader_str} after {MAX_RETRIES+1} attempts, serving the last good snapshot")
+        return False
+    finally:
+        discard_backup(db_path)
+
+def run_downloaders(force=False):
+    """Refresh every stale catalog database."""
     print("Setting up databases...")
     start_time = time.time()
-    
-    # Get base directory
-    base_dir = Path(os.path.dirname(os.path.abspath(__file__)))
-    
+
     # Get Python executable
     python_executable = sys.executable
-    
-    # List of downloader scripts to run with absolute paths
-    downloaders = [
-        base_dir / "modules" / "pv_module_downloader.py",
-        base_dir / "inverters" / "inverter_downloader.py",
-        base_dir / "batteries" / "battery_downloader.py",
-        base_dir / "storage" / "energy_storage_downloader.py",
-        base_dir / "meters" / "meter_downloader.py"
-    ]
-    
+
+    equipment_types = list(CATALOGS)
+
     # Run downloaders in parallel if not on Railway
     if not IS_RAILWAY:
         print("Running downloaders in parallel...")
         with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {executor.submit(run_downloader, d, python_executable): d for d in downloaders}
+            futures = {executor.submit(run_downloader, t, python_executable, force): t for t in equipment_types}
             for future in concurrent.futures.as_completed(futures):
-                downloader = futures[future]
+                equipment_type = futures[future]
                 try:
                     success = future.result()
                     if not success:
-                        print(f"Warning: Failed to download data for {downloader}")
+                        print(f"Warning: Failed to download data for {equipment_type}")
                 except Exception as e:
-                    print(f"Exception running {downloader}: {e}")
+                    print(f"Exception running downloader for {equipment_type}: {e}")
     else:
         # On Railway, run sequentially to avoid memory issues
         print("Running downloaders sequentially (Railway environment detected)...")
-        for downloader in downloaders:
-            success = run_downloader(downloader, python_executable)
+        for equipment_type in equipment_types:
+            success = run_downloader(equipment_type, python_executable, force)
             if not success:
-                print(f"Warning: Failed to download data for {downloader}")
-    
+                print(f"Warning: Failed to download data for {equipment_type}")
+
     end_time = time.time()
     print(f"Database setup complete in {end_time - start_time:.2f} seconds!")
 
 if __name__ == "__main__":
-    run_downloaders()
+    run_downloaders(force='--force' in sys.argv[1:])
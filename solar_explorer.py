@@ -1,14 +1,30 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-import subprocess
 import os
-import sys
-from datetime import datetime
+import time
+import uuid
+from datetime import datetime, timedelta
 from pathlib import Path
-from db.approved_vendor_list import save_approved_vendor_list_data, load_approved_vendor_list_data, delete_approved_vendor_list_item
-from utils.column_mapper import render_column_mapping_interface, STANDARD_COLUMNS
-from components.avl_crud import render_avl_crud_interface
+from db.approved_vendor_list import EQUIPMENT_CATEGORIES, get_update_columns, load_approved_vendor_list_frame, partition_by_category, get_avl_version, delete_approved_vendor_list_item
+from db.cec_matches import CATEGORY_CATALOGS, LISTING_STATUSES, ensure_avl_matches, get_listing_status
+from db.avl_audit import get_changes_since
+from db.avl_staging import export_staged_upload, import_staged_upload, preview_staged_upload, read_staged_rows
+from utils.avl_upload import ENCODING_SNIFF_BYTES, read_upload_sample, sniff_encoding, stage_csv_upload
+from utils.column_auto_mapper import get_learned_mapping
+from utils.column_mapper import render_column_mapping_interface, STANDARD_COLUMNS, validate_mapping
+from utils.session_artifacts import get_frame, get_frame_preview, put_frame
+from components.avl_crud import get_current_actor, render_avl_crud_interface
+from components.bom_lookup import render_bom_lookup
+from db.catalogs import CATALOGS
+from components.paginated_grid import render_paginated_grid
+from db.catalog_cache import load_catalog_snapshot, build_search_index, build_facet_index, get_dataset_versions
+from db.connection_pool import close_read_pools
+from db.catalog_db import close_catalog_pool
+from db.catalog_stats import get_dataset_summary
+from db.manufacturers import PRIORITY_MANUFACTURER
+from db.catalog_meta import get_refresh_job
+from utils.refresh_jobs import submit_refresh, describe_job_progress
+from db.record_lookup import fetch_records_by_id, search_record_ids, get_id_options_page, clear_record_cache
 
 # Set page configuration
 st.set_page_config(
@@ -388,156 +404,113 @@ def get_db_path(db_name):
 
 
 # Function to load equipment data (unified function)
-@st.cache_data
-def load_equipment_data(db_name, table_name, date_columns):
+# Keeps the current and previous version of each catalog
+@st.cache_data(max_entries=2 * len(CATALOGS))
+def load_equipment_data(equipment_type, data_version=None):
     """
-    Unified function to load equipment data from any database.
+    Unified function to load a catalog snapshot for any equipment type.
+    
+    Snapshots are prebuilt by start_app.py at boot, so this is normally just
+    a pickle read; it rebuilds the snapshot if the database changed since.
     
     Args:
-        db_name: Name of the database file (e.g., 'pv_modules.db')
-        table_name: Name of the table in the database (e.g., 'pv_modules')
-        date_columns: List of date column names to process
+        equipment_type: Equipment type as registered in db.catalogs.CATALOGS
+        data_version: Current version of the catalog database. Part of the
+            cache key, so a refreshed catalog is reloaded on its own while the
+            other catalogs stay cached.
     
     Returns:
-        DataFrame with processed date columns
+        dict with the DataFrame ('data'), search index ('search') and
+        manufacturer facet ('manufacturers')
     """
-    with sqlite3.connect(get_db_path(db_name)) as conn:
-        query = f"SELECT * FROM {table_name}"
-        df = pd.read_sql_query(query, conn)
-    
-    # Handle date columns - they're already stored as strings in the database
-    for col in date_columns:
-        if col in df.columns:
-            # Vectorized operation instead of apply
-            mask = df[col].notna() & df[col].astype(str).str.len().gt(10)
-            df.loc[mask, col] = df.loc[mask, col].astype(str).str[:10]
-    
-    return df
-
-# Wrapper functions for each equipment type
-@st.cache_data
-def load_pv_data():
-    return load_equipment_data('pv_modules.db', 'pv_modules', 
-                              ['CEC Listing Date', 'Last Update', 'Date Added to Tool'])
+    return load_catalog_snapshot(equipment_type)
 
-@st.cache_data
-def load_inverter_data():
-    return load_equipment_data('inverters.db', 'inverters', 
-                              ['Date Added to Tool', 'Last Update', 'Grid Support Listing Date'])
+# Function to notice catalogs refreshed by another session or the scheduler
+def check_for_catalog_updates():
+    """
+    Compare the catalog versions this session last rendered with the current ones
+    
+    Returns:
+        dict mapping equipment type to its current data version
+    """
+    versions = get_dataset_versions()
+    seen_versions = st.session_state.get('catalog_versions')
+    if seen_versions is not None:
+        for equipment_type, version in versions.items():
+            if version is not None and seen_versions.get(equipment_type) not in (None, version):
+                st.toast(f"{equipment_type} data was updated, showing the latest version")
+    st.session_state['catalog_versions'] = versions
+    return versions
 
-@st.cache_data
-def load_energy_storage_data():
-    return load_equipment_data('energy_storage.db', 'energy_storage', 
-                              ['Date Added to Tool', 'Last Update', 'Energy Storage Listing Date', 'Certificate Date'])
+# Function to queue a background refresh of an equipment catalog
+def request_refresh(equipment_type):
+    try:
+        job_id, created = submit_refresh(equipment_type)
+    except Exception as e:
+        st.error(f"Error starting refresh: {str(e)}")
+        return None
+    st.session_state[f"refresh_job_{equipment_type}"] = job_id
+    if not created:
+        st.info(f"A refresh of {equipment_type} is already running.")
+    return job_id
 
-@st.cache_data
-def load_battery_data():
-    return load_equipment_data('batteries.db', 'batteries', 
-                              ['Date Added to Tool', 'Last Update', 'Battery Listing Date', 'Certificate Date'])
+# Seconds between progress bar updates while a refresh is active
+REFRESH_POLL_SECONDS = 1
 
-@st.cache_data
-def load_meter_data():
-    return load_equipment_data('meters.db', 'meters', 
-                              ['Date Added to Tool', 'Last Update', 'Meter Listing Date'])
+# Progress bars of the refreshes still running, by equipment type, as (job ID, placeholder)
+active_refresh_progress = {}
 
-# Function to run the appropriate downloader script based on equipment type
-def run_downloader(equipment_type):
-    try:
-        # Determine which script to run based on equipment type
-        if equipment_type == "PV Modules":
-            script_path = str(BASE_DIR / "modules" / "pv_module_downloader.py")
-        elif equipment_type == "Grid Support Inverter List":
-            script_path = str(BASE_DIR / "inverters" / "inverter_downloader.py")
-        elif equipment_type == "Energy Storage Systems":
-            script_path = str(BASE_DIR / "storage" / "energy_storage_downloader.py")
-        elif equipment_type == "Batteries":
-            script_path = str(BASE_DIR / "batteries" / "battery_downloader.py")
-        elif equipment_type == "Meters":
-            script_path = str(BASE_DIR / "meters" / "meter_downloader.py")
-        else:
-            st.error(f"Unknown equipment type: {equipment_type}")
-            return False
-        
-        # Check if the script exists
-        if not os.path.exists(script_path):
-            st.error(f"Downloader script not found: {script_path}")
-            return False
-        
-        # Run the script using subprocess with the correct Python executable
-        python_executable = sys.executable
-        result = subprocess.run([python_executable, script_path], 
-                              capture_output=True, 
-                              text=True, 
-                              check=False)
-        
-        if result.returncode == 0:
-            st.success(f"Successfully updated {equipment_type} database.")
-            # Clear cache to force reload of data
-            st.cache_data.clear()
-            return True
-        else:
-            st.error(f"Error updating {equipment_type} database: {result.stderr}")
-            with st.expander("View Error Details"):
-                st.code(result.stderr)
-            return False
-    except Exception as e:
-        st.error(f"Error running downloader: {str(e)}")
-        return False
+# Function to show the progress of a background refresh without blocking the page
+# Active progress bars are updated in place once the page has rendered (see the end of the script)
+def show_refresh_progress(equipment_type):
+    job_key = f"refresh_job_{equipment_type}"
+    job_id = st.session_state.get(job_key)
+    if job_id is None:
+        return
+    
+    job = get_refresh_job(job_id)
+    if job is None:
+        del st.session_state[job_key]
+        return
+    
+    if job['state'] in ('queued', 'running'):
+        fraction, status_text = describe_job_progress(job)
+        placeholder = st.empty()
+        placeholder.progress(fraction, text=f"Refreshing {equipment_type}: {status_text}")
+        active_refresh_progress[equipment_type] = (job_id, placeholder)
+    elif job['state'] == 'succeeded':
+        del st.session_state[job_key]
+        st.success(f"Successfully updated {equipment_type} database.")
+        # The new data version makes load_equipment_data reload just this catalog
+        clear_record_cache()
+        close_read_pools()
+        close_catalog_pool()
+        st.rerun()
+    else:
+        del st.session_state[job_key]
+        st.error(f"Error updating {equipment_type} database.")
+        with st.expander("View Error Details"):
+            st.code(job.get('message') or "No output captured")
 
 # Function to display equipment data with consistent formatting
-def display_equipment_data(equipment_type, df, id_column, manufacturer_column, model_column, efficiency_column, power_column):
+def display_equipment_data(equipment_type, df, id_column, manufacturer_column, model_column, efficiency_column, power_column, catalog_snapshot=None):
     
-    # Display statistics in a consistent format
-    # Determine which date column to use based on equipment type
-    date_column = None
-    if equipment_type == "PV Modules":
-        date_column = 'CEC Listing Date'
-    elif equipment_type == "Grid Support Inverter List":
-        date_column = 'Grid Support Listing Date'
-    elif equipment_type == "Energy Storage Systems":
-        date_column = 'Energy Storage Listing Date'
-    elif equipment_type == "Batteries":
-        date_column = 'Battery Listing Date'
-    elif equipment_type == "Meters":
-        date_column = 'Meter Listing Date'
-    
-    # Handle the date formatting safely
-    latest_listing_date = "N/A"
-    if date_column and date_column in df.columns and not df.empty:
-        try:
-            # Filter out None, 'None', and empty values before finding max date
-            valid_dates = df[df[date_column].notna() & 
-                             (df[date_column].astype(str) != 'None') & 
-                             (df[date_column].astype(str) != '')][date_column]
-            
-            if not valid_dates.empty:
-                max_date = valid_dates.max()
-                if isinstance(max_date, str) and len(max_date) > 0:
-                    # If it contains time, just take the date part
-                    if ' ' in max_date:
-                        latest_listing_date = max_date.split(' ')[0]
-                    else:
-                        latest_listing_date = max_date
-                else:
-                    latest_listing_date = str(max_date) if max_date else "N/A"
-            else:
-                latest_listing_date = "N/A"
-        except Exception as e:
-            print(f"Error processing dates: {e}")
-            latest_listing_date = "N/A"
+    # Use the prebuilt search and facet indexes when available
+    if catalog_snapshot is None:
+        catalog_snapshot = {
+            'search': build_search_index(df, manufacturer_column, model_column),
+            'manufacturers': build_facet_index(df, manufacturer_column)
+        }
     
-    # Format the label based on equipment type
-    date_label = "Latest Listing Date"
-    if equipment_type == "PV Modules":
-        date_label = "Latest CEC Listing Date"
-    elif equipment_type == "Grid Support Inverter List":
-        date_label = "Latest Grid Support Listing Date"
-    elif equipment_type == "Energy Storage Systems":
-        date_label = "Latest Energy Storage Listing Date"
-    elif equipment_type == "Batteries":
-        date_label = "Latest Battery Listing Date"
-    elif equipment_type == "Meters":
-        date_label = "Latest Meter Listing Date"
+    # Display statistics in a consistent format
+    # The stats are materialized at ingest, so this is one primary-key lookup
+    catalog = CATALOGS[equipment_type]
+    date_column = catalog['listing_date_column']
+    date_label = catalog['listing_date_label']
+    summary = get_dataset_summary(equipment_type)
+    if summary is None:
+        summary = {'row_count': len(df), 'manufacturer_count': df[manufacturer_column].nunique(), 'latest_listing_date': None}
+    latest_listing_date = summary['latest_listing_date'] or "N/A"
     
     # Create a container for stats and refresh button
     stats_container = st.container()
@@ -562,8 +535,8 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             </div>
         </div>
         """.format(
-            len(df), 
-            df[manufacturer_column].nunique(),
+            summary['row_count'], 
+            summary['manufacturer_count'],
             date_label,
             latest_listing_date
         ), unsafe_allow_html=True)
@@ -572,9 +545,8 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
         # Add refresh button aligned with the Latest Listing Date box
         st.markdown("<div style='margin-top: 45px;'></div>", unsafe_allow_html=True)
         if st.button("⟳", key=f"refresh_button_{equipment_type}", help="Download latest data and refresh"):
-            # Set downloading state
-            st.session_state[f"downloading_{equipment_type}"] = True
-            st.rerun()
+            # Queue the refresh in the background; progress is shown below
+            request_refresh(equipment_type)
     
     # Create a row with two columns - one for filters on the left and search on the right
     filter_col, search_col = st.columns([1, 1])
@@ -583,7 +555,7 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
     with filter_col:
         with st.expander("Add Filters Here"):
             # Filter by manufacturer
-            manufacturers = ["All"] + sorted(df[manufacturer_column].unique().tolist())
+            manufacturers = ["All"] + catalog_snapshot['manufacturers'].index.tolist()
             selected_manufacturer = st.selectbox(
                 "Manufacturer", 
                 manufacturers,
@@ -593,8 +565,14 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             # Filter by efficiency if available
             if efficiency_column in df.columns:
                 try:
-                    min_efficiency = float(df[efficiency_column].min())
-                    max_efficiency = float(df[efficiency_column].max())
+                    # Use the range profiled at ingest instead of scanning the column
+                    efficiency_stats = catalog_snapshot.get('column_stats', {}).get(efficiency_column)
+                    if efficiency_stats and efficiency_stats['inferred_type'] in ('integer', 'real'):
+                        min_efficiency = float(efficiency_stats['min_value'])
+                        max_efficiency = float(efficiency_stats['max_value'])
+                    else:
+                        min_efficiency = float(df[efficiency_column].min())
+                        max_efficiency = float(df[efficiency_column].max())
                     efficiency_range = st.slider(
                         f"Efficiency (%)",
                         min_efficiency,
@@ -620,8 +598,9 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             if tab_search_query:
                 try:
                     # Handle potential errors in string operations
-                    search_results = df[df[manufacturer_column].astype(str).str.contains(tab_search_query, case=False, na=False) | 
-                                      df[model_column].astype(str).str.contains(tab_search_query, case=False, na=False)]
+                    # Match against the prebuilt lowercase manufacturer/model index
+                    search_index = catalog_snapshot['search'].reindex(df.index)
+                    search_results = df[search_index.str.contains(tab_search_query.lower(), regex=False, na=False)]
                     
                     # Only update df if we found results
                     if not search_results.empty:
@@ -635,23 +614,19 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
         
     # Refresh button has been moved to align with the Latest Listing Date box
     
-    # Show downloading spinner below refresh button if downloading
-    if st.session_state.get(f"downloading_{equipment_type}", False):
-        with st.spinner(f"Downloading latest {equipment_type} data..."):
-            # Run the appropriate downloader script
-            success = run_downloader(equipment_type)
-            # Clear downloading state
-            st.session_state[f"downloading_{equipment_type}"] = False
-            if success:
-                # Clear cache and reload the app
-                st.cache_data.clear()
-                st.rerun()
+    # Show refresh progress below the refresh button while a refresh is running
+    show_refresh_progress(equipment_type)
     
     # Apply filters
     filtered_df = df.copy()
     
     if selected_manufacturer != "All":
-        filtered_df = filtered_df[filtered_df[manufacturer_column] == selected_manufacturer]
+        # Filter on the canonical integer ID when the catalog has one, so all spellings match
+        manufacturer_ids = catalog_snapshot.get('manufacturer_ids') or {}
+        if selected_manufacturer in manufacturer_ids and 'manufacturer_id' in filtered_df.columns:
+            filtered_df = filtered_df[filtered_df['manufacturer_id'] == manufacturer_ids[selected_manufacturer]]
+        else:
+            filtered_df = filtered_df[filtered_df[manufacturer_column] == selected_manufacturer]
     
     if efficiency_column and efficiency_column in df.columns:
         try:
@@ -663,7 +638,7 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
             st.warning(f"Could not apply {efficiency_column} filter due to data type issues.")
     
     # Select columns to display
-    all_columns = df.columns.tolist()
+    all_columns = [col for col in df.columns if col not in ('manufacturer_id', 'row_id')]
     default_columns = [id_column, manufacturer_column, model_column]
     
     # Determine the appropriate columns for each equipment type
@@ -720,32 +695,35 @@ def display_equipment_data(equipment_type, df, id_column, manufacturer_column, m
         key=f"columns_{equipment_type}"
     )
     
-    # Sort the dataframe to prioritize Qcells and then by date
-    # First, create a new column to identify Qcells
-    filtered_df['is_qcells'] = filtered_df[manufacturer_col].astype(str).str.contains('Qcells', case=False, na=False)
-    
-    # Sort by is_qcells (True first) and then by date if available
-    if date_col and date_col in filtered_df.columns:
-        try:
-            # Convert date column to datetime for proper sorting
-            filtered_df[date_col] = pd.to_datetime(filtered_df[date_col], errors='coerce')
-            # Sort by is_qcells first (descending to put True first), then by date (descending for newest first)
-            sorted_df = filtered_df.sort_values(by=['is_qcells', date_col], ascending=[False, False])
-        except Exception:
-            # If date conversion fails, just sort by is_qcells
-            sorted_df = filtered_df.sort_values(by=['is_qcells'], ascending=[False])
-    else:
-        # If no date column, just sort by is_qcells
-        sorted_df = filtered_df.sort_values(by=['is_qcells'], ascending=[False])
-    
-    # Remove the temporary column before displaying
-    sorted_df = sorted_df.drop(columns=['is_qcells'])
-    
-    # Display the sorted dataframe with selected columns
-    if selected_columns:
-        st.dataframe(sorted_df[selected_columns], use_container_width=True)
-    else:
-        st.dataframe(sorted_df, use_container_width=True)
+    # Default ordering: prioritize Qcells and then newest listing date
+    priority_manufacturer_id = (catalog_snapshot.get('manufacturer_ids') or {}).get(PRIORITY_MANUFACTURER)
+    def priority_order(frame):
+        if priority_manufacturer_id is not None and 'manufacturer_id' in frame.columns:
+            is_qcells = frame['manufacturer_id'].eq(priority_manufacturer_id)
+        else:
+            is_qcells = frame[manufacturer_col].astype(str).str.contains('Qcells', case=False, na=False)
+        sort_keys = pd.DataFrame({'is_qcells': is_qcells.to_numpy()})
+        sort_by, ascending = ['is_qcells'], [False]
+        if date_col and date_col in frame.columns:
+            sort_keys[date_col] = pd.to_datetime(frame[date_col], errors='coerce').to_numpy()
+            sort_by.append(date_col)
+            ascending.append(False)
+        return sort_keys.sort_values(by=sort_by, ascending=ascending, kind='stable').index.to_numpy()
+    
+    # Only the visible page is sent to the browser; the ordering is cached server-side
+    render_paginated_grid(
+        filtered_df,
+        selected_columns,
+        key=equipment_type,
+        signature=(
+            selected_manufacturer,
+            tuple(efficiency_range) if efficiency_column and efficiency_column in df.columns else None,
+            tab_search_query,
+            int(pd.util.hash_pandas_object(filtered_df['row_id' if 'row_id' in filtered_df.columns else id_column], index=False).sum())
+        ),
+        default_order=priority_order,
+        default_sort_label="Qcells first, newest listing"
+    )
     
     return filtered_df
 
@@ -754,38 +732,85 @@ def display_equipment_comparison(filtered_df, equipment_type, id_column):
     st.subheader(f"{equipment_type} Comparison")
     st.markdown(f"Select {equipment_type.lower()} to compare their specifications side by side.")
     
-    # Get list of equipment
-    equipment_list = filtered_df[id_column].tolist()
-    if len(equipment_list) > 1:
+    # Get list of equipment IDs (only the key column, full records are fetched on demand)
+    # Selections hold the integer row_id when the catalog has one, labelled by the natural key
+    key_column = 'row_id' if 'row_id' in filtered_df.columns else id_column
+    equipment_ids = filtered_df[key_column].reset_index(drop=True)
+    id_labels = filtered_df[id_column].reset_index(drop=True)
+    if len(equipment_ids) > 1:
+        selected_key = f"compare_selected_{equipment_type}"
+        if selected_key not in st.session_state:
+            st.session_state[selected_key] = []
+        
+        # Searchable, paginated option source instead of one huge options list
+        search_col, page_col = st.columns([3, 1])
+        with search_col:
+            id_search = st.text_input(
+                f"Find {equipment_type.lower()} to compare",
+                "",
+                placeholder="Enter part of a manufacturer or model...",
+                key=f"compare_search_{equipment_type}"
+            )
+        matching_ids = search_record_ids(equipment_ids, id_search, labels=id_labels)
+        _, total_pages = get_id_options_page(matching_ids, 1)
+        with page_col:
+            page = st.number_input(
+                f"Page (of {total_pages})",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                step=1,
+                key=f"compare_page_{equipment_type}"
+            )
+        page_ids, _ = get_id_options_page(matching_ids, page)
+        
+        # Keep earlier selections available as options while paging
+        selected = st.session_state[selected_key]
+        options = selected + [record_id for record_id in page_ids if record_id not in selected]
+        labels_by_id = dict(zip(equipment_ids, id_labels))
         selected_equipment = st.multiselect(
             f"Select {equipment_type.lower()} to compare",
-            equipment_list,
+            options,
+            default=selected,
+            format_func=lambda record_id: labels_by_id.get(record_id, str(record_id)),
             max_selections=3,
             key=f"compare_{equipment_type}"
         )
+        st.session_state[selected_key] = selected_equipment
         
         if selected_equipment:
-            comparison_df = filtered_df[filtered_df[id_column].isin(selected_equipment)]
-            
-            # Transpose the dataframe for side-by-side comparison
-            comparison_df = comparison_df.set_index(id_column).T
+            catalog = CATALOGS[equipment_type]
+            comparison_df = fetch_records_by_id(
+                get_db_path(catalog['db_name']),
+                catalog['table_name'],
+                key_column,
+                selected_equipment
+            )
             
-            st.dataframe(comparison_df, use_container_width=True)
+            if not comparison_df.empty:
+                # Transpose the dataframe for side-by-side comparison
+                comparison_df = comparison_df.drop(columns=['row_id', 'manufacturer_id'], errors='ignore').set_index(id_column).T
+                
+                st.dataframe(comparison_df, use_container_width=True)
     else:
         st.info(f"Apply filters to see more {equipment_type.lower()} for comparison.")
 
+# Pick up catalogs refreshed since this session's last run
+catalog_versions = check_for_catalog_updates()
+
 # Create main tabs for California CEC and Approved Vendor List
 main_tab1, main_tab2 = st.tabs(["California CEC", "DCA - Approved Vendor List"])
 
 # California CEC Tab with subtabs for equipment types
 with main_tab1:
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["PV Modules", "Grid Support Inverter List", "Energy Storage Systems", "Batteries", "Meters"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["PV Modules", "Grid Support Inverter List", "Energy Storage Systems", "Batteries", "Meters", "BOM Lookup"])
 
 # PV Modules Tab
 with tab1:
     # Load PV module data
     with st.spinner("Loading PV Modules data..."):
-        df_pv = load_pv_data()
+        snapshot_pv = load_equipment_data("PV Modules", catalog_versions["PV Modules"])
+        df_pv = snapshot_pv['data']
         filtered_df_pv = display_equipment_data(
             "PV Modules",
             df_pv,
@@ -793,7 +818,8 @@ with tab1:
             'Manufacturer',
             'Model Number',
             'PTC Efficiency (%)',
-            'Power Rating (W)'
+            'Power Rating (W)',
+            catalog_snapshot=snapshot_pv
         )
         display_equipment_comparison(filtered_df_pv, "PV Modules", 'module_id')
 
@@ -802,7 +828,8 @@ with tab2:
     # Load Grid Support Inverter data
     with st.spinner("Loading Grid Support Inverter List data..."):
         try:
-            df_inv = load_inverter_data()
+            snapshot_inv = load_equipment_data("Grid Support Inverter List", catalog_versions["Grid Support Inverter List"])
+            df_inv = snapshot_inv['data']
             filtered_df_inv = display_equipment_data(
                 "Grid Support Inverter List",
                 df_inv,
@@ -810,7 +837,8 @@ with tab2:
                 'Manufacturer Name',
                 'Model Number1',
                 'CEC Weighted Efficiency (%)',
-                'Rated Output Power at Unity Power Factor ((kW))'
+                'Rated Output Power at Unity Power Factor ((kW))',
+                catalog_snapshot=snapshot_inv
             )
             display_equipment_comparison(filtered_df_inv, "Grid Support Inverter List", 'inverter_id')
         except Exception as e:
@@ -821,7 +849,8 @@ with tab3:
     # Load Energy Storage Systems data
     with st.spinner("Loading Energy Storage Systems data..."):
         try:
-            df_storage = load_energy_storage_data()
+            snapshot_storage = load_equipment_data("Energy Storage Systems", catalog_versions["Energy Storage Systems"])
+            df_storage = snapshot_storage['data']
             filtered_df_storage = display_equipment_data(
                 "Energy Storage Systems",
                 df_storage,
@@ -829,7 +858,8 @@ with tab3:
                 'Manufacturer',
                 'Model Number',
                 'Round Trip Efficiency (%)',
-                'Maximum Discharge Rate (kW)'
+                'Maximum Discharge Rate (kW)',
+                catalog_snapshot=snapshot_storage
             )
             display_equipment_comparison(filtered_df_storage, "Energy Storage Systems", 'storage_id')
         except Exception as e:
@@ -838,16 +868,16 @@ with tab3:
             
             # Add a button to run the downloader script directly if no data is available
             if st.button("Download Energy Storage Data"):
-                success = run_downloader("Energy Storage Systems")
-                if success:
-                    st.experimental_rerun()
+                request_refresh("Energy Storage Systems")
+            show_refresh_progress("Energy Storage Systems")
 
 # Batteries Tab
 with tab4:
     # Load Batteries data
     with st.spinner("Loading Batteries data..."):
         try:
-            df_battery = load_battery_data()
+            snapshot_battery = load_equipment_data("Batteries", catalog_versions["Batteries"])
+            df_battery = snapshot_battery['data']
             filtered_df_battery = display_equipment_data(
                 "Batteries",
                 df_battery,
@@ -855,7 +885,8 @@ with tab4:
                 'Manufacturer',
                 'Model Number',
                 'Round Trip Efficiency (%)',
-                'Discharge Rate (kW)'
+                'Discharge Rate (kW)',
+                catalog_snapshot=snapshot_battery
             )
             display_equipment_comparison(filtered_df_battery, "Batteries", 'battery_id')
         except Exception as e:
@@ -864,16 +895,16 @@ with tab4:
             
             # Add a button to run the downloader script directly if no data is available
             if st.button("Download Batteries Data"):
-                success = run_downloader("Batteries")
-                if success:
-                    st.experimental_rerun()
+                request_refresh("Batteries")
+            show_refresh_progress("Batteries")
 
 # Meters Tab
 with tab5:
     # Load Meters data
     with st.spinner("Loading Meters data..."):
         try:
-            df_meter = load_meter_data()
+            snapshot_meter = load_equipment_data("Meters", catalog_versions["Meters"])
+            df_meter = snapshot_meter['data']
             filtered_df_meter = display_equipment_data(
                 "Meters",
                 df_meter,
@@ -881,7 +912,8 @@ with tab5:
                 'Manufacturer',
                 'Model Number',
                 'Display Type',
-                'PBI Meter'
+                'PBI Meter',
+                catalog_snapshot=snapshot_meter
             )
             display_equipment_comparison(filtered_df_meter, "Meters", 'meter_id')
         except Exception as e:
@@ -890,28 +922,137 @@ with tab5:
             
             # Add a button to run the downloader script directly if no data is available
             if st.button("Download Meters Data"):
-                success = run_downloader("Meters")
-                if success:
-                    st.experimental_rerun()
+                request_refresh("Meters")
+            show_refresh_progress("Meters")
+
+# BOM Lookup Tab
+with tab6:
+    render_bom_lookup()
 
 # Function to load vendor data
-@st.cache_data
-def load_approved_vendor_list_data_cached():
+@st.cache_data(max_entries=2)
+def load_approved_vendor_list_data_cached(data_version=None):
+    """
+    Load the approved vendor list once per database version
+
+    Returns:
+        tuple: (all rows without the ID column, dict of rows with ID by exact equipment category)
+    """
     try:
-        df = load_approved_vendor_list_data()
-        return df
+        df = load_approved_vendor_list_frame()
     except Exception as e:
         st.error(f"Error loading approved vendor list data: {str(e)}")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
+    return df.drop(columns='ID'), partition_by_category(df)
+
+@st.cache_data(max_entries=2)
+def load_listing_status_cached(avl_version=None, catalog_versions=None):
+    """
+    Match the AVL to the CEC catalogs if either changed and read every item's listing status
+
+    Returns:
+        DataFrame indexed by AVL item ID
+    """
+    try:
+        ensure_avl_matches()
+        return get_listing_status()
+    except Exception as e:
+        print(f"Could not match the AVL to the CEC catalogs: {e}")
+        return pd.DataFrame(columns=['status', 'confidence', 'matches', 'cec_model'])
+
+# Staged rows shown when previewing an upload
+UPLOAD_PREVIEW_ROWS = 100
+
+def show_import_preview(upload, key):
+    """Show how many staged rows would be inserted, updated or left unchanged"""
+    if st.button("Preview Import", key=f"preview_import_{key}"):
+        try:
+            preview = preview_staged_upload(upload['upload_id'], upload['update_columns'])
+        except Exception as e:
+            st.error(f"Error previewing import: {str(e)}")
+            return
+        col1, col2, col3 = st.columns(3)
+        col1.metric("New", preview['inserted'])
+        col2.metric("Updated", preview['updated'])
+        col3.metric("Unchanged", preview['unchanged'])
+        if not preview['sample'].empty:
+            st.caption(f"First {len(preview['sample'])} rows that would change")
+            st.dataframe(preview['sample'], use_container_width=True)
+
+def stage_avl_upload(uploaded_file, upload, column_mapping=None):
+    """Stream an uploaded CSV into staging once per file and column mapping"""
+    if upload['summary'] is not None and upload.get('staged_mapping') == column_mapping:
+        return upload['summary']
+    
+    progress_bar = st.progress(0.0, text="Staging upload...")
+    
+    def report_staging_progress(rows, bytes_read, bytes_total):
+        progress_bar.progress(bytes_read / bytes_total if bytes_total else 1.0, text=f"Staged {rows:,} rows")
+    
+    upload['summary'] = stage_csv_upload(
+        uploaded_file, upload['encoding'], upload['upload_id'], column_mapping, report_staging_progress
+    )
+    upload['staged_mapping'] = column_mapping
+    # A file that stopped decoding past the sniffed sample was staged in another encoding
+    upload['encoding'] = upload['summary']['encoding']
+    upload['update_columns'] = get_update_columns(
+        column_mapping.values() if column_mapping else get_frame_preview('raw_csv_data').columns
+    )
+    upload.pop('saved', None)
+    progress_bar.empty()
+    return upload['summary']
+
+def show_staged_upload(upload, key, title, save_label):
+    """Show a bounded preview of a staged upload and save it on request"""
+    if upload.get('saved'):
+        stats = upload['saved']
+        st.success(f"Saved approved vendor list in {stats['total_seconds']:.2f} seconds: "
+                   f"{stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged")
+        return
+    
+    summary = upload['summary']
+    st.success(f"Validated {summary['rows']:,} rows in {summary['seconds']:.2f} seconds")
+    if summary['rejected']:
+        st.warning(f"{summary['rejected']:,} rows failed validation and won't be saved")
+        st.dataframe(read_staged_rows(upload['upload_id'], UPLOAD_PREVIEW_ROWS, rejected=True), use_container_width=True)
+    
+    # Display the first staged rows
+    st.subheader(title)
+    if summary['valid'] > UPLOAD_PREVIEW_ROWS:
+        st.caption(f"Showing the first {UPLOAD_PREVIEW_ROWS} of {summary['valid']:,} valid rows")
+    st.dataframe(read_staged_rows(upload['upload_id'], UPLOAD_PREVIEW_ROWS), use_container_width=True)
+    
+    # Build the processed CSV only when asked for
+    if st.button("Prepare Download", key=f"prepare_download_{key}"):
+        st.download_button(
+            label="Download Processed Data",
+            data=export_staged_upload(upload['upload_id']),
+            file_name="processed_approved_vendor_list.csv",
+            mime="text/csv",
+            key=f"download_processed_{key}"
+        )
+    
+    show_import_preview(upload, key)
+    
+    # Add a button to save to database
+    if st.button(save_label, key=f"save_upload_{key}"):
+        try:
+            upload['saved'] = import_staged_upload(upload['upload_id'], upload['update_columns'], actor=get_current_actor())
+            
+            # Update last upload date
+            st.session_state.last_upload_date = datetime.now().strftime('%Y-%m-%d')
+            
+            # The new database version reloads the cached list
+            st.session_state.mapping_step = False  # Reset mapping step
+            st.experimental_rerun()  # Rerun to refresh the UI
+        except Exception as e:
+            st.error(f"Error saving to database: {str(e)}")
 
 # Approved Vendor List Tab
 with main_tab2:
     # Removed redundant header
     
     # Initialize session state for approved vendor list data if not exists
-    if 'avl_data' not in st.session_state:
-        st.session_state.avl_data = None
-        
     # Initialize session state for last upload date if not exists
     if 'last_upload_date' not in st.session_state:
         st.session_state.last_upload_date = datetime.now().strftime('%Y-%m-%d')
@@ -919,40 +1060,41 @@ with main_tab2:
         st.session_state.raw_csv_data = None
     if 'mapping_step' not in st.session_state:
         st.session_state.mapping_step = False
-    if 'mapped_df' not in st.session_state:
-        st.session_state.mapped_df = None
+    if 'avl_upload' not in st.session_state:
+        st.session_state.avl_upload = None
     
     # Load existing approved vendor list data
-    df_existing_avl = load_approved_vendor_list_data_cached()
+    df_existing_avl, avl_partitions = load_approved_vendor_list_data_cached(get_avl_version())
+    listing_status = load_listing_status_cached(get_avl_version(), get_dataset_versions())
+    
+    # Who is making changes, for the AVL change history
+    st.text_input("Your name (for the change history)", key="avl_actor",
+                  placeholder="Changes are attributed to this browser session when left empty")
+    with st.expander("Recent Changes"):
+        changes_since = st.date_input("Changes since", value=datetime.now() - timedelta(days=7), key="avl_changes_since")
+        recent_changes = get_changes_since(changes_since)
+        if recent_changes.empty:
+            st.caption("No changes since then")
+        else:
+            st.dataframe(recent_changes.drop(columns=['Entry']), use_container_width=True, hide_index=True)
     
     # Create equipment category subtabs
-    equipment_categories = [
-        "PV Module", 
-        "PV Module + Inverter", 
-        "Inverter", 
-        "Optimizer", 
-        "Battery", 
-        "Battery Expansion", 
-        "Non-Steel Roof Racking"
-    ]
+    equipment_categories = EQUIPMENT_CATEGORIES
     
     # Create subtabs for equipment categories
     avl_tabs = st.tabs(equipment_categories)
     
-    # Function to filter data by equipment category
-    def filter_by_category(df, category):
-        if df.empty:
-            return df
-        if "Equipment Category" in df.columns:
-            # Use exact matching instead of partial matching
-            return df[df["Equipment Category"] == category]
-        return pd.DataFrame()
-    
     # Function to render equipment category tab content
-    def render_equipment_tab(category, tab_container, df_data):
+    def render_equipment_tab(category, tab_container, partitions):
         with tab_container:
-            # Filter data for this category
-            filtered_df = filter_by_category(df_data, category)
+            # Rows with exactly this category, split off when the list was loaded
+            filtered_df = partitions.get(category, pd.DataFrame())
+            
+            # CEC listing status from the stored AVL ↔ CEC match
+            if not filtered_df.empty and category in CATEGORY_CATALOGS:
+                filtered_df = filtered_df.assign(
+                    **{'CEC Status': filtered_df['ID'].map(listing_status['status']).fillna('not checked')}
+                )
             
             if not filtered_df.empty:
                 # Get the last upload date from session state
@@ -980,13 +1122,19 @@ with main_tab2:
                     last_upload_date
                 ), unsafe_allow_html=True)
                 
+                if 'CEC Status' in filtered_df.columns:
+                    status_counts = filtered_df['CEC Status'].value_counts()
+                    st.caption("CEC listing: " + " · ".join(
+                        f"{status_counts[status]} {status}" for status in LISTING_STATUSES if status in status_counts
+                    ))
+                
                 # Column selection functionality is implemented in the avl_crud.py component
                 
                 # Add separator before CRUD operations
                 st.markdown("---")
                 
                 # Render CRUD interface for this category
-                render_avl_crud_interface(category_filter=category)
+                render_avl_crud_interface(category_filter=category, df=filtered_df)
                 
             else:
                 st.info(f"No {category.lower()} equipment found in the database.")
@@ -1001,11 +1149,11 @@ with main_tab2:
                 
                 # Show CRUD interface even if empty (allows adding new records)
                 st.markdown("---")
-                render_avl_crud_interface(category_filter=category)
+                render_avl_crud_interface(category_filter=category, df=filtered_df)
     
     # Render each equipment category tab
     for i, category in enumerate(equipment_categories):
-        render_equipment_tab(category, avl_tabs[i], df_existing_avl)
+        render_equipment_tab(category, avl_tabs[i], avl_partitions)
     
     # Add separator and upload section
     st.markdown("---")
@@ -1021,25 +1169,42 @@ with main_tab2:
         
         if uploaded_file is not None:
             try:
-                # Read the CSV file with error handling for different encodings
-                try:
-                    # First try UTF-8 encoding
-                    raw_df = pd.read_csv(uploaded_file)
-                except UnicodeDecodeError:
-                    # If UTF-8 fails, try with Latin-1 encoding
-                    uploaded_file.seek(0)  # Reset file pointer
-                    raw_df = pd.read_csv(uploaded_file, encoding='latin1')
+                upload = st.session_state.avl_upload
+                if upload is None or upload['file_id'] != uploaded_file.file_id:
+                    encoding = sniff_encoding(uploaded_file.read(ENCODING_SNIFF_BYTES))
+                    upload = {
+                        'file_id': uploaded_file.file_id,
+                        'upload_id': uuid.uuid4().hex,
+                        'encoding': encoding,
+                        'summary': None,
+                    }
+                    st.session_state.avl_upload = upload
+                    # Keep only a sample of the file for the column mapping screen
+                    put_frame('raw_csv_data', read_upload_sample(uploaded_file, encoding))
+                raw_df = get_frame('raw_csv_data')
+                if raw_df is None:
+                    # The spilled sample expired, so read it from the upload again
+                    raw_df = read_upload_sample(uploaded_file, upload['encoding'])
+                    put_frame('raw_csv_data', raw_df)
                 
                 # Display success message
-                st.success(f"Successfully uploaded {uploaded_file.name} with {len(raw_df)} records")
-                
-                # Store raw data in session state for mapping
-                st.session_state.raw_csv_data = raw_df
+                st.success(f"Successfully uploaded {uploaded_file.name} ({uploaded_file.size:,} bytes, {upload['encoding']})")
                 
                 # Check if the CSV already has the standard columns
                 missing_columns = [col for col in STANDARD_COLUMNS if col not in raw_df.columns]
                 
-                if missing_columns:
+                learned_mapping = get_learned_mapping(raw_df.columns) if missing_columns else None
+                
+                if learned_mapping and validate_mapping(learned_mapping)[0] and not st.session_state.mapping_step:
+                    # Same header layout as an upload mapped before: reuse the confirmed mapping
+                    st.info("Columns mapped with the mapping you confirmed for a file with these columns before.")
+                    if st.button("Edit Mapping"):
+                        st.session_state.mapping_step = True
+                        st.session_state.column_mapping = dict(learned_mapping)
+                        st.experimental_rerun()
+                    stage_avl_upload(uploaded_file, upload, learned_mapping)
+                    show_staged_upload(upload, "learned", "Mapped Approved Vendor List Data", "Save Mapped Data to Database")
+                elif missing_columns:
                     st.warning(f"Your CSV is missing {len(missing_columns)} standardized columns. You'll need to map your columns.")
                     
                     # Show column mapping button
@@ -1049,78 +1214,16 @@ with main_tab2:
                         # Render the column mapping interface
                         mapping_complete = render_column_mapping_interface(raw_df)
                         
-                        if mapping_complete and 'mapped_df' in st.session_state:
-                            # Use the mapped DataFrame
-                            df_avl = st.session_state.mapped_df
+                        if mapping_complete:
                             st.success("Column mapping complete! You can now save the mapped data.")
                             
-                            # Display the mapped dataframe
-                            st.subheader("Mapped Approved Vendor List Data")
-                            st.dataframe(df_avl, use_container_width=True)
-                            
-                            # Store in session state
-                            st.session_state.avl_data = df_avl
-                            
-                            # Add a download button for the mapped data
-                            csv = df_avl.to_csv(index=False)
-                            st.download_button(
-                                label="Download Mapped Data",
-                                data=csv,
-                                file_name="mapped_approved_vendor_list.csv",
-                                mime="text/csv"
-                            )
-                            
-                            # Add a button to save to database
-                            if st.button("Save Mapped Data to Database"):
-                                try:
-                                    num_saved = save_approved_vendor_list_data(df_avl)
-                                    st.success(f"Successfully saved {num_saved} approved vendor list records to database")
-                                    
-                                    # Update last upload date
-                                    st.session_state.last_upload_date = datetime.now().strftime('%Y-%m-%d')
-                                    
-                                    # Reload from database to refresh the display
-                                    st.session_state.mapping_step = False  # Reset mapping step
-                                    st.cache_data.clear()  # Clear the cache to reload data
-                                    st.experimental_rerun()  # Rerun to refresh the UI
-                                except Exception as e:
-                                    st.error(f"Error saving to database: {str(e)}")
+                            # Stream the whole file through the mapping into staging
+                            stage_avl_upload(uploaded_file, upload, dict(st.session_state.column_mapping))
+                            show_staged_upload(upload, "mapped", "Mapped Approved Vendor List Data", "Save Mapped Data to Database")
                 else:
                     # CSV already has standard columns
-                    df_avl = raw_df
-                    
-                    # Display the dataframe
-                    st.subheader("Uploaded Approved Vendor List Data")
-                    st.dataframe(df_avl, use_container_width=True)
-                    
-                    # Store in session state
-                    st.session_state.avl_data = df_avl
-                    
-                    # Option to download processed data
-                    csv_data = df_avl.to_csv(index=False)
-                    st.download_button(
-                        label="Download Processed Data",
-                        data=csv_data,
-                        file_name="processed_approved_vendor_list.csv",
-                        mime="text/csv"
-                    )
-                    
-                    # Add a button to save to database
-                    if st.button("Save to Database"):
-                        try:
-                            records_added = save_approved_vendor_list_data(df_avl)
-                            st.success(f"Successfully saved {records_added} approved vendor list records to the database")
-                            st.session_state['avl_data_saved'] = True
-                            
-                            # Update last upload date
-                            st.session_state.last_upload_date = datetime.now().strftime('%Y-%m-%d')
-                            
-                            # Clear the cache to reload data
-                            st.cache_data.clear()
-                            # Rerun to refresh the page with new data
-                            st.experimental_rerun()
-                        except Exception as e:
-                            st.error(f"Error saving to database: {str(e)}")
+                    stage_avl_upload(uploaded_file, upload)
+                    show_staged_upload(upload, "standard", "Uploaded Approved Vendor List Data", "Save to Database")
             except Exception as e:
                 st.error(f"Error processing the CSV file: {str(e)}")
                 st.info("Please ensure your CSV file is properly formatted")
@@ -1181,3 +1284,15 @@ with main_tab2:
 # Footer
 st.markdown("---")
 st.markdown(f"Last updated: {datetime.now().strftime('%Y-%m-%d')} PST")
+
+# Once the whole page has rendered, update the progress bars of active refreshes in place
+# instead of rerunning the page. Any interaction interrupts this loop at the next update,
+# and the page reruns once when a job finishes to show its result and reload the catalog
+while active_refresh_progress:
+    time.sleep(REFRESH_POLL_SECONDS)
+    for equipment_type, (job_id, placeholder) in active_refresh_progress.items():
+        job = get_refresh_job(job_id)
+        if job is None or job['state'] not in ('queued', 'running'):
+            st.rerun()
+        fraction, status_text = describe_job_progress(job)
+        placeholder.progress(fraction, text=f"Refreshing {equipment_type}: {status_text}")
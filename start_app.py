@@ -9,6 +9,8 @@ import sys
 import warnings
 import subprocess
 
+from db.catalog_cache import warm_catalog_caches
+
 # Filter warnings at the Python level
 warnings.filterwarnings("ignore", category=RuntimeWarning, message="coroutine.*never awaited")
 warnings.filterwarnings("ignore", category=RuntimeWarning, message="Enable tracemalloc.*")
@@ -16,8 +18,25 @@ warnings.filterwarnings("ignore", category=RuntimeWarning, message="Enable trace
 # Disable asyncio debug mode via environment variables
 os.environ["PYTHONWARNINGS"] = "ignore::RuntimeWarning:asyncio"
 
+def start_background_refresh():
+    """Run the refresh scheduler in a background process so a slow CEC server never delays boot."""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    print("Starting catalog refresh scheduler...")
+    return subprocess.Popen(
+        [sys.executable, "-u", os.path.join(base_dir, "scheduler.py")],
+        cwd=base_dir
+    )
+
 def main():
     """Run the Streamlit app with warning filters applied."""
+    # Build catalog snapshots before the server starts accepting traffic,
+    # so the first visitor to each tab doesn't pay the cold-load cost
+    warm_catalog_caches()
+    
+    # Serve the last good snapshots right away; the scheduler refreshes stale catalogs
+    # now and keeps each one refreshed on its own interval
+    start_background_refresh()
+    
     print("Starting Solar Equipment Explorer with warning filters...")
     
     # Get the Python executable path
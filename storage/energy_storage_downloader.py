@@ -1,111 +1,72 @@
-import requests
 import pandas as pd
 import sqlite3
-from io import BytesIO
 from datetime import datetime
+import os
+import sys
+
+# Add parent directory to path so we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress import download_with_progress, report_progress
+from utils.source_schema import detect_header, record_header_layout, read_rows_below_header, map_columns_by_name
+from utils.ingest import skip_if_source_unchanged, mark_source_loaded, add_manufacturer_ids, deduplicate_rows, write_rejects
+from db.catalog_stats import write_dataset_summary, write_column_stats
+from db.manufacturers import write_manufacturer_lookup
+from db.row_keys import assign_row_ids, index_row_keys
 
 # Step 1: Download the Excel file
 url = 'https://solarequipment.energy.ca.gov/Home/DownloadtoExcel?filename=EnergyStorage'
-response = requests.get(url)
-if response.status_code != 200:
-    raise Exception(f"Failed to download file: {response.status_code}")
+content = download_with_progress(url)
+source_sha256 = skip_if_source_unchanged('energy_storage', content)
 
 # Step 2: Load the Excel file into a pandas DataFrame
-# Skip to row 17 (0-indexed, so this is the 18th row) for headers
-# Data starts from row 18 (0-indexed, so this is the 19th row)
-excel_data = BytesIO(response.content)
-df_headers = pd.read_excel(excel_data, engine='openpyxl', header=17, nrows=1)
-excel_data.seek(0)  # Reset the file pointer
-
-# Get the actual data starting from row 18 (0-indexed, so this is the 19th row)
-excel_data.seek(0)  # Reset the file pointer
-df = pd.read_excel(excel_data, engine='openpyxl', header=17, skiprows=1)
-
-# Use the header names as is
-df.columns = df_headers.columns
-
-# Print column names to debug
-print("Available columns:")
-for i, col in enumerate(df.columns):
-    print(f"{i}: {col}")
-
-# The data structure is different than expected
-# Looking at the first row's values to determine manufacturer and model
-print("\nFirst row values:")
-for i, val in enumerate(df.iloc[0]):
-    print(f"{i}: {val}")
-
-# Print the actual column names we have now
-print("\nActual column names:")
-for i, col in enumerate(df.columns):
-    print(f"{i}: {col}")
+# Find the header row by its column names rather than a fixed row number,
+# and stop here if the header layout changed since the last accepted load
+header_row, headers = detect_header(content, 'energy_storage')
+df = read_rows_below_header(content, header_row, headers)
 
 # Define the current time for the timestamp
 current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-# Create a new DataFrame with only the columns we need
-new_df = pd.DataFrame()
-
-# Map columns according to the Excel structure provided by the user
-# Column A: Manufacturer Name
-new_df['Manufacturer'] = df.iloc[:, 0]
-
-# Column C: Model Number
-new_df['Model Number'] = df.iloc[:, 2]
-
-# Column D: Technology
-new_df['Chemistry'] = df.iloc[:, 3]
-
-# Column E: PV DC Input Capability (Y/N)
-new_df['PV DC Input Capability'] = df.iloc[:, 4]
-
-# Column F: Certifying Entity
-new_df['Certifying Entity'] = df.iloc[:, 5]
-
-# Column G: Certificate Date
-new_df['Certificate Date'] = df.iloc[:, 6]
-
-# Column P: Description
-new_df['Description'] = df.iloc[:, 15]
-
-# Column Q: Nameplate Energy Capacity
-new_df['Capacity (kWh)'] = df.iloc[:, 16]
-
-# Column R: Nameplate Power
-new_df['Continuous Power Rating (kW)'] = df.iloc[:, 17]
-
-# Column S: Nominal Voltage
-new_df['Voltage (Vac)'] = df.iloc[:, 18]
-
-# Column T: Maximum Continuous Discharge Rate
-new_df['Maximum Discharge Rate (kW)'] = df.iloc[:, 19]
-
-# Column AI: CEC Listing Date
-new_df['Energy Storage Listing Date'] = df.iloc[:, 34]
-
-# Column AJ: Last Update
-new_df['Last Update'] = df.iloc[:, 35]
+# Step 3: Map the source columns to our standardized names by header name
+ENERGY_STORAGE_COLUMNS = {
+    'Manufacturer': ['Manufacturer Name', 'Manufacturer'],
+    'Model Number': ['Model Number'],
+    'Chemistry': ['Technology', 'Chemistry'],
+    'PV DC Input Capability': ['PV DC Input Capability'],
+    'Certifying Entity': ['Certifying Entity'],
+    'Certificate Date': ['Certificate Date'],
+    'Description': ['Description'],
+    'Capacity (kWh)': ['Nameplate Energy Capacity', 'Energy Capacity'],
+    'Continuous Power Rating (kW)': ['Nameplate Power', 'Continuous Power Rating'],
+    'Voltage (Vac)': ['Nominal Voltage'],
+    'Maximum Discharge Rate (kW)': ['Maximum Continuous Discharge Rate', 'Continuous Discharge Rate'],
+    'Energy Storage Listing Date': ['CEC Listing Date', 'Listing Date'],
+    'Last Update': ['Last Update', 'Last Update Date'],
+}
+df = map_columns_by_name(df, headers, ENERGY_STORAGE_COLUMNS)
 
 # Add the Date Added to Tool column
-new_df['Date Added to Tool'] = current_time
+df['Date Added to Tool'] = current_time
 
 # Create a unique identifier for each storage system
-new_df['storage_id'] = new_df['Manufacturer'].astype(str) + '_' + new_df['Model Number'].astype(str)
+df['storage_id'] = df['Manufacturer'].astype(str) + '_' + df['Model Number'].astype(str)
 
-# Print the columns in our new DataFrame
-print("\nNew DataFrame columns:")
-for col in new_df.columns:
-    print(f"- {col}")
+# Map manufacturer spellings to canonical integer IDs
+add_manufacturer_ids(df, 'Manufacturer')
 
-# Replace the original DataFrame with our new one
-df = new_df
+# Resolve duplicate keys up front so the bulk insert never hits them
+df, rejects = deduplicate_rows(df, 'storage_id')
 
-# We've already created the storage_id and added the timestamp in the new DataFrame
+report_progress('parse', rows_parsed=len(df))
 
 # Step 5: Connect to SQLite database (or create it) using context manager
 with sqlite3.connect('db/energy_storage.db') as conn:
     cursor = conn.cursor()
 
+    # Give every row its stable integer key before the table is written
+    df['row_id'] = assign_row_ids(conn, df['storage_id'])
+
     # Step 6: Check if the table exists, if not create it with a primary key
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='energy_storage'")
     table_exists = cursor.fetchone() is not None
@@ -127,6 +88,8 @@ with sqlite3.connect('db/energy_storage.db') as conn:
     for col in columns:
         if col == 'storage_id':
             column_defs.append(f'"{col}" TEXT PRIMARY KEY')
+        elif col in ('manufacturer_id', 'row_id'):
+            column_defs.append(f'"{col}" INTEGER')
         else:
             column_defs.append(f'"{col}" TEXT')
     
@@ -139,6 +102,7 @@ with sqlite3.connect('db/energy_storage.db') as conn:
     try:
         # First try with if_exists='replace' to ensure we have a clean table
         df.to_sql('energy_storage', conn, if_exists='replace', index=False)
+        rows_written = len(df)
         print(f"Created new table and inserted {len(df)} rows.")
     except Exception as e:
         print(f"Error inserting data: {e}")
@@ -153,10 +117,22 @@ with sqlite3.connect('db/energy_storage.db') as conn:
                 print(f"Error inserting row: {e}")
                 # Skip problematic rows
                 pass
+        rows_written = inserted
         print(f"Inserted {inserted} rows out of {len(df)}.")
     
+    # Materialize the stats shown at the top of the tab and the column profiles alongside the rows
+    index_row_keys(conn, 'energy_storage', 'storage_id')
+    write_rejects(conn, 'energy_storage', rejects, 'storage_id')
+    write_manufacturer_lookup(conn, 'energy_storage', df['manufacturer_id'])
+    write_dataset_summary(conn, 'energy_storage', source_sha256)
+    write_column_stats(conn, 'energy_storage')
+
     # Connection will be automatically committed and closed by the context manager
 
+report_progress('write', rows_written=rows_written)
+record_header_layout('energy_storage', header_row, headers)
+mark_source_loaded('energy_storage', source_sha256, content)
+
 print("Energy Storage data has been successfully downloaded and stored in the database.")
 print(f"Total rows: {len(df)}")
 print(f"Total columns: {len(df.columns)}")
@@ -0,0 +1,20 @@
+import io
+
+from db import avl_staging
+from utils import avl_upload
+
+def test_windows_1252_past_the_sample_is_restaged_without_losing_characters(tmp_path, monkeypatch):
+    staging_path = str(tmp_path / 'avl_staging.db')
+    monkeypatch.setattr(avl_staging, 'get_staging_db_path', lambda: staging_path)
+    monkeypatch.setattr(avl_upload, 'get_staging_db_path', lambda: staging_path)
+    rows = ''.join(f"PV Module,Acme,M{i}\n" for i in range(avl_upload.CHUNK_ROWS))
+    content = ("Equipment Category,Manufacturer,Model SKU\n" + rows + "Inverter,Société Générale,café\n").encode('cp1252')
+
+    encoding = avl_upload.sniff_encoding(content[:avl_upload.ENCODING_SNIFF_BYTES])
+    summary = avl_upload.stage_csv_upload(io.BytesIO(content), encoding, 'upload')
+    staged = avl_staging.read_staged_rows('upload', avl_upload.CHUNK_ROWS + 1)
+
+    assert encoding == 'utf-8'
+    assert summary['encoding'] == 'cp1252'
+    assert staged.iloc[-1]['Manufacturer'] == 'Société Générale'
+    assert staged.iloc[-1]['Model SKU'] == 'café'
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from db import bom_resolver, catalog_meta
+
+@pytest.fixture
+def model_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+    index = bom_resolver.index_model_records(pd.DataFrame({
+        'catalog': ['Batteries', 'Energy Storage Systems', 'Grid Support Inverter List'],
+        'cec_id': ['Qcells North America_Q.SAVE D10.0SX', 'Qcells North America_Q.SAVE D10.0SX',
+                   'Enphase Energy_IQ8PLUS-72-2-US'],
+        'cec_manufacturer': ['Qcells North America', 'Qcells North America', 'Enphase Energy'],
+        'cec_model': ['Q.SAVE D10.0SX', 'Q.SAVE D10.0SX', 'IQ8PLUS-72-2-US'],
+    }))
+    monkeypatch.setattr(bom_resolver, 'get_model_index', lambda: index)
+    return index
+
+def test_bom_without_matches_lists_not_found_lines_with_suggestions(model_index):
+    lines, matches = bom_resolver.resolve_bom(pd.Series(['ZZZZZZ9999', 'QQQQ', 'IQ8PLUS-72-3']))
+
+    assert lines['status'].tolist() == ['not found'] * 3
+    assert lines['matches'].tolist() == [0, 0, 0]
+    assert matches.empty
+    assert 'IQ8PLUS-72-2-US' in lines.loc[2, 'suggestions']
+
+def test_manufacturer_alias_with_exact_model_is_one_match(model_index):
+    lines, matches = bom_resolver.resolve_bom(pd.Series(['Q.SAVE D10.0SX']), pd.Series(['Qcells']))
+
+    assert lines.loc[0, 'status'] == 'matched'
+    assert lines.loc[0, 'confidence'] == 1.0
+    assert lines.loc[0, 'matches'] == 1
+    assert len(matches) == 2
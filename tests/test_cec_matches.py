@@ -0,0 +1,37 @@
+import pandas as pd
+
+from db import catalog_meta
+from db.cec_matches import classify_listings, find_candidates, manufacturer_keys, normalize_model_numbers
+
+def prepare(frame, manufacturer_column, model_column):
+    frame['model_key'], frame['base_key'] = normalize_model_numbers(frame[model_column])
+    frame['manufacturer_key'] = manufacturer_keys(frame[manufacturer_column])
+    return frame
+
+def classify(tmp_path, monkeypatch, avl_manufacturer):
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+    avl = prepare(pd.DataFrame({
+        'item_id': [1], 'equipment_category': ['Battery'], 'catalog': ['Batteries'],
+        'manufacturer': [avl_manufacturer], 'model_sku': ['Q.SAVE D10.0SX'],
+    }), 'manufacturer', 'model_sku')
+    cec = prepare(pd.DataFrame({
+        'catalog': ['Batteries'], 'cec_id': ['Qcells North America_Q.SAVE D10.0SX'],
+        'cec_manufacturer': ['Qcells North America'], 'cec_model': ['Q.SAVE D10.0SX'],
+    }), 'cec_manufacturer', 'cec_model')
+
+    candidates = find_candidates(avl, cec)
+    status = classify_listings(avl, candidates, pd.DataFrame(columns=['catalog', 'model_key']), set())
+    return candidates.iloc[0], status.iloc[0]
+
+def test_qcells_alias_matches_the_cec_spelling(tmp_path, monkeypatch):
+    candidate, status = classify(tmp_path, monkeypatch, 'Qcells')
+
+    assert candidate['match_type'] == 'exact'
+    assert status['status'] == 'listed'
+    assert status['confidence'] == 1.0
+
+def test_single_exact_match_from_another_manufacturer_stays_listed(tmp_path, monkeypatch):
+    candidate, status = classify(tmp_path, monkeypatch, 'Some Distributor')
+
+    assert candidate['match_type'] == 'exact, other manufacturer'
+    assert status['status'] == 'listed'
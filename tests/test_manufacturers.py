@@ -0,0 +1,38 @@
+import sqlite3
+
+import pandas as pd
+
+from db import catalog_meta
+from db.manufacturers import (
+    PRIORITY_MANUFACTURER,
+    normalize_manufacturer_key,
+    read_manufacturer_lookup,
+    resolve_manufacturer_ids,
+    write_manufacturer_lookup,
+)
+
+def test_cec_qcells_spellings_resolve_to_the_priority_manufacturer(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+    # Spellings as they appear in the shipped catalogs, including the battery list's trailing space
+    names = pd.Series(['Qcells North America', 'Qcells North America ', 'Hanwha Q CELLS', 'Enphase Energy Inc.'])
+
+    ids = resolve_manufacturer_ids(names)
+    with sqlite3.connect(':memory:') as conn:
+        conn.execute('CREATE TABLE meters (manufacturer_id INTEGER)')
+        write_manufacturer_lookup(conn, 'meters', ids)
+        lookup = read_manufacturer_lookup(conn)
+
+    assert ids[0] == ids[1] == ids[2] != ids[3]
+    assert lookup.get(PRIORITY_MANUFACTURER) == ids[0]
+
+def test_lg_energy_solution_and_lg_electronics_stay_separate(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+
+    ids = resolve_manufacturer_ids(pd.Series(['LG Energy Solution, Ltd.', 'LG Electronics Inc.']))
+
+    assert ids[0] != ids[1]
+
+def test_short_legal_forms_only_drop_at_the_end_of_a_name():
+    assert normalize_manufacturer_key('Jinko Solar Co., Ltd') == normalize_manufacturer_key('Jinko Solar')
+    assert normalize_manufacturer_key('SA Power Networks') == 'sapowernetworks'
+    assert normalize_manufacturer_key('AG Energy Inc') == 'agenergy'
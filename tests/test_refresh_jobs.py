@@ -0,0 +1,91 @@
+import sqlite3
+
+from db import catalog_meta
+from utils import refresh_jobs
+
+TABLE_NAME = 'test_catalog'
+
+def make_snapshot(db_path, rows):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f'CREATE TABLE {TABLE_NAME} (model TEXT)')
+        conn.executemany(f'INSERT INTO {TABLE_NAME} VALUES (?)', [(row,) for row in rows])
+
+def run_with_downloader(tmp_path, monkeypatch, script):
+    downloader = tmp_path / 'downloader.py'
+    downloader.write_text(script)
+    db_path = tmp_path / 'test.db'
+    make_snapshot(db_path, ['OLD-1', 'OLD-2'])
+
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+    catalog_meta.record_source_fingerprint(TABLE_NAME, 'old-sha256', 1)
+
+    updates = []
+    monkeypatch.setitem(refresh_jobs.CATALOGS, 'Test Catalog', {
+        'downloader': str(downloader), 'db_name': 'test.db', 'table_name': TABLE_NAME,
+    })
+    monkeypatch.setattr(refresh_jobs, 'get_catalog_db_path', lambda db_name: str(tmp_path / db_name))
+    monkeypatch.setattr(refresh_jobs, 'update_refresh_job', lambda job_id, **fields: updates.append(fields))
+    monkeypatch.setattr(refresh_jobs, 'HEAVY_JOB_LOCK_PATH', str(tmp_path / '.refresh.lock'))
+
+    success = refresh_jobs.run_refresh_job(1, 'Test Catalog')
+    with sqlite3.connect(db_path) as conn:
+        rows = [row[0] for row in conn.execute(f'SELECT model FROM {TABLE_NAME} ORDER BY model')]
+    return success, rows, updates
+
+def test_failing_downloader_keeps_previous_snapshot(tmp_path, monkeypatch):
+    script = (
+        "import sqlite3, sys\n"
+        f"conn = sqlite3.connect(r'{tmp_path / 'test.db'}')\n"
+        f"conn.execute('DELETE FROM {TABLE_NAME}')\n"
+        "conn.commit()\n"
+        "sys.exit('download failed')\n"
+    )
+    success, rows, updates = run_with_downloader(tmp_path, monkeypatch, script)
+
+    assert not success
+    assert rows == ['OLD-1', 'OLD-2']
+    assert updates[-1]['state'] == 'failed'
+    assert not (tmp_path / 'test.db.bak').exists()
+
+def test_restored_snapshot_forgets_source_fingerprint(tmp_path, monkeypatch):
+    script = (
+        "import sqlite3, sys\n"
+        f"conn = sqlite3.connect(r'{tmp_path / 'test.db'}')\n"
+        f"conn.execute('DELETE FROM {TABLE_NAME}')\n"
+        "conn.commit()\n"
+        f"meta = sqlite3.connect(r'{tmp_path / 'catalog_meta.db'}')\n"
+        "meta.execute(\"UPDATE source_fingerprints SET sha256 = 'new-sha256'\")\n"
+        "meta.commit()\n"
+        "sys.exit('stopped after the load')\n"
+    )
+    success, rows, updates = run_with_downloader(tmp_path, monkeypatch, script)
+
+    assert not success
+    assert rows == ['OLD-1', 'OLD-2']
+    assert catalog_meta.get_source_fingerprint(TABLE_NAME) is None
+
+def test_downloader_leaving_empty_catalog_keeps_previous_snapshot(tmp_path, monkeypatch):
+    script = (
+        "import sqlite3\n"
+        f"conn = sqlite3.connect(r'{tmp_path / 'test.db'}')\n"
+        f"conn.execute('DELETE FROM {TABLE_NAME}')\n"
+        "conn.commit()\n"
+    )
+    success, rows, updates = run_with_downloader(tmp_path, monkeypatch, script)
+
+    assert not success
+    assert rows == ['OLD-1', 'OLD-2']
+
+def test_successful_downloader_replaces_snapshot(tmp_path, monkeypatch):
+    script = (
+        "import sqlite3\n"
+        f"conn = sqlite3.connect(r'{tmp_path / 'test.db'}')\n"
+        f"conn.execute('DELETE FROM {TABLE_NAME}')\n"
+        f"conn.execute(\"INSERT INTO {TABLE_NAME} VALUES ('NEW-1')\")\n"
+        "conn.commit()\n"
+    )
+    success, rows, updates = run_with_downloader(tmp_path, monkeypatch, script)
+
+    assert success
+    assert rows == ['NEW-1']
+    assert updates[-1]['state'] == 'succeeded'
@@ -0,0 +1,39 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from utils import session_artifacts
+
+@pytest.fixture(autouse=True)
+def spill_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_artifacts, 'st', SimpleNamespace(session_state={}))
+    monkeypatch.setattr(session_artifacts, 'ARTIFACT_DIR', str(tmp_path / 'session_artifacts'))
+    monkeypatch.setattr(session_artifacts, 'SPILL_BYTES', 0)
+
+def test_spill_falls_back_to_memory_when_the_directory_is_removed(monkeypatch):
+    real_makedirs = os.makedirs
+
+    def makedirs_then_remove(path, exist_ok=False):
+        real_makedirs(path, exist_ok=exist_ok)
+        shutil.rmtree(path)
+    monkeypatch.setattr(session_artifacts.os, 'makedirs', makedirs_then_remove)
+
+    df = pd.DataFrame({'model': ['A-1', 'B-2']})
+    assert session_artifacts.put_frame('mapped', df) is df
+    assert session_artifacts.get_frame('mapped') is df
+
+def test_get_frame_treats_a_file_removed_after_reading_as_expired(monkeypatch):
+    handle = session_artifacts.put_frame('mapped', pd.DataFrame({'model': ['A-1', 'B-2']}))
+    real_read_parquet = pd.read_parquet
+
+    def read_then_remove(path):
+        df = real_read_parquet(path)
+        os.remove(path)
+        return df
+    monkeypatch.setattr(session_artifacts.pd, 'read_parquet', read_then_remove)
+
+    assert session_artifacts.get_frame('mapped') is None
+    assert not os.path.exists(handle['artifact_path'])
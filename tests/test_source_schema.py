@@ -0,0 +1,25 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from db import catalog_meta
+from utils.source_schema import SchemaDriftError, detect_header, record_header_layout
+
+def make_sheet(headers):
+    padding = len(headers) - 2
+    rows = [['California Energy Commission list', None] + [None] * padding, headers, ['ACME', 'X-1'] + [1] * padding]
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, header=False, index=False)
+    return buffer.getvalue()
+
+def test_header_layout_is_only_accepted_once_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_meta, 'get_meta_db_path', lambda: str(tmp_path / 'catalog_meta.db'))
+
+    header_row, headers = detect_header(make_sheet(['Manufacturer Name', 'Model Number', 'Power']), 'test_catalog')
+    assert header_row == 1
+    assert catalog_meta.get_header_fingerprint('test_catalog') is None
+
+    record_header_layout('test_catalog', header_row, headers)
+    with pytest.raises(SchemaDriftError):
+        detect_header(make_sheet(['Manufacturer Name', 'Model Number', 'Voltage']), 'test_catalog')
@@ -0,0 +1,153 @@
+"""
+Streaming AVL CSV uploads
+
+Uploaded vendor lists are parsed in fixed-size chunks. Each chunk is mapped
+to the standard columns, cleaned, validated and written to the staging
+database as it arrives, so memory use is bounded by the chunk size rather
+than the file size. The session keeps only the upload ID, the counts and a
+small sample for the column mapping screen.
+"""
+
+import codecs
+import sqlite3
+import time
+
+import pandas as pd
+
+from db.avl_staging import (
+    clear_stale_uploads,
+    clear_staged_upload,
+    create_staging_table,
+    get_staging_db_path,
+    stage_upload_chunk,
+)
+from utils.column_mapper import apply_column_mapping
+
+# Rows parsed, validated and staged at a time
+CHUNK_ROWS = 5000
+
+# Rows read up front for the column mapping screen
+SAMPLE_ROWS = 200
+
+# Bytes inspected to pick the file encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# Encoding used when the sample doesn't decode as UTF-8 or Windows-1252; decodes any byte
+FALLBACK_ENCODING = 'latin1'
+
+# Encodings tried in turn, strictly, when a file stops decoding past the sniffed sample
+RESTAGE_ENCODINGS = ['cp1252', FALLBACK_ENCODING]
+
+def sniff_encoding(head):
+    """
+    Pick the encoding of a CSV file from its first bytes
+
+    Byte order marks win; otherwise UTF-8 if the sample decodes (allowing a
+    character cut off at the end of the sample), then Windows-1252.
+
+    Args:
+        head: The first bytes of the file
+
+    Returns:
+        str encoding name for pandas
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        head.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        if e.reason == 'unexpected end of data' and e.start >= len(head) - 3:
+            return 'utf-8'
+    try:
+        head.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+def read_upload_sample(uploaded_file, encoding, nrows=SAMPLE_ROWS):
+    """
+    Read the header and first rows of an uploaded CSV
+
+    Returns:
+        DataFrame with at most nrows rows
+    """
+    uploaded_file.seek(0)
+    try:
+        return pd.read_csv(uploaded_file, encoding=encoding, nrows=nrows, dtype=str)
+    finally:
+        uploaded_file.seek(0)
+
+def _stage_chunks(uploaded_file, encoding, upload_id, column_mapping, progress_callback):
+    """Parse and stage an upload with one encoding, returning the row counts"""
+    uploaded_file.seek(0, 2)
+    total_bytes = uploaded_file.tell()
+    uploaded_file.seek(0)
+
+    rows = valid = rejected = 0
+    with sqlite3.connect(get_staging_db_path()) as conn:
+        create_staging_table(conn)
+        # dtype=str keeps model numbers such as "00123" exactly as written
+        chunks = pd.read_csv(uploaded_file, encoding=encoding, chunksize=CHUNK_ROWS, dtype=str)
+        for chunk in chunks:
+            if column_mapping:
+                chunk = apply_column_mapping(chunk, column_mapping)
+            chunk_valid, chunk_rejected = stage_upload_chunk(conn, upload_id, rows + 1, chunk)
+            conn.commit()
+            rows += len(chunk)
+            valid += chunk_valid
+            rejected += chunk_rejected
+            if progress_callback:
+                progress_callback(rows, min(uploaded_file.tell(), total_bytes), total_bytes)
+    return rows, valid, rejected
+
+def stage_csv_upload(uploaded_file, encoding, upload_id, column_mapping=None, progress_callback=None):
+    """
+    Stream an uploaded CSV into the staging database chunk by chunk
+
+    Any rows staged earlier under the same upload ID are replaced. If the file
+    stops decoding partway through (e.g. a Windows-1252 "é" after an ASCII
+    sample), it is staged again as Windows-1252, or latin1 if that fails too,
+    so no character is lost or replaced.
+
+    Args:
+        uploaded_file: File-like object with the CSV
+        encoding: Encoding picked by sniff_encoding
+        upload_id: ID the staged rows are stored under
+        column_mapping: Optional dict of source column to standard column
+        progress_callback: Optional function called after every chunk with
+            (rows staged, bytes read, total bytes)
+
+    Returns:
+        dict with the encoding used, row counts and elapsed seconds
+    """
+    start = time.perf_counter()
+    removed = clear_stale_uploads()
+    if removed:
+        print(f"Removed {removed} stale staged upload rows")
+
+    clear_staged_upload(upload_id)
+    try:
+        rows, valid, rejected = _stage_chunks(uploaded_file, encoding, upload_id, column_mapping, progress_callback)
+    except UnicodeDecodeError as e:
+        for fallback in [candidate for candidate in RESTAGE_ENCODINGS if candidate != encoding]:
+            print(f"Upload {upload_id} isn't valid {encoding} past the sniffed sample ({e.reason}), restaging as {fallback}")
+            clear_staged_upload(upload_id)
+            encoding = fallback
+            try:
+                rows, valid, rejected = _stage_chunks(uploaded_file, encoding, upload_id, column_mapping, progress_callback)
+                break
+            except UnicodeDecodeError as retry_error:
+                e = retry_error
+
+    summary = {
+        'encoding': encoding,
+        'rows': rows,
+        'valid': valid,
+        'rejected': rejected,
+        'seconds': time.perf_counter() - start,
+    }
+    print(f"Staged upload {upload_id}: {rows} rows ({rejected} rejected) in {summary['seconds']:.2f} seconds")
+    return summary
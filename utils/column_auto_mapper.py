@@ -0,0 +1,249 @@
+"""
+Scored column auto-mapping for uploaded vendor lists
+
+Every source column is scored against every standard AVL column from three
+signals: shared name tokens, character trigram overlap (both against the
+standard name and its known synonyms, so "Mfr" or "SKU #" still match), and
+what the sample values look like. The score matrix is then solved as an
+optimal one-to-one assignment, so one strong match can't be taken by an
+earlier, weaker one. Mappings the user confirms are remembered in the
+metadata database under a fingerprint of the source header, and reused for
+the next upload with the same layout.
+"""
+
+import json
+import re
+
+import pandas as pd
+
+from db.approved_vendor_list import EQUIPMENT_CATEGORIES
+from db.catalog_meta import get_column_mapping, record_column_mapping
+from utils.source_schema import header_fingerprint, normalize_header
+
+# Other names distributors use for each standard column (keys follow column_mapper.STANDARD_COLUMNS)
+COLUMN_SYNONYMS = {
+    "Equipment Category": ["category", "equipment type", "product type", "product category", "type", "equipment"],
+    "Manufacturer": ["mfr", "mfg", "manufacturer name", "brand", "make", "maker", "vendor"],
+    "Technology Type": ["technology", "tech", "cell type", "chemistry", "inverter type"],
+    "Model SKU": ["sku", "model", "model number", "model no", "part number", "part no", "pn", "item number"],
+    "Product Model Description": ["description", "product description", "desc", "product name", "model description"],
+    "Racking System Name": ["racking", "racking system", "mounting system", "racking name"],
+    "Power Rating Specification": ["power", "power rating", "rating", "wattage", "watts", "capacity", "nameplate"],
+    "Module Level Power Electronics": ["mlpe", "optimizer", "microinverter", "rapid shutdown"],
+    "System Configuration": ["configuration", "config", "system type"],
+    "Racking Style": ["style", "mount type", "mounting style", "roof type"],
+    "Internal Notes / Memo": ["internal notes", "memo", "notes", "comments", "internal"],
+    "Additional Notes": ["additional notes", "remarks", "other notes", "extra notes"],
+}
+
+# Weight of the name score; the rest comes from the sample values when a column has a value signal
+NAME_WEIGHT = 0.7
+
+# Assignments scoring below this are left unmapped
+MIN_SCORE = 0.45
+
+# Sample values inspected per source column
+VALUE_SAMPLE_SIZE = 200
+
+POWER_PATTERN = re.compile(r'^\d[\d.,]*\s*(w|kw|kwh|wh|va|kva|watts?)?(\s*/.*)?$', re.IGNORECASE)
+CATEGORY_WORDS = ('module', 'inverter', 'battery', 'optimizer', 'racking')
+MLPE_VALUES = {'yes', 'no', 'none', 'n a', 'optimizer', 'optimizers', 'microinverter', 'microinverters', 'micro'}
+
+def _trigrams(text):
+    """Character trigrams of a normalized name, padded so short names still have some"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def name_similarity(source, target):
+    """
+    Score how well a source column name matches a standard column and its synonyms
+
+    Returns:
+        float between 0 and 1
+    """
+    source_name = normalize_header(source)
+    if not source_name:
+        return 0.0
+    source_tokens = set(source_name.split())
+    source_grams = _trigrams(source_name)
+
+    best = 0.0
+    for alias in [target] + COLUMN_SYNONYMS.get(target, []):
+        alias_name = normalize_header(alias)
+        if source_name == alias_name:
+            return 1.0
+        alias_tokens = set(alias_name.split())
+        alias_grams = _trigrams(alias_name)
+        token_score = len(source_tokens & alias_tokens) / len(source_tokens | alias_tokens)
+        gram_score = 2 * len(source_grams & alias_grams) / (len(source_grams) + len(alias_grams))
+        # Trigram overlap alone is a weaker signal than shared words
+        best = max(best, token_score, 0.9 * gram_score)
+    return best
+
+def _share(values, predicate):
+    """Fraction of sample values satisfying a predicate"""
+    if not values:
+        return 0.0
+    return sum(1 for value in values if predicate(value)) / len(values)
+
+def _manufacturer_signal(values):
+    """Short names without digits that repeat across rows"""
+    if not values:
+        return 0.0
+    repeats = 1 - len(set(values)) / len(values)
+    looks_like_name = _share(values, lambda v: len(v.split()) <= 4 and not any(c.isdigit() for c in v))
+    return 0.8 * looks_like_name + 0.2 * repeats
+
+# Checks of what each standard column's values look like
+VALUE_SIGNALS = {
+    "Equipment Category": lambda values: _share(
+        values, lambda v: v.lower() in {c.lower() for c in EQUIPMENT_CATEGORIES} or any(w in v.lower() for w in CATEGORY_WORDS)
+    ),
+    "Manufacturer": _manufacturer_signal,
+    "Model SKU": lambda values: _share(values, lambda v: any(c.isdigit() for c in v) and len(v.split()) <= 2),
+    "Power Rating Specification": lambda values: _share(values, lambda v: bool(POWER_PATTERN.match(v))),
+    "Product Model Description": lambda values: _share(values, lambda v: len(v) >= 25),
+    "Module Level Power Electronics": lambda values: _share(values, lambda v: normalize_header(v) in MLPE_VALUES),
+    "Internal Notes / Memo": lambda values: 0.7 * _share(values, lambda v: len(v.split()) >= 3),
+    "Additional Notes": lambda values: 0.7 * _share(values, lambda v: len(v.split()) >= 3),
+}
+
+def _sample_values(series):
+    """Non-blank sample values of a column as stripped strings"""
+    values = series.dropna().astype(str).str.strip()
+    return values[values != ''].head(VALUE_SAMPLE_SIZE).tolist()
+
+def score_columns(source_df, targets=tuple(COLUMN_SYNONYMS)):
+    """
+    Build the similarity matrix between source columns and standard columns
+
+    Returns:
+        DataFrame of scores indexed by source column with one column per target
+    """
+    scores = {}
+    for source in source_df.columns:
+        values = _sample_values(source_df[source])
+        row = {}
+        for target in targets:
+            score = name_similarity(source, target)
+            signal = VALUE_SIGNALS.get(target)
+            if signal is not None and values:
+                score = NAME_WEIGHT * score + (1 - NAME_WEIGHT) * signal(values)
+            row[target] = score
+        scores[source] = row
+    return pd.DataFrame.from_dict(scores, orient='index', columns=list(targets))
+
+def solve_assignment(cost):
+    """
+    Find the minimum-cost one-to-one assignment of rows to columns (Hungarian algorithm)
+
+    Args:
+        cost: List of rows of costs, with no more rows than columns
+
+    Returns:
+        list giving the column assigned to each row
+    """
+    n, m = len(cost), len(cost[0])
+    inf = float('inf')
+    # Potentials and the row matched to each column, 1-based with a sentinel at 0
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        min_slack = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = inf
+            col1 = 0
+            for col in range(1, m + 1):
+                if used[col]:
+                    continue
+                slack = cost[row0 - 1][col - 1] - u[row0] - v[col]
+                if slack < min_slack[col]:
+                    min_slack[col] = slack
+                    way[col] = col0
+                if min_slack[col] < delta:
+                    delta = min_slack[col]
+                    col1 = col
+            for col in range(m + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    min_slack[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        # Flip the augmenting path
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    assignment = [None] * n
+    for col in range(1, m + 1):
+        if match[col]:
+            assignment[match[col] - 1] = col - 1
+    return assignment
+
+def auto_map_columns(source_df, min_score=MIN_SCORE):
+    """
+    Map source columns to standard columns by the best-scoring one-to-one assignment
+
+    Returns:
+        tuple: (dict of source column to standard column, dict of source column to score)
+    """
+    scores = score_columns(source_df)
+    if scores.empty:
+        return {}, {}
+
+    matrix = scores.to_numpy()
+    transpose = matrix.shape[0] > matrix.shape[1]
+    if transpose:
+        matrix = matrix.T
+    assignment = solve_assignment((1 - matrix).tolist())
+
+    pairs = [(row, col) for row, col in enumerate(assignment) if col is not None]
+    if transpose:
+        pairs = [(col, row) for row, col in pairs]
+
+    mapping, confidence = {}, {}
+    for source_position, target_position in pairs:
+        score = scores.iat[source_position, target_position]
+        if score >= min_score:
+            source = scores.index[source_position]
+            mapping[source] = scores.columns[target_position]
+            confidence[source] = round(float(score), 2)
+    return mapping, confidence
+
+def get_header_key(columns):
+    """Fingerprint a source header regardless of column order"""
+    return header_fingerprint(sorted(columns, key=normalize_header))
+
+def get_learned_mapping(columns):
+    """
+    Get the mapping confirmed earlier for an upload with the same header
+
+    Returns:
+        dict of source column to standard column, or None if this layout is new
+    """
+    learned = get_column_mapping(get_header_key(columns))
+    if learned is None:
+        return None
+    mapping = json.loads(learned['mapping'])
+    present = set(columns)
+    return {source: target for source, target in mapping.items() if source in present and target in COLUMN_SYNONYMS}
+
+def learn_mapping(columns, mapping):
+    """Remember a confirmed mapping for uploads with the same header"""
+    record_column_mapping(
+        get_header_key(columns),
+        json.dumps([str(column) for column in columns]),
+        json.dumps(mapping)
+    )
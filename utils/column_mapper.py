@@ -8,6 +8,8 @@ for the Solar Equipment Explorer application.
 import pandas as pd
 import streamlit as st
 
+from utils.column_auto_mapper import auto_map_columns, get_learned_mapping, learn_mapping
+
 # Define the standardized destination columns
 STANDARD_COLUMNS = [
     "Equipment Category",
@@ -26,8 +28,6 @@ STANDARD_COLUMNS = [
 
 def initialize_column_mapping_state():
     """Initialize session state variables for column mapping"""
-    if 'source_df' not in st.session_state:
-        st.session_state.source_df = None
     if 'column_mapping' not in st.session_state:
         st.session_state.column_mapping = {}
     if 'mapping_complete' not in st.session_state:
@@ -38,6 +38,7 @@ def initialize_column_mapping_state():
 def reset_column_mapping():
     """Reset column mapping session state"""
     st.session_state.column_mapping = {}
+    st.session_state.auto_map_confidence = {}
     st.session_state.mapping_complete = False
     st.session_state.mapping_validated = False
 
@@ -112,6 +113,14 @@ def apply_column_mapping(source_df, mapping):
     # Ensure columns are in the standard order
     return mapped_df[STANDARD_COLUMNS]
 
+def apply_auto_mapping(source_df):
+    """Map columns by the best-scoring one-to-one assignment and update the dropdowns"""
+    auto_mapping, confidence = auto_map_columns(source_df)
+    st.session_state.column_mapping = auto_mapping
+    st.session_state.auto_map_confidence = confidence
+    for src_col in source_df.columns:
+        st.session_state[f"map_{src_col}"] = auto_mapping.get(src_col, "")
+
 def render_column_mapping_interface(source_df):
     """
     Render the column mapping interface
@@ -132,8 +141,12 @@ def render_column_mapping_interface(source_df):
     # Initialize session state for column mapping if needed
     initialize_column_mapping_state()
     
-    # Store the source DataFrame in session state
-    st.session_state.source_df = source_df
+    # Start from the mapping confirmed for this header layout before, if any
+    if not st.session_state.column_mapping and not any(f"map_{col}" in st.session_state for col in source_df.columns):
+        learned_mapping = get_learned_mapping(source_df.columns)
+        if learned_mapping:
+            st.session_state.column_mapping = learned_mapping
+            st.caption("Prefilled with the mapping you confirmed for a file with these columns before.")
     
     # Create two columns for the mapping interface
     left_col, right_col = st.columns(2)
@@ -168,6 +181,10 @@ def render_column_mapping_interface(source_df):
                 key=f"map_{col}"
             )
             
+            confidence = st.session_state.get('auto_map_confidence', {}).get(col)
+            if selected_dest and confidence is not None and selected_dest == current_selection:
+                st.caption(f"Auto-mapped with {confidence:.0%} confidence")
+            
             # Update the mapping in session state
             if selected_dest:
                 st.session_state.column_mapping[col] = selected_dest
@@ -220,32 +237,14 @@ def render_column_mapping_interface(source_df):
             st.experimental_rerun()
     
     with col2:
-        if st.button("Auto-Map Columns"):
-            # Try to automatically map columns based on name similarity
-            auto_mapping = {}
-            for src_col in source_df.columns:
-                src_lower = src_col.lower().replace("_", " ")
-                for dst_col in STANDARD_COLUMNS:
-                    dst_lower = dst_col.lower()
-                    # Check if source column name contains destination column name
-                    if dst_lower in src_lower or src_lower in dst_lower:
-                        # Check if this destination isn't already mapped
-                        if dst_col not in auto_mapping.values():
-                            auto_mapping[src_col] = dst_col
-                            break
-            
-            # Update session state with auto-mapping
-            st.session_state.column_mapping.update(auto_mapping)
-            st.experimental_rerun()
+        # Runs before the next rerun, while the dropdowns can still be set
+        st.button("Auto-Map Columns", on_click=apply_auto_mapping, args=(source_df,))
     
     with col3:
         # Apply mapping button
         if st.button("Apply Mapping", disabled=not is_valid):
-            # Apply the mapping to create a new DataFrame
-            mapped_df = apply_column_mapping(source_df, current_mapping)
-            
-            # Store the mapped DataFrame in session state
-            st.session_state.mapped_df = mapped_df
+            # The whole file is mapped while it streams into staging, so only the mapping is kept
+            learn_mapping(source_df.columns.tolist(), current_mapping)
             st.session_state.mapping_complete = True
             
             # Return True to indicate mapping is complete
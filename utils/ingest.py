@@ -0,0 +1,127 @@
+"""
+Shared ingest stages for the downloader scripts
+
+The downloaders are standalone scripts; the steps they have in common live
+here so each script only calls them in order.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from db.catalog_meta import get_source_fingerprint, record_source_fingerprint, touch_source_fingerprint
+from db.manufacturers import resolve_manufacturer_ids
+from utils.progress import report_progress
+
+def is_forced_refresh():
+    """Check whether the downloader was asked to reload even an unchanged source"""
+    return '--force' in sys.argv[1:] or os.environ.get('FORCE_REFRESH') == '1'
+
+def fingerprint_source(content):
+    """Get the SHA-256 hex digest of a downloaded source file"""
+    return hashlib.sha256(content).hexdigest()
+
+def skip_if_source_unchanged(dataset, content):
+    """
+    Stop the downloader when the source file is identical to the last one loaded
+
+    Exits the process with status 0 when nothing changed (unless --force was
+    given), so unchanged downloads skip parsing and writing entirely.
+
+    Returns:
+        str: The source fingerprint, to be recorded once the load succeeds
+    """
+    sha256 = fingerprint_source(content)
+    previous = get_source_fingerprint(dataset)
+    if previous and previous['sha256'] == sha256 and not is_forced_refresh():
+        touch_source_fingerprint(dataset)
+        report_progress('unchanged')
+        print(f"Source file for {dataset} is unchanged since {previous['changed_at']}, skipping load.")
+        sys.exit(0)
+    return sha256
+
+def mark_source_loaded(dataset, sha256, content):
+    """Record the fingerprint of a source file after it was written successfully"""
+    record_source_fingerprint(dataset, sha256, len(content))
+
+def add_manufacturer_ids(df, manufacturer_column):
+    """Add the canonical integer manufacturer_id column to a parsed catalog frame"""
+    df['manufacturer_id'] = resolve_manufacturer_ids(df[manufacturer_column])
+    return df
+
+def add_missing_columns(conn, table_name, columns, column_types=None):
+    """
+    Add columns a catalog frame has but its existing table lacks
+
+    Args:
+        conn: Connection to the catalog database
+        table_name: Table to alter
+        columns: Columns the frame about to be written has
+        column_types: Optional SQL types by column name (TEXT otherwise)
+    """
+    column_types = column_types or {}
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table_name}")')}
+    for column in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" {column_types.get(column, "TEXT")}')
+            print(f"Added column {column} to {table_name}.")
+
+def deduplicate_rows(df, id_column, update_column='Last Update'):
+    """
+    Keep one row per natural key, deterministically
+
+    The winner of each duplicate group is the row with the latest update date,
+    then the most filled-in columns, then the first one in the source file.
+
+    Returns:
+        tuple: (deduplicated DataFrame in source order, DataFrame of discarded rows)
+    """
+    duplicated = df[id_column].duplicated(keep=False)
+    if not duplicated.any():
+        return df, df.iloc[0:0]
+
+    rank = pd.DataFrame({
+        'key': df[id_column],
+        'completeness': df.notna().sum(axis=1) - df.astype(str).isin(['', 'None', 'NaT']).sum(axis=1),
+        'position': range(len(df)),
+    }, index=df.index)
+    sort_by, ascending = ['key'], [True]
+    if update_column in df.columns:
+        rank['updated'] = pd.to_datetime(df[update_column].astype(str), errors='coerce', format='mixed')
+        sort_by.append('updated')
+        ascending.append(False)
+    sort_by += ['completeness', 'position']
+    ascending += [False, True]
+
+    ranked = rank.sort_values(by=sort_by, ascending=ascending, na_position='last', kind='stable')
+    winners = ranked.index[~ranked['key'].duplicated(keep='first')]
+    keep = df.index.isin(winners)
+
+    print(f"Resolved {duplicated.sum()} rows sharing {df.loc[duplicated, id_column].nunique()} keys, "
+          f"discarding {(~keep).sum()} duplicates.")
+    return df[keep].copy(), df[~keep].copy()
+
+def write_rejects(conn, table_name, rejects, id_column, reason='duplicate key'):
+    """Record the rows an ingest discarded, replacing the rejects of the previous load"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ingest_rejects (
+        dataset TEXT NOT NULL,
+        natural_key TEXT,
+        reason TEXT NOT NULL,
+        record TEXT NOT NULL,
+        rejected_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute("DELETE FROM ingest_rejects WHERE dataset = ?", (table_name,))
+    if rejects.empty:
+        return
+    rejected_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    records = rejects.astype(object).where(rejects.notna(), None).to_dict('records')
+    conn.executemany(
+        "INSERT INTO ingest_rejects (dataset, natural_key, reason, record, rejected_at) VALUES (?, ?, ?, ?, ?)",
+        [(table_name, str(record[id_column]), reason, json.dumps(record, default=str), rejected_at) for record in records]
+    )
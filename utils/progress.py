@@ -0,0 +1,60 @@
+"""
+Stage-level progress reporting for the downloader scripts
+
+Downloaders run as subprocesses, so they report progress as single JSON lines
+on stdout prefixed with PROGRESS_PREFIX. The background job runner picks these
+lines out of the output stream and records them in the refresh_jobs table.
+"""
+
+import json
+
+import requests
+
+PROGRESS_PREFIX = "PROGRESS "
+
+# Size of each chunk read while streaming a download
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+def report_progress(stage, **counts):
+    """Print one progress line, e.g. report_progress('parse', rows_parsed=1200)"""
+    payload = {'stage': stage, **counts}
+    print(f"{PROGRESS_PREFIX}{json.dumps(payload)}", flush=True)
+
+def parse_progress_line(line):
+    """
+    Parse a progress line written by report_progress
+
+    Returns:
+        dict with the stage and counters, or None for ordinary output
+    """
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        payload = json.loads(line[len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+def download_with_progress(url, timeout=60):
+    """
+    Download a file in chunks, reporting bytes received as it goes
+
+    Returns:
+        bytes: The response body
+    """
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise Exception(f"Failed to download file: {response.status_code}")
+
+        total = response.headers.get('Content-Length')
+        total = int(total) if total and total.isdigit() else None
+
+        chunks = []
+        received = 0
+        report_progress('download', bytes_downloaded=0, bytes_total=total)
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            chunks.append(chunk)
+            received += len(chunk)
+            report_progress('download', bytes_downloaded=received, bytes_total=total)
+
+    return b''.join(chunks)
@@ -0,0 +1,217 @@
+"""
+Background refresh job runner
+
+Runs catalog downloaders off the Streamlit script thread. Each refresh is
+recorded in the refresh_jobs table; the runner streams the downloader's
+stdout, picks out its progress lines and writes them to the job row so any
+session can poll the job without blocking. Clicking refresh while a job for
+the same dataset is queued or running returns the existing job. The current
+snapshot is kept aside during the run and put back if the downloader fails or
+leaves no usable catalog behind.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from db.catalog_meta import create_refresh_job, update_refresh_job
+from db.catalogs import CATALOGS, get_catalog_db_path
+from db.snapshots import backup_snapshot, discard_backup, is_valid_snapshot, restore_snapshot
+from utils.progress import parse_progress_line
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Minimum seconds between progress writes for the same job
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# Number of trailing output lines kept for the error message of a failed job
+OUTPUT_TAIL_LINES = 20
+
+# File lock shared by every process that runs downloaders
+HEAVY_JOB_LOCK_PATH = os.path.join(BASE_DIR, 'db', '.refresh.lock')
+
+# Seconds between heartbeats of a job waiting for the lock, well under STALE_JOB_SECONDS
+LOCK_HEARTBEAT_SECONDS = 60
+
+# Seconds between attempts to take the lock
+LOCK_POLL_SECONDS = 1
+
+# One worker: downloads and parses are memory-heavy, so they run one at a time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh-job")
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+@contextmanager
+def heavy_job_lock(heartbeat=None):
+    """
+    Hold the cross-process lock for a download and parse
+
+    The app's job runner and the scheduler daemon both take this lock, so only
+    one heavy parse runs in the container at a time.
+
+    Args:
+        heartbeat: Optional callable run every LOCK_HEARTBEAT_SECONDS while
+            another process holds the lock, so a waiting job isn't mistaken
+            for an abandoned one
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(HEAVY_JOB_LOCK_PATH, 'a') as lock_file:
+        last_heartbeat = time.monotonic()
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if heartbeat and time.monotonic() - last_heartbeat >= LOCK_HEARTBEAT_SECONDS:
+                    heartbeat()
+                    last_heartbeat = time.monotonic()
+                time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _lower_priority(niceness):
+    """Build a preexec_fn that lowers the CPU priority of a child process"""
+    if not niceness or not hasattr(os, 'nice'):
+        return None
+    return lambda: os.nice(niceness)
+
+def submit_refresh(equipment_type, requested_by=None):
+    """
+    Queue a refresh of one catalog
+
+    Returns:
+        tuple: (job_id, created) where created is False if a job was already active
+    """
+    if equipment_type not in CATALOGS:
+        raise ValueError(f"Unknown equipment type: {equipment_type}")
+
+    job_id, created = create_refresh_job(equipment_type, requested_by)
+    if created:
+        _executor.submit(run_refresh_job, job_id, equipment_type)
+    return job_id, created
+
+def run_refresh_job(job_id, equipment_type, niceness=0, force=False):
+    """
+    Run a downloader for a job, streaming its progress into the jobs table
+
+    Args:
+        job_id: ID of the refresh_jobs row to update
+        equipment_type: Equipment type as registered in db.catalogs.CATALOGS
+        niceness: Amount to lower the downloader's CPU priority by
+        force: Reload the catalog even if the source file is unchanged
+
+    Returns:
+        bool: True if the catalog was refreshed or found unchanged
+    """
+    catalog = CATALOGS[equipment_type]
+    script_path = os.path.join(BASE_DIR, catalog['downloader'])
+    db_path = Path(get_catalog_db_path(catalog['db_name']))
+    update_refresh_job(job_id, stage='waiting')
+
+    output_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    last_stage = None
+    return_code = None
+    try:
+        with heavy_job_lock(heartbeat=lambda: update_refresh_job(job_id, stage='waiting')):
+            update_refresh_job(job_id, state='running', stage='starting', started_at=_now())
+
+            # Without a usable snapshot, reload even if the source file is unchanged
+            has_snapshot = backup_snapshot(db_path, catalog['table_name'])
+            command = [sys.executable, '-u', script_path]
+            if force or not has_snapshot:
+                command.append('--force')
+
+            try:
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    cwd=BASE_DIR,
+                    preexec_fn=_lower_priority(niceness)
+                )
+
+                last_write = 0.0
+                for line in process.stdout:
+                    progress = parse_progress_line(line.strip())
+                    if progress is None:
+                        output_tail.append(line.rstrip())
+                        continue
+
+                    # Throttle writes, but always record a stage change
+                    stage = progress.pop('stage', None)
+                    now = time.monotonic()
+                    if stage != last_stage or now - last_write >= PROGRESS_WRITE_INTERVAL:
+                        update_refresh_job(job_id, stage=stage, **progress)
+                        last_stage = stage
+                        last_write = now
+
+                return_code = process.wait()
+                if return_code == 0 and not is_valid_snapshot(db_path, catalog['table_name']):
+                    output_tail.append(f"Downloader finished without producing a usable {catalog['db_name']}")
+                    return_code = -1
+            finally:
+                # A failed or partial download must not replace the last good snapshot
+                if return_code != 0:
+                    restore_snapshot(db_path, catalog['table_name'])
+                discard_backup(db_path)
+    except Exception as e:
+        update_refresh_job(job_id, state='failed', message=f"Error running downloader: {e}", finished_at=_now())
+        return False
+
+    if return_code == 0:
+        message = "Source file unchanged, nothing to load" if last_stage == 'unchanged' else None
+        update_refresh_job(job_id, state='succeeded', stage='done', message=message, finished_at=_now())
+        return True
+
+    update_refresh_job(
+        job_id,
+        state='failed',
+        message='\n'.join(output_tail) or f"Downloader exited with code {return_code}",
+        finished_at=_now()
+    )
+    return False
+
+def describe_job_progress(job):
+    """
+    Summarize a job row for display
+
+    Returns:
+        tuple: (fraction complete between 0 and 1, status text)
+    """
+    stage = job.get('stage') or job.get('state')
+    if stage == 'download':
+        downloaded = job.get('bytes_downloaded') or 0
+        total = job.get('bytes_total')
+        if total:
+            return 0.6 * min(downloaded / total, 1.0), f"Downloading... {downloaded / 1e6:.1f} of {total / 1e6:.1f} MB"
+        return 0.3, f"Downloading... {downloaded / 1e6:.1f} MB"
+    if stage == 'parse':
+        return 0.75, f"Parsed {job.get('rows_parsed') or 0:,} rows"
+    if stage == 'write':
+        return 0.95, f"Wrote {job.get('rows_written') or 0:,} rows"
+    if stage == 'done':
+        return 1.0, "Done"
+    if stage == 'unchanged':
+        return 0.95, "Source file unchanged"
+    if stage == 'starting':
+        return 0.05, "Starting downloader..."
+    if stage == 'waiting':
+        return 0.0, "Waiting for another refresh to finish..."
+    return 0.0, "Waiting to start..."
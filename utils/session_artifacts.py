@@ -0,0 +1,165 @@
+"""
+Session artifact store
+
+DataFrames a browser session holds on to between reruns (uploaded samples,
+mapped frames) go through this store instead of straight into
+st.session_state. Small frames stay in memory. Larger ones are written to a
+per-session Parquet file, and session state keeps only a handle with the row
+count, the columns and a short preview. Spilled files are removed once they
+haven't been read for ARTIFACT_TTL_HOURS, and the least recently used ones go
+first when the spill directory grows past ARTIFACT_MAX_BYTES, since Streamlit
+doesn't tell us when a session ends.
+"""
+
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'session_artifacts')
+
+# Frames using more memory than this are spilled to disk
+SPILL_BYTES = int(os.environ.get('SESSION_ARTIFACT_SPILL_BYTES', 1024 * 1024))
+
+# Rows kept in memory as the preview of a spilled frame
+PREVIEW_ROWS = 50
+
+# Spilled files not read for this long are removed
+ARTIFACT_TTL_HOURS = float(os.environ.get('SESSION_ARTIFACT_TTL_HOURS', '6'))
+
+# Total size of the spill directory before least recently used files are removed
+ARTIFACT_MAX_BYTES = int(os.environ.get('SESSION_ARTIFACT_MAX_BYTES', 512 * 1024 * 1024))
+
+def _session_dir():
+    """Get the spill directory of the current browser session"""
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx is not None else 'local'
+    return os.path.join(ARTIFACT_DIR, re.sub(r'[^A-Za-z0-9_-]', '_', session_id))
+
+def _is_handle(value):
+    """Check whether a session state value is the handle of a spilled frame"""
+    return isinstance(value, dict) and 'artifact_path' in value
+
+def put_frame(key, df):
+    """
+    Store a DataFrame under a session state key, spilling it to disk if it's large
+
+    Returns:
+        The stored value: the DataFrame itself or the handle of the spilled file
+    """
+    discard_frame(key)
+    if df is None or df.memory_usage(deep=True).sum() <= SPILL_BYTES:
+        st.session_state[key] = df
+        return df
+
+    cleanup_artifacts()
+    session_dir = _session_dir()
+    path = os.path.join(session_dir, f"{re.sub(r'[^A-Za-z0-9_-]', '_', key)}-{uuid.uuid4().hex}.parquet")
+    try:
+        os.makedirs(session_dir, exist_ok=True)
+        df.to_parquet(path, index=True)
+    except (ImportError, OSError, TypeError, ValueError) as e:
+        # Columns pyarrow can't store (e.g. mixed types), or a full disk or a spill
+        # directory removed by another session's cleanup, keep the frame in memory
+        print(f"Could not spill session artifact {key}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        st.session_state[key] = df
+        return df
+
+    handle = {
+        'artifact_path': path,
+        'rows': len(df),
+        'columns': df.columns.tolist(),
+        'preview': df.head(PREVIEW_ROWS),
+    }
+    st.session_state[key] = handle
+    return handle
+
+def get_frame(key):
+    """
+    Get the DataFrame stored under a session state key, reading it back if it was spilled
+
+    Returns:
+        DataFrame, or None if nothing is stored or the spilled file has expired
+    """
+    value = st.session_state.get(key)
+    if not _is_handle(value):
+        return value
+    path = value['artifact_path']
+    try:
+        df = pd.read_parquet(path)
+        # Reading counts as a use for the LRU/TTL cleanup
+        os.utime(path)
+    except OSError:
+        # Also when another session's cleanup removes the file right after it was read
+        print(f"Session artifact {key} expired")
+        st.session_state[key] = None
+        return None
+    return df
+
+def get_frame_preview(key):
+    """Get the first rows of the DataFrame under a key without reading a spilled file"""
+    value = st.session_state.get(key)
+    if _is_handle(value):
+        return value['preview']
+    return value.head(PREVIEW_ROWS) if isinstance(value, pd.DataFrame) else None
+
+def discard_frame(key):
+    """Drop the DataFrame under a key and remove its spilled file"""
+    value = st.session_state.get(key)
+    if _is_handle(value) and os.path.exists(value['artifact_path']):
+        os.remove(value['artifact_path'])
+    st.session_state[key] = None
+
+def cleanup_artifacts(ttl_hours=ARTIFACT_TTL_HOURS, max_bytes=ARTIFACT_MAX_BYTES):
+    """
+    Remove expired spilled files, then the least recently used ones over the size cap
+
+    Returns:
+        int number of files removed
+    """
+    if not os.path.isdir(ARTIFACT_DIR):
+        return 0
+
+    files = []
+    for root, _, names in os.walk(ARTIFACT_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    removed = 0
+    cutoff = time.time() - ttl_hours * 3600
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    # Drop the directories of sessions with nothing left
+    for entry in os.listdir(ARTIFACT_DIR):
+        session_dir = os.path.join(ARTIFACT_DIR, entry)
+        try:
+            if os.path.isdir(session_dir) and not os.listdir(session_dir):
+                os.rmdir(session_dir)
+        except OSError:
+            continue
+
+    if removed:
+        print(f"Removed {removed} session artifacts")
+    return removed
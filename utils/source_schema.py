@@ -0,0 +1,195 @@
+"""
+Header detection and schema drift checks for the CEC source files
+
+The CEC spreadsheets put a variable number of title rows above the header
+and occasionally insert or move columns. Instead of hard-coded header rows
+and column positions, the downloaders find the header row by scanning for
+known column names, map columns by name through alias lists, and compare a
+fingerprint of the header against the last accepted one. An unexpected
+change raises SchemaDriftError before anything is written, so the previous
+snapshot stays live until someone reviews the new layout and reruns the
+downloader with --accept-schema.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from io import BytesIO
+
+import pandas as pd
+
+from db.catalog_meta import get_header_fingerprint, record_header_fingerprint
+
+# Number of rows at the top of a sheet searched for the header
+HEADER_SCAN_ROWS = 60
+
+# Aliases that identify the header row of every CEC list
+MANUFACTURER_ALIASES = ['Manufacturer Name', 'Manufacturer']
+MODEL_ALIASES = ['Model Number']
+
+class SchemaDriftError(Exception):
+    """The layout of a source file doesn't match what the downloader expects"""
+
+def normalize_header(value):
+    """Lowercase a header cell and reduce punctuation and line breaks to single spaces"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return re.sub(r'[^a-z0-9]+', ' ', str(value).lower()).strip()
+
+def is_schema_change_accepted():
+    """Check whether the downloader was told to accept a changed header layout"""
+    return '--accept-schema' in sys.argv[1:] or os.environ.get('ACCEPT_SCHEMA_CHANGE') == '1'
+
+def _find_column(normalized_headers, aliases, claimed=()):
+    """
+    Find the position of the first header matching any alias
+
+    Exact matches win over headers that start with an alias (e.g. a unit
+    suffix), which win over headers that contain every word of an alias.
+
+    Returns:
+        int position, or None if nothing matches
+    """
+    normalized_aliases = [normalize_header(alias) for alias in aliases]
+    tiers = (
+        lambda header, alias: header == alias,
+        lambda header, alias: header.startswith(alias + ' '),
+        lambda header, alias: set(alias.split()) <= set(header.split()),
+    )
+    for matches in tiers:
+        for alias in normalized_aliases:
+            for position, header in enumerate(normalized_headers):
+                if position not in claimed and header and matches(header, alias):
+                    return position
+    return None
+
+def find_header_row(sheet, required_aliases):
+    """
+    Find the header row of a sheet read without a header
+
+    Args:
+        sheet: DataFrame of the top rows of the sheet (header=None)
+        required_aliases: One alias list per column the header must contain
+
+    Returns:
+        int index of the header row
+    """
+    for row_index in range(min(len(sheet), HEADER_SCAN_ROWS)):
+        normalized = [normalize_header(value) for value in sheet.iloc[row_index].tolist()]
+        claimed = set()
+        for aliases in required_aliases:
+            position = _find_column(normalized, aliases, claimed)
+            if position is None:
+                break
+            claimed.add(position)
+        else:
+            return row_index
+    raise SchemaDriftError(f"No header row with {[aliases[0] for aliases in required_aliases]} "
+                           f"in the first {HEADER_SCAN_ROWS} rows")
+
+def header_fingerprint(headers):
+    """Hash the normalized header cells of a source file"""
+    normalized = '\x1f'.join(normalize_header(header) for header in headers)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def check_header_fingerprint(dataset, header_row, headers):
+    """
+    Compare a source file's header with the last accepted layout
+
+    The first layout seen for a dataset is accepted as-is. A different layout
+    raises SchemaDriftError unless the change was accepted explicitly. Nothing
+    is recorded here; see record_header_layout.
+    """
+    fingerprint = header_fingerprint(headers)
+    accepted = get_header_fingerprint(dataset)
+    if accepted and accepted['fingerprint'] != fingerprint and not is_schema_change_accepted():
+        previous = json.loads(accepted['headers'])
+        current = [normalize_header(header) for header in headers]
+        added = [header for header in current if header and header not in previous]
+        removed = [header for header in previous if header and header not in current]
+        raise SchemaDriftError(
+            f"Header layout of the {dataset} source changed since {accepted['accepted_at']} "
+            f"(header row {accepted['header_row']} -> {header_row}, added {added}, removed {removed}). "
+            "Review the new layout, then rerun the downloader with --accept-schema."
+        )
+
+def record_header_layout(dataset, header_row, headers):
+    """
+    Accept a source file's header layout once its rows were written successfully
+
+    Called after the catalog write, next to the source fingerprint, so a load
+    that fails partway doesn't leave a new layout accepted for data that was
+    never stored.
+    """
+    fingerprint = header_fingerprint(headers)
+    accepted = get_header_fingerprint(dataset)
+    if not accepted or accepted['fingerprint'] != fingerprint or accepted['header_row'] != header_row:
+        if accepted:
+            print(f"Accepting new header layout for {dataset}.")
+        record_header_fingerprint(
+            dataset, fingerprint, header_row, json.dumps([normalize_header(header) for header in headers])
+        )
+
+def detect_header(content, dataset, required_aliases=(MANUFACTURER_ALIASES, MODEL_ALIASES)):
+    """
+    Locate the header row of a downloaded spreadsheet and check it for drift
+
+    The layout isn't recorded until record_header_layout is called after the
+    catalog write.
+
+    Returns:
+        tuple: (header row index, list of header cells)
+    """
+    sheet = pd.read_excel(BytesIO(content), engine='openpyxl', header=None, nrows=HEADER_SCAN_ROWS)
+    header_row = find_header_row(sheet, required_aliases)
+    headers = sheet.iloc[header_row].tolist()
+    print(f"Found {dataset} header on row {header_row}.")
+    check_header_fingerprint(dataset, header_row, headers)
+    return header_row, headers
+
+def read_rows_below_header(content, header_row, headers):
+    """
+    Read the data rows under a detected header
+
+    Leading rows without a manufacturer or model (units or notes between the
+    header and the data) are dropped.
+
+    Returns:
+        DataFrame with positional columns
+    """
+    df = pd.read_excel(BytesIO(content), engine='openpyxl', header=None, skiprows=header_row + 1)
+    normalized = [normalize_header(header) for header in headers]
+    key_positions = [_find_column(normalized, MANUFACTURER_ALIASES), _find_column(normalized, MODEL_ALIASES)]
+    has_key = df.iloc[:, key_positions].notna().all(axis=1)
+    if has_key.any():
+        # Re-infer types once the units row no longer forces numeric columns to text
+        df = df.loc[has_key.idxmax():].infer_objects()
+    return df.reset_index(drop=True)
+
+def map_columns_by_name(df, headers, column_aliases):
+    """
+    Build a frame with the downloader's column names from a positional frame
+
+    Args:
+        df: Data rows with positional columns
+        headers: Header cells aligned with df's columns
+        column_aliases: Dict of target column name to the source header aliases
+
+    Returns:
+        DataFrame with one column per target, in column_aliases order
+    """
+    normalized = [normalize_header(header) for header in headers]
+    positions = {}
+    for target, aliases in column_aliases.items():
+        position = _find_column(normalized, aliases, set(positions.values()))
+        if position is None:
+            raise SchemaDriftError(f"No source column for '{target}' (looked for {aliases}); "
+                                   f"headers are {[str(header) for header in headers]}")
+        positions[target] = position
+
+    mapped = pd.DataFrame({target: df.iloc[:, position] for target, position in positions.items()})
+    for target, position in positions.items():
+        print(f"{target} <- column {position}: {headers[position]}")
+    return mapped